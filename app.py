@@ -1,9 +1,173 @@
 
+import threading
+import uuid
 import streamlit as st
 from src import global_configs as cf
+from src.job_queue import store, worker
 from src.speech_inference import pre_compute, text_inference
 from tools.utils import streamlit_utils, json_utils
-from src.song_inference.inference_pipeline import full_inference_pipeline
+
+
+# --------------------------------------------------------------------------------------------------------------------
+# Job Queue Helpers
+# --------------------------------------------------------------------------------------------------------------------
+
+def submit_job(state_key: str, kind: str, params: dict, uploaded_file) -> None:
+    """
+    Queues an uploaded file for the background workers and remembers the job in the session, so
+    that the pipeline keeps running while the user interacts with the page.
+
+    Args:
+        state_key: The session state key under which the job id is stored.
+        kind: The pipeline to run, "speech" or "song".
+        params: The JSON serializable parameters of the pipeline.
+        uploaded_file: The Streamlit uploaded audio file.
+    """
+
+    # Identify the session so that the workers are shared fairly between users
+    if "user_id" not in st.session_state:
+        st.session_state["user_id"] = uuid.uuid4().hex
+
+    worker.ensure_workers()
+    st.session_state[state_key] = store.default_queue().submit(
+        kind=kind, params=params, payload=uploaded_file.getvalue(), user_id=st.session_state["user_id"]
+    )
+    st.session_state.pop(f"{state_key}_output", None)
+
+
+@st.fragment(run_every=cf.STREAMLIT_CONFIG["Job_Queue"]["Poll_Interval_Seconds"])
+def job_progress(state_key: str) -> None:
+    """
+    Polls a queued job and shows its stage and partial output, rerunning the whole page once the
+    job is finished.
+
+    Args:
+        state_key: The session state key under which the job id is stored.
+    """
+
+    job = store.default_queue().get(st.session_state[state_key])
+    if job is None:
+        del st.session_state[state_key]
+        st.rerun()
+
+    if job["status"] in (store.DONE, store.FAILED):
+        st.session_state[f"{state_key}_output"] = job
+        del st.session_state[state_key]
+        st.rerun()
+
+    if job["status"] == store.QUEUED:
+        st.progress(0.0, text=f"Waiting for a worker, {store.default_queue().position(job['id'])} job(s) ahead...")
+    else:
+        st.progress(job["progress"], text=f"Running {job['stage'] or 'pipeline'}...")
+
+    # Show the output produced so far, e.g. the transcript of the decoded song segments
+    if job.get("partial"):
+        st.text_area("Transcript so far", value=job["partial"], height=200, disabled=True)
+
+
+def show_speech_output(output: dict) -> None:
+    """
+    Displays the summary and named entities of an uploaded speech file.
+
+    Args:
+        output: The output of `text_inference.run_speech_pipeline`.
+    """
+
+    st.markdown("\n\nA summary of the audio file provided is as follows.")
+    summary_container = st.container(border=True)
+    with summary_container:
+        st.write(output["SUMMARY"])
+
+    st.markdown("\n\nFrom the audio file provided, the extracted entities are as follows.")
+    persons, locations, organizations = st.columns(3, border=True)
+    with persons:
+        st.markdown("**The Persons**")
+        if output.get("PERSONS"):
+            st.write(output["PERSONS"])
+        else:
+            st.write("No person is detected from the audio file provided.")
+
+    with locations:
+        st.markdown("**The Locations**")
+        if output.get("LOCATION"):
+            st.write(output["LOCATION"])
+        else:
+            st.write("No location is detected from the audio file provided.")
+
+    with organizations:
+        st.markdown("**The Organizations**")
+        if output.get("ORGANIZATION"):
+            st.write(output["ORGANIZATION"])
+        else:
+            st.write("No organization is detected from the audio file provided.")
+
+
+def show_song_output(output: dict) -> None:
+    """
+    Displays the transcript, named entities and summaries of an uploaded song.
+
+    Args:
+        output: The output of the song `full_inference_pipeline`.
+    """
+
+    # Transcript
+    st.subheader("Transcript")
+    st.text_area("", value=output["TRANSCRIPT"], height=200)
+    # Entities
+    st.subheader("Named Entities")
+    c1, c2, c3 = st.columns(3)
+    with c1:
+        st.markdown("**Characters**")
+        for e in output.get("CHARACTERS", []): st.write(f"{e['text']} ({e['score']:.2f})")
+    with c2:
+        st.markdown("**Locations**")
+        for e in output.get("LOCATIONS", []): st.write(f"{e['text']} ({e['score']:.2f})")
+    with c3:
+        st.markdown("**Objects**")
+        for e in output.get("OBJECTS", []): st.write(f"{e['text']} ({e['score']:.2f})")
+    # Summaries
+    st.subheader("Summaries")
+    cols = st.columns(3)
+    for col, title, key in zip(cols, ["Long","Short","Tiny"], ["LONG_SUMMARY","SHORT_SUMMARY","TINY_SUMMARY"]):
+        with col:
+            st.markdown(f"**{title} Summary**")
+            st.write(output.get(key, ""))
+
+
+# --------------------------------------------------------------------------------------------------------------------
+# Model Warm-up
+# --------------------------------------------------------------------------------------------------------------------
+
+@st.cache_resource(show_spinner=False)
+def start_warm_up() -> threading.Thread | None:
+    """
+    Starts loading the configured models in the background, once per Streamlit server process,
+    so that the page is served at once and the first summary does not wait for the models.
+
+    Returns:
+        threading.Thread | None: The warm-up thread, or None if warm-up is disabled.
+    """
+
+    warm_up = cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Warm_Up"]
+    return text_inference.warm_up(warm_up["Models"]) if warm_up["Enabled"] else None
+
+
+_STATE_LABELS = {
+    "ready": "🟢 ready", "loading": "🟡 loading...", "absent": "⚪ loaded on first use", "remote": "🔵 inference server"
+}
+
+
+@st.fragment(run_every=2)
+def model_status() -> None:
+    """
+    Shows whether every model the page runs in this process is loaded.
+    """
+
+    states = text_inference.model_states(
+        cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Additional_Models"]
+    )
+    for model_ident, state in states.items():
+        st.write(f"{model_ident.replace('_', ' ')}: {_STATE_LABELS[state]}")
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -11,6 +175,11 @@ from src.song_inference.inference_pipeline import full_inference_pipeline
 # --------------------------------------------------------------------------------------------------------------------
 
 st.set_page_config(page_title="What are they saying?", page_icon="🗣", layout="wide")
+start_warm_up()
+with st.sidebar:
+    st.markdown("**Models**")
+    model_status()
+
 st.title("🗣 What are they saying?")
 st.markdown(
     """
@@ -66,15 +235,15 @@ with st.expander(label="Speech to Summary + NER - Default"):
         t5_short, t5_medium, t5_long = st.columns(3, border=True)
         with t5_short:
             st.markdown("**T5 Short Summary**")
-            st.write_stream(streamlit_utils.stream_text(data["t5_short"][0]))
+            st.write(data["t5_short"][0])
 
         with t5_medium:
             st.markdown("**T5 Medium Summary**")
-            st.write_stream(streamlit_utils.stream_text(data["t5_medium"][0]))
+            st.write(data["t5_medium"][0])
 
         with t5_long:
             st.markdown("**T5 Long Summary**")
-            st.write_stream(streamlit_utils.stream_text(data["t5_large"][0]))
+            st.write(data["t5_large"][0])
 
         # Present NER - Persons, Locations, and Organizations
         st.markdown(
@@ -122,59 +291,69 @@ with st.expander(label="Speech to Summary + NER - Default"):
         )
 
         if model_option:
+            if text_inference.model_states([model_option])[model_option] in ("absent", "loading"):
+                st.info("The model is loading, the first summary takes longer than the next ones.")
+
             if model_option == "Facebook_Bart_CNN":
                 st.markdown("\n\nUsing Facebook's BART model, the summary of the original text is as follow.")
-                summary = text_inference.bart_inference(data["recording_transcriptions"][0], model_option)
-
                 bart_container = st.container(border=True)
                 with bart_container:
-                    st.write_stream(streamlit_utils.stream_text(summary))
+                    st.write_stream(text_inference.bart_stream(data["recording_transcriptions"][0], model_option))
 
             else:
                 st.markdown("\n\nUsing Microsoft's Phi4 Mini model, the summary of the original text is as follow.")
-                summary = text_inference.phi4_inference(
-                    text=data["recording_transcriptions"][0],
-                    model_ident=model_option,
-                    system_prompt=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Summarization_Prompts"]["System_Prompt"],
-                    user_prompt=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Summarization_Prompts"]["User_Prompt"]
+                model_output = json_utils.JsonFieldStreamer(
+                    text_inference.phi4_stream(
+                        text=data["recording_transcriptions"][0],
+                        model_ident=model_option,
+                        system_prompt=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Summarization_Prompts"]["System_Prompt"],
+                        user_prompt=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Summarization_Prompts"]["User_Prompt"]
+                    ),
+                    field="SUMMARY"
                 )
 
-                # Clean the text and extract the JSON part out
-                summary = json_utils.json_reformatting(summary)
-
-                # Serve the results
+                # Serve the summary while Phi4 generates it
                 phi4_container = st.container(border=True)
                 with phi4_container:
-                    st.write_stream(streamlit_utils.stream_text(summary["SUMMARY"]))
+                    st.write_stream(model_output)
 
-                st.markdown(
-                    """
-                    \nUsing Phi4 Mini model, we could also attempt to extract the entities from the original text. The following
-                    are the entities extracted from the original text using Phi4 Mini model.
-                    """
-                )
+                # Clean the complete text and extract the JSON part out, an unconstrained output may not be valid JSON
+                try:
+                    summary = json_utils.json_reformatting(model_output.text)
+                except ValueError:
+                    summary = None
 
-                persons, locations, organizations = st.columns(3, border=True)
-                with persons:
-                    st.markdown("**The Persons**")
-                    if summary["PERSONS"]:
-                        st.write(summary["PERSONS"])
-                    else:
-                        st.write("No person is detected using Phi4 Mini.")
-
-                with locations:
-                    st.markdown("**The Locations**")
-                    if summary["LOCATION"]:
-                        st.write(summary["LOCATION"])
-                    else:
-                        st.write("No location is detected using Phi4 Mini.")
-
-                with organizations:
-                    st.markdown("**The Organizations**")
-                    if summary["ORGANIZATION"]:
-                        st.write(summary["ORGANIZATION"])
-                    else:
-                        st.write("No organization is detected using Phi4 Mini.")
+                if not isinstance(summary, dict):
+                    st.warning("The output of Phi4 Mini is not a valid JSON object, so its entities cannot be shown.")
+                else:
+                    st.markdown(
+                        """
+                        \nUsing Phi4 Mini model, we could also attempt to extract the entities from the original text. The following
+                        are the entities extracted from the original text using Phi4 Mini model.
+                        """
+                    )
+
+                    persons, locations, organizations = st.columns(3, border=True)
+                    with persons:
+                        st.markdown("**The Persons**")
+                        if summary.get("PERSONS"):
+                            st.write(summary["PERSONS"])
+                        else:
+                            st.write("No person is detected using Phi4 Mini.")
+
+                    with locations:
+                        st.markdown("**The Locations**")
+                        if summary.get("LOCATION"):
+                            st.write(summary["LOCATION"])
+                        else:
+                            st.write("No location is detected using Phi4 Mini.")
+
+                    with organizations:
+                        st.markdown("**The Organizations**")
+                        if summary.get("ORGANIZATION"):
+                            st.write(summary["ORGANIZATION"])
+                        else:
+                            st.write("No organization is detected using Phi4 Mini.")
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -200,7 +379,7 @@ with st.expander(label="Speech to Summary + NER - Your Own Speech File 🔊"):
     )
     run = st.button(label="Run Pipeline")
 
-    # Once a file has been uploaded and a model has been selected, process the file and extract summary and NER
+    # Once a file has been uploaded and a model has been selected, queue the file for the workers
     if uploaded_file and model_option and run:
         # Check if prompts are needed
         system_prompt = (
@@ -214,52 +393,28 @@ with st.expander(label="Speech to Summary + NER - Your Own Speech File 🔊"):
             else None
         )
 
-        # Run inference based on the option selected by user
-        output = text_inference.full_inference_pipeline(
-            file=uploaded_file,
-            model_selection=model_option,
-            temp_dir=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Streamlit_Temp_Folder"],
-            system_prompt=system_prompt,
-            user_prompt=user_prompt
+        submit_job(
+            state_key="speech_job",
+            kind="speech",
+            params={
+                "filename": uploaded_file.name,
+                "model_selection": model_option,
+                "system_prompt": system_prompt,
+                "user_prompt": user_prompt
+            },
+            uploaded_file=uploaded_file
         )
 
-        # From the output, display the summary and NER
-        st.markdown("\n\nA summary of the audio file provided is as follows.")
-        summary_container = st.container(border=True)
-        with summary_container:
-            st.write_stream(streamlit_utils.stream_text(output["SUMMARY"]))
-
-        st.markdown("\n\nFrom the audio file provided, the extracted entities are as follows.")
-        persons, locations, organizations = st.columns(3, border=True)
-        with persons:
-            st.markdown("**The Persons**")
-            try:
-                if output["PERSONS"]:
-                    st.write(output["PERSONS"])
-                else:
-                    st.write("No person is detected from the audio file provided.")
-            except KeyError:
-                st.write("No person is detected from the audio file provided.")
-
-        with locations:
-            st.markdown("**The Locations**")
-            try:
-                if output["LOCATION"]:
-                    st.write(output["LOCATION"])
-                else:
-                    st.write("No location is detected from the audio file provided.")
-            except KeyError:
-                st.write("No location is detected from the audio file provided.")
+    # Follow the queued job, then display the summary and NER
+    if "speech_job" in st.session_state:
+        job_progress("speech_job")
 
-        with organizations:
-            st.markdown("**The Organizations**")
-            try:
-                if output["ORGANIZATION"]:
-                    st.write(output["ORGANIZATION"])
-                else:
-                    st.write("No organization is detected from the audio file provided.")
-            except KeyError:
-                st.write("No organization is detected from the audio file provided.")
+    if "speech_job_output" in st.session_state:
+        job = st.session_state["speech_job_output"]
+        if job["status"] == store.FAILED:
+            st.error(f"The pipeline failed: {job['error']}")
+        else:
+            show_speech_output(job["result"])
 
 
 # --------------------------------------------------------------------------------------------------------------------
@@ -282,31 +437,24 @@ with st.expander(label="🎵 Your Song Inference"):
     run = st.button("Run Song Pipeline")
 
     if uploaded_file and run:
-        output = full_inference_pipeline(
-            file=uploaded_file,
-            transcription_model=transcription_model,
-            summary_model=summary_model,
-            extract_vocals=extract_vocals
+        submit_job(
+            state_key="song_job",
+            kind="song",
+            params={
+                "filename": uploaded_file.name,
+                "transcription_model": transcription_model,
+                "summary_model": summary_model,
+                "extract_vocals": extract_vocals
+            },
+            uploaded_file=uploaded_file
         )
-        # Transcript
-        st.subheader("Transcript")
-        st.text_area("", value=output["TRANSCRIPT"], height=200)
-        # Entities
-        st.subheader("Named Entities")
-        c1, c2, c3 = st.columns(3)
-        with c1:
-            st.markdown("**Characters**")
-            for e in output.get("CHARACTERS", []): st.write(f"{e['text']} ({e['score']:.2f})")
-        with c2:
-            st.markdown("**Locations**")
-            for e in output.get("LOCATIONS", []): st.write(f"{e['text']} ({e['score']:.2f})")
-        with c3:
-            st.markdown("**Objects**")
-            for e in output.get("OBJECTS", []): st.write(f"{e['text']} ({e['score']:.2f})")
-        # Summaries
-        st.subheader("Summaries")
-        cols = st.columns(3)
-        for col, title, key in zip(cols, ["Long","Short","Tiny"], ["LONG_SUMMARY","SHORT_SUMMARY","TINY_SUMMARY"]):
-            with col:
-                st.markdown(f"**{title} Summary**")
-                st.write(output.get(key, ""))
+
+    if "song_job" in st.session_state:
+        job_progress("song_job")
+
+    if "song_job_output" in st.session_state:
+        job = st.session_state["song_job_output"]
+        if job["status"] == store.FAILED:
+            st.error(f"The pipeline failed: {job['error']}")
+        else:
+            show_song_output(job["result"])
@@ -0,0 +1,142 @@
+
+import argparse
+import multiprocessing
+import re
+import resource
+import statistics
+from pathlib import Path
+from src import global_configs as cf
+from tools.models import asr_backends, model_registry
+from tools.utils import audio_utils
+
+# LibriSpeech recordings downloaded by the data ingestion assets
+DEFAULT_AUDIO = cf.DATA_PATH.joinpath(cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]["Folder_Tree"]["Raw_Data"])
+AUDIO_SUFFIXES = {".flac", ".wav", ".mp3", ".ogg"}
+
+
+def audio_files(paths: list[Path], limit: int) -> list[Path]:
+    """
+    Lists the audio files given directly or found under the given folders.
+
+    Args:
+        paths: Audio files or folders searched recursively.
+        limit: Maximum number of files returned.
+
+    Returns:
+        list[Path]: The audio files, sorted by path.
+    """
+
+    files = []
+    for path in paths:
+        if path.is_dir():
+            files.extend(p for p in path.rglob("*") if p.suffix.lower() in AUDIO_SUFFIXES)
+        elif path.is_file():
+            files.append(path)
+    return sorted(files)[:limit]
+
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    """
+    Computes the word error rate of a hypothesis against a reference, ignoring case and punctuation.
+
+    Args:
+        reference: The reference transcript.
+        hypothesis: The compared transcript.
+
+    Returns:
+        float: The word edit distance divided by the number of reference words.
+    """
+
+    ref = re.sub(r"[^\w\s']", " ", reference.lower()).split()
+    hyp = re.sub(r"[^\w\s']", " ", hypothesis.lower()).split()
+
+    # Edit distance over words, keeping a single row of the table
+    row = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, start=1):
+        previous, row[0] = row[0], i
+        for j, hyp_word in enumerate(hyp, start=1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (ref_word != hyp_word))
+    return row[-1] / max(len(ref), 1)
+
+
+def run_backend(backend: str, files: list[Path], batch_size: int) -> dict:
+    """
+    Loads a backend, transcribes the audio files with it and measures its speed and memory.
+    Runs in its own process so that the memory of every backend is measured separately.
+
+    Args:
+        backend: The name of the backend, "transformers" or "openai-whisper".
+        files: The audio files to transcribe.
+        batch_size: Number of waveforms sent to the backend at once.
+
+    Returns:
+        dict: The transcripts, the audio and inference seconds, the model size and the peak
+            resident memory of the process in MB.
+    """
+
+    waveforms = [audio_utils.decode_audio(file, sampling_rate=audio_utils.SAMPLING_RATE) for file in files]
+    asr = asr_backends.load_asr_backend(backend)
+
+    # Warm up on the shortest waveform so that one-off initialization is not timed
+    asr.transcribe([min(waveforms, key=len)])
+
+    transcriptions = []
+    for start in range(0, len(waveforms), batch_size):
+        transcriptions.extend(asr.transcribe(waveforms[start: start + batch_size]))
+
+    return {
+        "texts": [transcription.text for transcription in transcriptions],
+        "audio_seconds": sum(transcription.audio_seconds for transcription in transcriptions),
+        "inference_seconds": sum(transcription.inference_seconds for transcription in transcriptions),
+        "model_mb": model_registry.model_nbytes(asr.model) / 2 ** 20,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def main(paths: list[Path], backends: list[str], limit: int, batch_size: int) -> None:
+    """
+    Transcribes the same audio files with every backend and prints their real time factor (RTF,
+    inference seconds per second of audio), memory, and word error rate against the first backend.
+
+    Args:
+        paths: Audio files or folders.
+        backends: The names of the backends, the first one being the reference of the agreement.
+        limit: Maximum number of audio files.
+        batch_size: Number of waveforms sent to the backends at once.
+    """
+
+    files = audio_files(paths, limit)
+    if not files:
+        raise SystemExit(f"No audio file found in {[str(path) for path in paths]}.")
+
+    # A fresh process per backend keeps the memory of one backend out of the measures of the next
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for backend in backends:
+        with context.Pool(1) as pool:
+            results[backend] = pool.apply(run_backend, (backend, files, batch_size))
+
+    reference = results[backends[0]]["texts"]
+    print(f"{len(files)} files, {results[backends[0]]['audio_seconds']:.1f} s of audio, reference {backends[0]}")
+    for backend, result in results.items():
+        wer = statistics.mean(word_error_rate(ref, hyp) for ref, hyp in zip(reference, result["texts"]))
+        print(
+            f"{backend:<16} RTF {result['inference_seconds'] / result['audio_seconds']:6.3f}  "
+            f"model {result['model_mb']:8.1f} MB  peak RSS {result['peak_rss_mb']:8.1f} MB  "
+            f"WER vs {backends[0]} {wer:6.2%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the speed, memory and agreement of the speech recognition backends.")
+    parser.add_argument("--audio", nargs="+", type=Path, default=[DEFAULT_AUDIO], help="Audio files or folders.")
+    parser.add_argument(
+        "--backends", nargs="+", default=[asr_backends.TRANSFORMERS, asr_backends.OPENAI_WHISPER],
+        choices=[asr_backends.TRANSFORMERS, asr_backends.OPENAI_WHISPER], help="Backends to compare."
+    )
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of audio files.")
+    parser.add_argument("--batch-size", type=int, default=4, help="Waveforms sent to a backend at once.")
+    args = parser.parse_args()
+
+    main(args.audio, args.backends, args.limit, args.batch_size)
@@ -0,0 +1,109 @@
+
+import argparse
+import math
+import sys
+import tempfile
+import time
+from pathlib import Path
+from benchmarks import tiny_models
+from src import global_configs as cf
+from tools.models.gliner_ner import GlinerNER
+
+# Entity scores of the two modes may differ by the rounding of the label embeddings
+SCORE_TOLERANCE = 1e-4
+
+
+def run(model: GlinerNER, texts: list[str], labels: list[str], batch_size: int) -> list[list[dict]]:
+    """
+    Extracts the entities of the texts, one text at a time through `inference` when the batch size
+    is 1, as the NER asset does, and through `batch_inference` otherwise.
+    """
+
+    if batch_size == 1:
+        return [model.inference(text, labels) for text in texts]
+    return [
+        entities
+        for start in range(0, len(texts), batch_size)
+        for entities in model.batch_inference(texts[start: start + batch_size], labels)
+    ]
+
+
+def mismatches(reference: list[list[dict]], candidate: list[list[dict]]) -> int:
+    """
+    Counts the texts whose entities differ between two runs, in their span, text or label, or in
+    their score by more than the tolerance.
+    """
+
+    count = 0
+    for expected, found in zip(reference, candidate):
+        same = len(expected) == len(found) and all(
+            (a["start"], a["end"], a["text"], a["label"]) == (b["start"], b["end"], b["text"], b["label"])
+            and math.isclose(a["score"], b["score"], abs_tol=SCORE_TOLERANCE)
+            for a, b in zip(expected, found)
+        )
+        count += not same
+    return count
+
+
+def main(model_name: str | None, labels: list[str], count: int, batch_sizes: list[int], repeats: int) -> None:
+    """
+    Checks that the label embeddings cache of GLiNER leaves the entities unchanged, and compares
+    the throughput with and without it. Without a model, a tiny randomly initialized bi-encoder
+    GLiNER is used, which measures the saving on the label encoding and not the quality of the
+    entities. Exits with status 1 when the entities differ.
+
+    Args:
+        model_name: The name or path of a GLiNER model, or None for the tiny bi-encoder model.
+        labels: The entity labels.
+        count: Number of synthetic texts.
+        batch_sizes: The batch sizes to measure, 1 running one text at a time.
+        repeats: Number of timed runs per mode, the fastest is kept.
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_name = model_name or str(tiny_models.build_tiny_gliner(Path(tmp), bi_encoder=True))
+        model = GlinerNER(model_name, device="cpu", max_length=None, cache_labels=True)
+
+    texts = tiny_models.synthetic_sentences(count, min_words=40, max_words=120)
+    modes = [False, True] if model.cache_labels else [False]
+    if not model.cache_labels:
+        print(f"{model_name} is a uni-encoder model: its labels are encoded with every text, so they cannot be cached.")
+
+    for batch_size in batch_sizes:
+        results = {}
+        for cache_labels in modes:
+            model.cache_labels = cache_labels
+            # Warm up, which also encodes the labels once in the cached mode
+            entities = run(model, texts[:batch_size], labels, batch_size)
+
+            best = math.inf
+            for _ in range(repeats):
+                start = time.perf_counter()
+                entities = run(model, texts, labels, batch_size)
+                best = min(best, time.perf_counter() - start)
+            results[cache_labels] = (best, entities)
+
+        print(f"batch size {batch_size:>3}  uncached {count / results[False][0]:8.1f} texts/s", end="")
+        if True in results:
+            different = mismatches(results[False][1], results[True][1])
+            print(
+                f"  cached {count / results[True][0]:8.1f} texts/s  speedup {results[False][0] / results[True][0]:5.2f}x  "
+                f"parity {'ok' if not different else f'{different} texts differ'} "
+                f"({sum(map(len, results[False][1]))} entities)"
+            )
+            if different:
+                sys.exit(1)
+        else:
+            print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check and benchmark the label embeddings cache of GLiNER.")
+    parser.add_argument("--model", help="GLiNER model name or path, a tiny random bi-encoder model by default.")
+    parser.add_argument("--labels", nargs="+", default=cf.MODELS_CONFIG["Gliner_Model"]["Labels"], help="Entity labels.")
+    parser.add_argument("--texts", type=int, default=64, help="Number of synthetic texts.")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 8], help="Batch sizes, 1 runs one text at a time.")
+    parser.add_argument("--repeats", type=int, default=3, help="Timed runs per mode, the fastest is kept.")
+    args = parser.parse_args()
+
+    main(args.model, args.labels, args.texts, args.batch_sizes, args.repeats)
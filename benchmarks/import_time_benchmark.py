@@ -0,0 +1,124 @@
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).joinpath("..", "..").resolve()
+
+# Modules imported by the Streamlit script, the job queue workers, the Dagster code location and the utilities
+DEFAULT_MODULES = [
+    "app", "src", "src.global_configs", "src.definitions", "src.speech_inference.pre_compute",
+    "src.speech_inference.text_inference", "src.job_queue.worker", "src.song_inference.inference_pipeline",
+    "tools.utils.audio_utils", "tools.utils.json_utils", "tools.utils.memo_utils", "tools.utils.profiling",
+    "tools.utils.stage_scheduler", "tools.utils.streamlit_utils"
+]
+
+# Libraries that take seconds to import and should only be imported once a model is built
+HEAVY_MODULES = ["torch", "transformers"]
+
+_TIMER = (
+    "import sys, time; start = time.perf_counter(); import {module}; seconds = time.perf_counter() - start; "
+    "print(seconds, *[name for name in {heavy!r} if name in sys.modules])"
+)
+
+
+def time_import(module: str) -> tuple[float, list[str]] | None:
+    """
+    Imports a module in a fresh interpreter and measures the time spent.
+
+    Args:
+        module: The dotted name of the module.
+
+    Returns:
+        tuple[float, list[str]] | None: The import time in seconds and the heavy libraries the
+            import pulled in, or None if the import failed.
+    """
+
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT)}
+    result = subprocess.run(
+        [sys.executable, "-c", _TIMER.format(module=module, heavy=HEAVY_MODULES)], cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        return None
+    seconds, *heavy = result.stdout.strip().splitlines()[-1].split()
+    return float(seconds), heavy
+
+
+def slowest_imports(module: str, top: int) -> list[tuple[float, str]]:
+    """
+    Lists the direct imports of a module that take the longest, using `python -X importtime`.
+
+    Args:
+        module: The dotted name of the module.
+        top: Number of imports to return.
+
+    Returns:
+        list[tuple[float, str]]: The cumulative import time in seconds and the name of every import.
+    """
+
+    env = {**os.environ, "PYTHONPATH": str(PROJECT_ROOT)}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=PROJECT_ROOT, env=env,
+        capture_output=True, text=True
+    )
+
+    # Lines look like "import time:  self [us] | cumulative | <indent>name", with two more spaces of
+    # indent per nesting level, so the direct imports of the module are indented by three spaces
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if len(name) - len(name.lstrip()) == 3:
+            imports.append((int(cumulative) / 1e6, name.strip()))
+    return sorted(imports, reverse=True)[:top]
+
+
+def main(modules: list[str], repeats: int, top: int, max_seconds: float | None) -> None:
+    """
+    Prints the median cold import time of every module over fresh interpreters, the heavy
+    libraries it imports, and the imports that cost the most for each of them.
+
+    Args:
+        modules: The dotted names of the modules.
+        repeats: Number of fresh interpreters per module.
+        top: Number of slowest imports listed per module.
+        max_seconds: Budget of the median import time. When given, the command exits with status 1
+            if a module exceeds it.
+    """
+
+    over_budget = []
+    for module in modules:
+        results = [time_import(module) for _ in range(repeats)]
+        if None in results:
+            print(f"{module:<45} import failed")
+            continue
+
+        timings = [seconds for seconds, _ in results]
+        median = statistics.median(timings)
+        heavy = ", ".join(results[0][1]) or "-"
+        print(f"{module:<45} median {median:6.2f} s  min {min(timings):6.2f} s  imports {heavy}")
+        for seconds, name in slowest_imports(module, top):
+            print(f"    {seconds:6.2f} s  {name}")
+
+        if max_seconds is not None and median > max_seconds:
+            over_budget.append(module)
+
+    if over_budget:
+        print(f"Over the {max_seconds} s budget: {', '.join(over_budget)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the cold import time of the application modules.")
+    parser.add_argument("--modules", nargs="+", default=DEFAULT_MODULES, help="Modules to import.")
+    parser.add_argument("--repeats", type=int, default=3, help="Fresh interpreters per module.")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per module.")
+    parser.add_argument("--max-seconds", type=float, default=None, help="Fail when a median import time exceeds it.")
+    args = parser.parse_args()
+
+    main(args.modules, args.repeats, args.top, args.max_seconds)
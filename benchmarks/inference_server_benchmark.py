@@ -0,0 +1,138 @@
+
+import argparse
+import asyncio
+import concurrent.futures
+import tempfile
+import threading
+import time
+import numpy as np
+import tornado.httpserver
+import tornado.netutil
+from pathlib import Path
+from benchmarks import tiny_models
+from src.inference_server import client, server
+from tools.models import google_flan
+
+
+def _start_server(max_batch_size: int, max_wait_ms: float) -> tuple[int, asyncio.AbstractEventLoop]:
+    """
+    Starts the inference server on a free local port in a background thread.
+
+    Returns:
+        tuple[int, asyncio.AbstractEventLoop]: The port and the event loop of the server.
+    """
+
+    loop = asyncio.new_event_loop()
+    started = threading.Event()
+    port = []
+
+    def run():
+        asyncio.set_event_loop(loop)
+        sockets = tornado.netutil.bind_sockets(0, "127.0.0.1")
+        http_server = tornado.httpserver.HTTPServer(
+            server.make_app(server.InferenceService(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms))
+        )
+        http_server.add_sockets(sockets)
+        port.append(sockets[0].getsockname()[1])
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    started.wait()
+    return port[0], loop
+
+
+def _load_test(inference_client: client.InferenceClient, call, texts: list[str], concurrency: int) -> dict:
+    """
+    Sends every text through the given call from several client threads at once.
+
+    Returns:
+        dict: The throughput in requests per second and the latency percentiles in milliseconds.
+    """
+
+    def timed(text):
+        start = time.perf_counter()
+        call(inference_client, text)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(executor.map(timed, texts))
+    elapsed = time.perf_counter() - start
+
+    return {
+        "throughput": len(texts) / elapsed,
+        "p50": float(np.percentile(latencies, 50)) * 1000,
+        "p99": float(np.percentile(latencies, 99)) * 1000
+    }
+
+
+def main(model_dir: Path, requests: int, concurrency_levels: list[int], max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Measures the throughput and tail latency of the inference server with and without dynamic
+    micro-batching, using tiny T5, BART and GLiNER models, and checks that the batched outputs
+    are the same as those of the local model wrappers.
+
+    Args:
+        model_dir: Folder where the tiny models are written.
+        requests: Number of requests sent per model and concurrency level.
+        concurrency_levels: Numbers of concurrent client threads to test.
+        max_batch_size: Maximum batch size of the batching server.
+        max_wait_ms: Batching window of the batching server, in milliseconds.
+    """
+
+    texts = tiny_models.synthetic_sentences(requests, min_words=20, max_words=60)
+    t5_path = str(tiny_models.build_tiny_t5(model_dir.joinpath("t5")))
+    bart_path = str(tiny_models.build_tiny_bart(model_dir.joinpath("bart")))
+    gliner_path = str(tiny_models.build_tiny_gliner(model_dir.joinpath("gliner")))
+    labels = ["Persons", "Organization", "Location"]
+
+    calls = {
+        "T5": lambda c, text: c.summarize("t5", f"summarize: {text}", t5_path, min_length=10, max_length=40),
+        "BART": lambda c, text: c.summarize("bart", text, bart_path, min_length=10, max_length=40),
+        "GLiNER": lambda c, text: c.extract_entities(text, labels, gliner_path, max_length=384)
+    }
+
+    servers = {"unbatched": _start_server(1, 0.0), "batched": _start_server(max_batch_size, max_wait_ms)}
+    clients = {name: client.InferenceClient(port=port) for name, (port, _) in servers.items()}
+
+    # Warm up the models and check the batched outputs against the local wrapper
+    for name, call in calls.items():
+        _load_test(clients["batched"], call, texts[:max_batch_size], concurrency=max_batch_size)
+    local_t5 = google_flan.GoogleFlanT5(model_name=t5_path, device="cpu")
+    batched = [calls["T5"](clients["batched"], text) for text in texts[:max_batch_size]]
+    parity = batched == [local_t5.inference(f"summarize: {t}", min_length=10, max_length=40) for t in texts[:max_batch_size]]
+    print(f"T5 batched server outputs match the local wrapper: {parity}")
+
+    print(f"{'model':<8}{'clients':>8}  {'unbatched req/s':>16}{'p99 ms':>10}  {'batched req/s':>14}{'p99 ms':>10}")
+    for name, call in calls.items():
+        for concurrency in concurrency_levels:
+            results = {mode: _load_test(c, call, texts, concurrency) for mode, c in clients.items()}
+            print(
+                f"{name:<8}{concurrency:>8}  "
+                f"{results['unbatched']['throughput']:>16.1f}{results['unbatched']['p99']:>10.1f}  "
+                f"{results['batched']['throughput']:>14.1f}{results['batched']['p99']:>10.1f}"
+            )
+
+    print(clients["batched"].health()["batchers"])
+    for _, loop in servers.values():
+        loop.call_soon_threadsafe(loop.stop)
+
+    if not parity:
+        raise SystemExit("Batched server outputs differ from the local model wrapper.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the inference server with and without micro-batching.")
+    parser.add_argument("--model-dir", type=Path, default=None, help="Folder for the tiny models.")
+    parser.add_argument("--requests", type=int, default=64, help="Requests per model and concurrency level.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="Concurrent clients.")
+    parser.add_argument("--max-batch-size", type=int, default=8, help="Maximum batch size.")
+    parser.add_argument("--max-wait-ms", type=float, default=10, help="Batching window in milliseconds.")
+    args = parser.parse_args()
+
+    if args.model_dir is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            main(Path(temp_dir), args.requests, args.concurrency, args.max_batch_size, args.max_wait_ms)
+    else:
+        main(args.model_dir, args.requests, args.concurrency, args.max_batch_size, args.max_wait_ms)
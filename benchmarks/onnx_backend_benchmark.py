@@ -0,0 +1,134 @@
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from benchmarks import tiny_models
+from tools.models import facebook_bart, gliner_ner, google_flan
+
+
+def _time_calls(function, inputs: list, repeats: int) -> tuple[list, list[float]]:
+    """
+    Calls the function on every input several times and records the latency of each call.
+
+    Args:
+        function: The function to benchmark, taking one input.
+        inputs: The inputs sent to the function.
+        repeats: Number of passes over the inputs.
+
+    Returns:
+        tuple[list, list[float]]: The outputs of the last pass and the latency of every call in seconds.
+    """
+
+    latencies = []
+    outputs = []
+    for _ in range(repeats):
+        outputs = []
+        for item in inputs:
+            start = time.perf_counter()
+            outputs.append(function(item))
+            latencies.append(time.perf_counter() - start)
+    return outputs, latencies
+
+
+def _report(name: str, torch_latencies: list[float], onnx_latencies: list[float], parity: bool) -> None:
+    torch_ms = statistics.median(torch_latencies) * 1000
+    onnx_ms = statistics.median(onnx_latencies) * 1000
+    print(
+        f"{name:<8} torch {torch_ms:8.2f} ms  onnx {onnx_ms:8.2f} ms  "
+        f"speedup {torch_ms / onnx_ms:5.2f}x  parity {parity}"
+    )
+
+
+def main(model_dir: Path, samples: int, repeats: int, threads: int) -> None:
+    """
+    Builds tiny T5, BART and GLiNER models, runs them through the PyTorch and ONNX Runtime backends
+    of the model wrappers, checks that both backends produce the same outputs and prints the
+    median latency of each backend.
+
+    Args:
+        model_dir: Folder where the tiny models and their ONNX exports are written.
+        samples: Number of synthetic texts sent to every model.
+        repeats: Number of passes over the synthetic texts.
+        threads: Number of ONNX Runtime intra-op threads. 0 lets ONNX Runtime decide.
+    """
+
+    texts = tiny_models.synthetic_sentences(samples, min_words=20, max_words=60)
+    onnx_dir = str(model_dir.joinpath("onnx"))
+    failures = []
+
+    # Flan T5 summarization
+    t5_path = str(tiny_models.build_tiny_t5(model_dir.joinpath("t5")))
+    t5_models = {
+        backend: google_flan.GoogleFlanT5(
+            model_name=t5_path, device="cpu", backend=backend, onnx_cache_dir=onnx_dir, onnx_threads=threads
+        )
+        for backend in ["torch", "onnx"]
+    }
+    results = {
+        backend: _time_calls(
+            lambda text: model.inference(f"summarize: {text}", min_length=10, max_length=40), texts, repeats
+        )
+        for backend, model in t5_models.items()
+    }
+    parity = results["torch"][0] == results["onnx"][0]
+    _report("T5", results["torch"][1], results["onnx"][1], parity)
+    failures += [] if parity else ["T5"]
+
+    # BART summarization
+    bart_path = str(tiny_models.build_tiny_bart(model_dir.joinpath("bart")))
+    bart_models = {
+        backend: facebook_bart.FacebookBart(
+            model_name=bart_path, device="cpu", task="summarization", backend=backend,
+            onnx_cache_dir=onnx_dir, onnx_threads=threads
+        )
+        for backend in ["torch", "onnx"]
+    }
+    results = {
+        backend: _time_calls(lambda text: model.inference(text, min_length=10, max_length=40), texts, repeats)
+        for backend, model in bart_models.items()
+    }
+    parity = results["torch"][0] == results["onnx"][0]
+    _report("BART", results["torch"][1], results["onnx"][1], parity)
+    failures += [] if parity else ["BART"]
+
+    # GLiNER entity recognition, compared on the extracted spans since scores differ by rounding only
+    gliner_path = str(tiny_models.build_tiny_gliner(model_dir.joinpath("gliner")))
+    gliner_models = {
+        backend: gliner_ner.GlinerNER(
+            model_name=gliner_path, device="cpu", max_length=384, backend=backend,
+            onnx_cache_dir=onnx_dir, onnx_threads=threads
+        )
+        for backend in ["torch", "onnx"]
+    }
+    labels = ["Persons", "Organization", "Location"]
+    results = {
+        backend: _time_calls(lambda text: model.inference(text, labels), texts, repeats)
+        for backend, model in gliner_models.items()
+    }
+    spans = {
+        backend: [[(e["start"], e["end"], e["label"]) for e in entities] for entities in outputs]
+        for backend, (outputs, _) in results.items()
+    }
+    parity = spans["torch"] == spans["onnx"]
+    _report("GLiNER", results["torch"][1], results["onnx"][1], parity)
+    failures += [] if parity else ["GLiNER"]
+
+    if failures:
+        raise SystemExit(f"ONNX Runtime outputs differ from PyTorch for: {', '.join(failures)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the PyTorch and ONNX Runtime backends on tiny models.")
+    parser.add_argument("--model-dir", type=Path, default=None, help="Folder for the tiny models and exports.")
+    parser.add_argument("--samples", type=int, default=16, help="Number of synthetic texts per model.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of passes over the texts.")
+    parser.add_argument("--threads", type=int, default=0, help="ONNX Runtime intra-op threads.")
+    args = parser.parse_args()
+
+    if args.model_dir is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            main(Path(temp_dir), args.samples, args.repeats, args.threads)
+    else:
+        main(args.model_dir, args.samples, args.repeats, args.threads)
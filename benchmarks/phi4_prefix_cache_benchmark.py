@@ -0,0 +1,87 @@
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from benchmarks import tiny_models
+from tools.models import microsoft_phi
+
+
+def _time_to_first_token(model: microsoft_phi.Phi4Instruct, prompts: tuple, prompt_prefix: str | None) -> float:
+    start = time.perf_counter()
+    stream = model.stream_inference(
+        *prompts, max_new_tokens=8, temperature=0.0, top_p=1.0, prompt_prefix=prompt_prefix
+    )
+    next(iter(stream))
+    elapsed = time.perf_counter() - start
+
+    # Let the generation thread finish before the next measurement
+    for _ in stream:
+        pass
+    return elapsed
+
+
+def main(model_dir: Path, prefix_words: int, samples: int, repeats: int, model_name: str | None) -> None:
+    """
+    Checks that generation resumed from the cached prompt prefix produces the same text as the
+    uncached pipeline path with greedy decoding, and compares the time to first token of both paths.
+
+    Args:
+        model_dir: Folder where the tiny model is written.
+        prefix_words: Number of words of the constant instructions placed before each transcript.
+        samples: Number of synthetic transcripts.
+        repeats: Number of passes over the transcripts for the latency measurement.
+        model_name: A Hugging Face model to benchmark instead of the tiny model, e.g. the Phi-4 model.
+    """
+
+    if model_name is None:
+        model_name = str(tiny_models.build_tiny_causal_lm(model_dir.joinpath("causal_lm")))
+    model = microsoft_phi.Phi4Instruct(model_name=model_name, model_task="text-generation")
+
+    system_prompt = "You are a helpful assistant. " + " ".join(tiny_models.synthetic_sentences(4))
+    prompt_prefix = " ".join(tiny_models.synthetic_sentences(prefix_words // 10, 10, 10, seed=7)) + "\n"
+    transcripts = tiny_models.synthetic_sentences(samples, min_words=40, max_words=80, seed=21)
+
+    # Greedy outputs of the cached path must match the uncached pipeline
+    mismatches = 0
+    for text in transcripts:
+        prompts = (system_prompt, prompt_prefix + text)
+        reference = model.inference(*prompts, max_new_tokens=32, temperature=0.0, top_p=1.0)
+        cached = model.inference(*prompts, max_new_tokens=32, temperature=0.0, top_p=1.0, prompt_prefix=prompt_prefix)
+        streamed = "".join(model.stream_inference(
+            *prompts, max_new_tokens=32, temperature=0.0, top_p=1.0, prompt_prefix=prompt_prefix
+        ))
+        mismatches += (cached != reference) + (streamed != reference)
+
+    timings = {"uncached": [], "cached": []}
+    for _ in range(repeats):
+        for text in transcripts:
+            prompts = (system_prompt, prompt_prefix + text)
+            timings["uncached"].append(_time_to_first_token(model, prompts, None))
+            timings["cached"].append(_time_to_first_token(model, prompts, prompt_prefix))
+
+    prefix_tokens = model._prefix_state(system_prompt, prompt_prefix)[0].shape[1]
+    uncached_ms = statistics.median(timings["uncached"]) * 1000
+    cached_ms = statistics.median(timings["cached"]) * 1000
+    print(f"prefix tokens {prefix_tokens}, parity {mismatches == 0}")
+    print(f"TTFT uncached {uncached_ms:8.2f} ms  cached {cached_ms:8.2f} ms  speedup {uncached_ms / cached_ms:5.2f}x")
+
+    if mismatches:
+        raise SystemExit(f"{mismatches} generations from the cached prefix differ from the uncached path")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare Phi-4 generation with and without the prompt prefix cache.")
+    parser.add_argument("--model-dir", type=Path, default=None, help="Folder for the tiny model.")
+    parser.add_argument("--model-name", default=None, help="Benchmark this model instead of a tiny one.")
+    parser.add_argument("--prefix-words", type=int, default=400, help="Words in the constant prompt prefix.")
+    parser.add_argument("--samples", type=int, default=8, help="Number of synthetic transcripts.")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of passes over the transcripts.")
+    args = parser.parse_args()
+
+    if args.model_dir is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            main(Path(temp_dir), args.prefix_words, args.samples, args.repeats, args.model_name)
+    else:
+        main(args.model_dir, args.prefix_words, args.samples, args.repeats, args.model_name)
@@ -0,0 +1,431 @@
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+from typing import Callable
+from benchmarks import tiny_models
+from src import global_configs as cf
+
+PROJECT_ROOT = Path(__file__).joinpath("..", "..").resolve()
+HISTORY_PATH = cf.DATA_PATH.joinpath("benchmarks", "stage_suite_history.json")
+BASELINE_PATH = cf.DATA_PATH.joinpath("benchmarks", "stage_suite_baseline.json")
+SAMPLING_RATE = 16000
+
+# Number of lookups timed by the pre-computed data stage
+EXTRACTION_LOOKUPS = 1000
+# Wall time growth below this many seconds is timer noise and never flagged
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def synthetic_speech(seconds: float, seed: int) -> np.ndarray:
+    """
+    Generates a deterministic speech-like waveform: voiced syllables made of a few harmonics with
+    a drifting pitch, separated by short pauses, over a low noise floor.
+
+    Args:
+        seconds: Duration of the waveform.
+        seed: Seed of the random generator.
+
+    Returns:
+        np.ndarray: A mono float32 waveform sampled at 16 kHz.
+    """
+
+    rng = np.random.default_rng(seed)
+    waveform = rng.normal(0, 0.003, int(seconds * SAMPLING_RATE)).astype(np.float32)
+
+    position = 0
+    while position < len(waveform):
+        length = int(rng.uniform(0.12, 0.35) * SAMPLING_RATE)
+        time_axis = np.arange(min(length, len(waveform) - position)) / SAMPLING_RATE
+        pitch = rng.uniform(90, 220) * (1 + 0.1 * np.sin(2 * np.pi * 3 * time_axis))
+        phase = 2 * np.pi * np.cumsum(pitch) / SAMPLING_RATE
+        syllable = sum(np.sin(harmonic * phase) / harmonic for harmonic in range(1, 5))
+        envelope = np.hanning(len(time_axis))
+        waveform[position: position + len(time_axis)] += (0.1 * envelope * syllable).astype(np.float32)
+        position += length + int(rng.uniform(0.03, 0.2) * SAMPLING_RATE)
+    return waveform
+
+
+def write_fixtures(root: Path, users: int, chapters: int, recordings: int, seconds: float, song_seconds: float) -> dict:
+    """
+    Writes the synthetic inputs of the suite: LibriSpeech style FLAC recordings in the raw data
+    folder of the data path, a song FLAC, and the tiny models.
+
+    Args:
+        root: The folder holding the data path and the models.
+        users: Number of speakers.
+        chapters: Number of chapters per speaker.
+        recordings: Number of recordings per chapter.
+        seconds: Duration of every recording.
+        song_seconds: Duration of the song.
+
+    Returns:
+        dict: The locations of the song and of the tiny models, as strings.
+    """
+
+    raw_data = root.joinpath("data", cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]["Folder_Tree"]["Raw_Data"])
+    seed = 0
+    for user_id in range(1, users + 1):
+        for chapter_id in range(1, chapters + 1):
+            chapter_dir = raw_data.joinpath(str(user_id * 100), str(chapter_id * 1000))
+            chapter_dir.mkdir(parents=True, exist_ok=True)
+            for recording_id in range(recordings):
+                seed += 1
+                sf.write(
+                    chapter_dir.joinpath(f"{user_id * 100}-{chapter_id * 1000}-{recording_id:04d}.flac"),
+                    synthetic_speech(seconds, seed), SAMPLING_RATE
+                )
+
+    song = root.joinpath("song.flac")
+    sf.write(song, synthetic_speech(song_seconds, seed + 1), SAMPLING_RATE)
+
+    models = root.joinpath("models")
+    return {
+        "song": str(song),
+        "whisper": str(tiny_models.build_tiny_whisper(models.joinpath("whisper"))),
+        "openai_whisper": str(tiny_models.build_tiny_openai_whisper(models.joinpath("openai_whisper"))),
+        "t5": str(tiny_models.build_tiny_t5(models.joinpath("t5"))),
+        "bart": str(tiny_models.build_tiny_bart(models.joinpath("bart"))),
+        "gliner": str(tiny_models.build_tiny_gliner(models.joinpath("gliner")))
+    }
+
+
+def _timed(function: Callable, *args, **kwargs) -> tuple[object, float]:
+    start = time.perf_counter()
+    output = function(*args, **kwargs)
+    return output, time.perf_counter() - start
+
+
+def _stage_metadata_gather(fixtures: dict) -> tuple[float, float, str]:
+    from src.data_ingestion import metadata_extraction
+
+    user_meta = metadata_extraction.file_structure_gather()
+    df, seconds = _timed(metadata_extraction.metadata_gather, user_meta)
+    metadata_extraction.save_metadata(df)
+    return seconds, df.height, "recordings"
+
+
+def _stage_log_mel_features(fixtures: dict) -> tuple[float, float, str]:
+    import polars as pl
+    from src.data_ingestion import metadata_extraction, text_extraction
+    from src.resources import WhisperResource
+
+    configs = cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]
+    df = pl.read_parquet(metadata_extraction.METADATA.joinpath(configs["Metadata_Configurations"]["Filename"]))
+    whisper_model = WhisperResource(model_name=fixtures["whisper"], model_task=configs["Model_Task"])
+
+    _, seconds = _timed(text_extraction.log_mel_features, df=df, whisper_model=whisper_model)
+    return seconds, df.height, "recordings"
+
+
+def _stage_speech_to_text_conversion(fixtures: dict) -> tuple[float, float, str]:
+    import polars as pl
+    from src.data_ingestion import metadata_extraction, text_extraction
+    from src.resources import WhisperResource
+
+    configs = cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]
+    df = pl.read_parquet(metadata_extraction.METADATA.joinpath(configs["Metadata_Configurations"]["Filename"]))
+    whisper_model = WhisperResource(model_name=fixtures["whisper"], model_task=configs["Model_Task"])
+    whisper_model.get_model()
+
+    transcriptions, seconds = _timed(text_extraction.speech_to_text_conversion, df=df, whisper_model=whisper_model)
+
+    # Random models transcribe noise, so the next stages read synthetic transcripts of a realistic length
+    sentences = tiny_models.synthetic_sentences(2 * transcriptions.height)
+    text_extraction.save_transcriptions(
+        transcriptions.with_columns(
+            pl.Series("recording_transcriptions", [" ".join(sentences[i: i + 2]) for i in range(0, len(sentences), 2)])
+        )
+    )
+    return seconds, df["recording_length"].sum(), "audio s"
+
+
+def _stage_create_full_dataset(fixtures: dict) -> tuple[float, float, str]:
+    import polars as pl
+    from src.data_ingestion import text_preprocessing
+
+    _, seconds = _timed(text_preprocessing.create_full_dataset)
+    combined = text_preprocessing.CONFIGS["Folder_Tree"]["Combined_Data"]
+    df = pl.read_parquet(cf.DATA_PATH.joinpath(combined["Folder_Name"], combined["Filename"]))
+    return seconds, df.height, "chapters"
+
+
+def _clear_memo(filename_key: str) -> None:
+    # Start from an empty memo table so that every chapter goes through the model
+    memo_configs = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]["Folder_Tree"]["Memo_Tables"]
+    cf.DATA_PATH.joinpath(memo_configs["Folder_Name"], memo_configs[filename_key]).unlink(missing_ok=True)
+
+
+def _stage_t5_summarization(fixtures: dict) -> tuple[float, float, str]:
+    from src.ner_summarizations import text_summarization
+    from src.resources import FlanT5Resource
+
+    _clear_memo("Summarization_Filename")
+    data = text_summarization.data_sourcing()
+    t5_model = FlanT5Resource(model_name=fixtures["t5"])
+    t5_model.get_model()
+
+    df, seconds = _timed(text_summarization.t5_summarization, data=data, t5_model=t5_model)
+    text_summarization.save_summaries(df)
+    return seconds, df.height, "chapters"
+
+
+def _stage_entity_recognition(fixtures: dict) -> tuple[float, float, str]:
+    from src.ner_summarizations import ner_detection, text_summarization
+    from src.resources import GlinerResource
+
+    _clear_memo("Named_Entity_Filename")
+    data = text_summarization.data_sourcing()
+    gliner_model = GlinerResource(
+        model_name=fixtures["gliner"],
+        max_length=cf.MODELS_CONFIG[ner_detection.CONFIGS["Named_Entity_Models"]["Gliner_Identifier"]]["Maximum_Length"]
+    )
+    gliner_model.get_model()
+
+    df, seconds = _timed(ner_detection.entity_recognition, data=data, gliner_model=gliner_model)
+    ner_detection.save_entities(df)
+    return seconds, df.height, "chapters"
+
+
+def _stage_combine_data(fixtures: dict) -> tuple[float, float, str]:
+    import polars as pl
+    from src.ner_summarizations import combine_results
+
+    folder_tree = combine_results.CONFIGS["Folder_Tree"]
+    df_entities = pl.read_parquet(
+        cf.DATA_PATH.joinpath(folder_tree["Named_Entity_Outputs"]["Folder_Name"], folder_tree["Named_Entity_Outputs"]["Filename"])
+    )
+    df_summarized = pl.read_parquet(
+        cf.DATA_PATH.joinpath(folder_tree["Summarization_Outputs"]["Folder_Name"], folder_tree["Summarization_Outputs"]["Filename"])
+    )
+
+    _, seconds = _timed(combine_results.combine_data, df_entities, df_summarized)
+    return seconds, df_summarized.height, "chapters"
+
+
+def _stage_main_extraction(fixtures: dict) -> tuple[float, float, str]:
+    import polars as pl
+    from src.speech_inference import pre_compute
+
+    ids = pl.read_parquet(cf.DATA_PATH.joinpath(pre_compute.CONFIGS["Speech_Modeled_Data"]))["id"].to_list()
+    lookups = (ids * math.ceil(EXTRACTION_LOOKUPS / len(ids)))[:EXTRACTION_LOOKUPS]
+
+    _, seconds = _timed(lambda: [pre_compute.main_extraction(id) for id in lookups])
+    return seconds, len(lookups), "lookups"
+
+
+def _stage_full_inference_pipeline(fixtures: dict) -> tuple[float, float, str]:
+    import whisper
+    from transformers import pipeline
+    from src.song_inference import inference_pipeline, ner, summarize
+    from tools.models import gliner_ner, model_registry
+
+    # Register the tiny models under the keys of the models the song pipeline loads
+    registry = model_registry.MODEL_REGISTRY
+    registry.get(("OpenAIWhisper", "base", "cpu"), lambda: whisper.load_model(fixtures["openai_whisper"]))
+    registry.get(
+        ("SummarizationPipeline", summarize._BART_MODEL, "cpu"),
+        lambda: pipeline("summarization", model=fixtures["bart"], device=-1)
+    )
+    registry.get(ner._MODEL_KEY, lambda: gliner_ner.GlinerNER(fixtures["gliner"], device="cpu", max_length=None))
+
+    _, seconds = _timed(
+        inference_pipeline.full_inference_pipeline,
+        file=fixtures["song"], transcription_model="base", summary_model="bart"
+    )
+    return seconds, sf.info(fixtures["song"]).duration, "audio s"
+
+
+# Stages in pipeline order, every stage reading what the previous ones wrote in the data path
+STAGES: dict[str, Callable[[dict], tuple[float, float, str]]] = {
+    "metadata_gather": _stage_metadata_gather,
+    "log_mel_features": _stage_log_mel_features,
+    "speech_to_text_conversion": _stage_speech_to_text_conversion,
+    "create_full_dataset": _stage_create_full_dataset,
+    "t5_summarization": _stage_t5_summarization,
+    "entity_recognition": _stage_entity_recognition,
+    "combine_data": _stage_combine_data,
+    "main_extraction": _stage_main_extraction,
+    "full_inference_pipeline": _stage_full_inference_pipeline
+}
+
+
+def run_stage(name: str, fixtures: dict) -> dict:
+    """
+    Runs one stage and measures it. Called in a fresh process per stage, so that the peak
+    resident memory belongs to that stage alone.
+
+    Args:
+        name: The name of the stage in `STAGES`.
+        fixtures: The locations returned by `write_fixtures`.
+
+    Returns:
+        dict: The wall time in seconds, the number of items processed and their unit, and the
+            peak resident memory of the process in MB.
+    """
+
+    seconds, items, unit = STAGES[name](fixtures)
+    return {
+        "wall_seconds": seconds,
+        "items": float(items),
+        "unit": unit,
+        # ru_maxrss is reported in kilobytes on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    }
+
+
+def run_suite(repeats: int, users: int, chapters: int, recordings: int, seconds: float, song_seconds: float) -> dict:
+    """
+    Writes the fixtures in a temporary folder and runs every stage on them, each repeat in a fresh
+    process pointed at the temporary data path.
+
+    Args:
+        repeats: Number of runs of every stage. The median wall time is kept.
+        users: Number of synthetic speakers.
+        chapters: Number of chapters per speaker.
+        recordings: Number of recordings per chapter.
+        seconds: Duration of every recording.
+        song_seconds: Duration of the synthetic song.
+
+    Returns:
+        dict: The wall time, items, throughput and peak memory of every stage.
+    """
+
+    with tempfile.TemporaryDirectory() as root:
+        fixtures = write_fixtures(Path(root), users, chapters, recordings, seconds, song_seconds)
+
+        # The stage processes read the data path of the global configurations from the environment
+        previous = os.environ.get("VOICE2TEXT_DATA_PATH")
+        os.environ["VOICE2TEXT_DATA_PATH"] = str(Path(root).joinpath("data"))
+        context = multiprocessing.get_context("spawn")
+        results = {}
+        try:
+            for name in STAGES:
+                runs = []
+                for _ in range(repeats):
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                        runs.append(executor.submit(run_stage, name, fixtures).result())
+
+                wall_seconds = statistics.median(run["wall_seconds"] for run in runs)
+                results[name] = {
+                    "wall_seconds": wall_seconds,
+                    "items": runs[0]["items"],
+                    "unit": runs[0]["unit"],
+                    "throughput": runs[0]["items"] / wall_seconds,
+                    "peak_rss_mb": max(run["peak_rss_mb"] for run in runs)
+                }
+                print(
+                    f"{name:<26} {wall_seconds:9.3f} s  {results[name]['throughput']:10.2f} {runs[0]['unit']}/s  "
+                    f"peak RSS {results[name]['peak_rss_mb']:8.1f} MB"
+                )
+        finally:
+            if previous is None:
+                os.environ.pop("VOICE2TEXT_DATA_PATH")
+            else:
+                os.environ["VOICE2TEXT_DATA_PATH"] = previous
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """
+    Lists the stages whose wall time or peak memory grew by more than the threshold against the
+    baseline, ignoring wall time growth below the noise floor.
+
+    Args:
+        results: The stage results of the current run.
+        baseline: The stage results of the baseline run.
+        threshold: The tolerated relative growth, e.g. 0.2 for 20%.
+
+    Returns:
+        list[str]: A description of every regression, empty if there is none.
+    """
+
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in ("wall_seconds", "peak_rss_mb"):
+            change = result[metric] / baseline[name][metric] - 1
+            print(f"{name:<26} {metric:<13} {baseline[name][metric]:10.3f} -> {result[metric]:10.3f}  {change:+7.1%}")
+            if metric == "wall_seconds" and result[metric] - baseline[name][metric] < NOISE_FLOOR_SECONDS:
+                continue
+            if change > threshold:
+                regressions.append(f"{name} {metric} grew by {change:.1%}")
+    return regressions
+
+
+def _git_commit() -> str | None:
+    result = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True)
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def main(args: argparse.Namespace) -> int:
+    """
+    Runs the suite, appends its results to the JSON history and optionally stores them as the
+    baseline or compares them with it.
+
+    Returns:
+        int: The exit code, 1 when the comparison finds a regression.
+    """
+
+    results = run_suite(args.repeats, args.users, args.chapters, args.recordings, args.seconds, args.song_seconds)
+    entry = {
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "stages": results
+    }
+
+    # Keep every run in the history file
+    args.history.parent.mkdir(parents=True, exist_ok=True)
+    history = json.loads(args.history.read_text()) if args.history.exists() else []
+    args.history.write_text(json.dumps([*history, entry], indent=2))
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(entry, indent=2))
+        print(f"Saved the baseline to {args.baseline}.")
+
+    if args.compare:
+        if not args.baseline.exists():
+            print(f"No baseline found at {args.baseline}, run with --save-baseline first.")
+            return 1
+        regressions = compare(results, json.loads(args.baseline.read_text())["stages"], args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage offline with synthetic audio and tiny models.")
+    parser.add_argument("--repeats", type=int, default=3, help="Runs of every stage, the median wall time is kept.")
+    parser.add_argument("--users", type=int, default=2, help="Synthetic speakers.")
+    parser.add_argument("--chapters", type=int, default=2, help="Chapters per speaker.")
+    parser.add_argument("--recordings", type=int, default=3, help="Recordings per chapter.")
+    parser.add_argument("--seconds", type=float, default=4.0, help="Duration of every recording.")
+    parser.add_argument("--song-seconds", type=float, default=40.0, help="Duration of the synthetic song.")
+    parser.add_argument("--history", type=Path, default=HISTORY_PATH, help="JSON file the results are appended to.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="JSON file of the baseline results.")
+    parser.add_argument("--save-baseline", action="store_true", help="Store the results as the new baseline.")
+    parser.add_argument("--compare", action="store_true", help="Flag the stages slower or larger than the baseline.")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Tolerated relative growth before flagging.")
+
+    sys.exit(main(parser.parse_args()))
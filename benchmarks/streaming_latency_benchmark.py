@@ -0,0 +1,83 @@
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from benchmarks import tiny_models
+from benchmarks.stage_suite import synthetic_speech
+from src import global_configs as cf
+from src.speech_inference.streaming import StreamingTranscriber, replay
+from tools.models.whisper_ai import WhisperAI
+from tools.utils import audio_utils
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    # Nearest-rank percentile, the lists measured here are short
+    ordered = sorted(values)
+    return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+
+def main(audio: Path | None, model_name: str | None, seconds: float, step_seconds: float | None, agreement: int | None) -> None:
+    """
+    Replays a recording at real time pace through the streaming transcriber and prints the commit
+    latency of its words: the wall time from the moment the audio of a word had been sent to the
+    moment the word was committed. Without a model, a tiny randomly initialized Whisper is used,
+    which measures the overhead of the stabilization and not the quality of the transcript.
+
+    Args:
+        audio: The recording, or None for synthetic speech.
+        model_name: The name or path of the Whisper model, or None for the tiny model.
+        seconds: Duration of the synthetic speech.
+        step_seconds: Seconds of new audio between two decodings. Defaults to the configured value.
+        agreement: Consecutive hypotheses agreeing on a word to commit it. Defaults to the configured value.
+    """
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_name = model_name or str(tiny_models.build_tiny_whisper(Path(tmp)))
+        model = WhisperAI(model_name, "automatic-speech-recognition", "cpu")
+        waveform = (
+            audio_utils.decode_audio(audio, sampling_rate=audio_utils.SAMPLING_RATE) if audio is not None
+            else synthetic_speech(seconds, seed=0)
+        )
+
+        # Warm up so that one-off initialization is not timed
+        model.inference([waveform[: audio_utils.SAMPLING_RATE]], 10, cf.MODELS_CONFIG["Whisper_AI_Configurations"]["Language_Selection"])
+
+        transcriber = StreamingTranscriber(model, step_seconds=step_seconds, agreement=agreement)
+        latencies, decodes, partials = [], [], 0
+        start = time.perf_counter()
+        for update in transcriber.transcribe(replay(waveform)):
+            committed_at = time.perf_counter() - start
+            # In real time, the audio up to a stream position was sent that many seconds after the start
+            latencies.extend(committed_at - end for end in update.word_end_seconds)
+            decodes.append(update.decode_seconds)
+            partials += bool(update.partial)
+        wall_seconds = time.perf_counter() - start
+
+    audio_seconds = len(waveform) / audio_utils.SAMPLING_RATE
+    print(
+        f"{audio_seconds:.1f} s of audio streamed in {wall_seconds:.1f} s, {len(decodes)} decodings "
+        f"(mean {statistics.mean(decodes):.3f} s, RTF {sum(decodes) / audio_seconds:.3f}), {partials} partial updates"
+    )
+    if latencies:
+        print(
+            f"{len(latencies)} words committed, latency p50 {percentile(latencies, 0.5):.2f} s  "
+            f"p95 {percentile(latencies, 0.95):.2f} s  max {max(latencies):.2f} s "
+            f"(bound {transcriber.max_buffer_seconds + transcriber.step_seconds:.1f} s plus a decoding)"
+        )
+    else:
+        print("No word committed.")
+    print(f"Transcript: {transcriber.transcript[:200]}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure the commit latency of the streaming transcription in real time.")
+    parser.add_argument("--audio", type=Path, help="Recording replayed as a live stream, synthetic speech by default.")
+    parser.add_argument("--model", help="Whisper model name or path, a tiny random model by default.")
+    parser.add_argument("--seconds", type=float, default=30, help="Duration of the synthetic speech.")
+    parser.add_argument("--step-seconds", type=float, help="Seconds of new audio between two decodings.")
+    parser.add_argument("--agreement", type=int, help="Consecutive hypotheses agreeing on a word to commit it.")
+    args = parser.parse_args()
+
+    main(args.audio, args.model, args.seconds, args.step_seconds, args.agreement)
@@ -0,0 +1,255 @@
+
+import json
+import random
+import torch
+from pathlib import Path
+
+# Small vocabulary used to build tokenizers and synthetic text without network access
+WORDS = (
+    "the a an and or but of to in on at by for with from about into over after before under between "
+    "i you he she it we they me him her us them my your his its our their this that these those "
+    "is are was were be been being have has had do does did will would can could should may might "
+    "said told asked went came saw made took gave found knew thought looked wanted used called "
+    "man woman child king queen captain doctor teacher friend mother father brother sister people "
+    "house city river mountain road ship church school garden forest village island street castle "
+    "day night morning evening year time moment week month hour life world story letter book voice "
+    "good great little old young long new first last small large dark bright quiet strange happy "
+    "london paris rome boston france england america europe thames mary john thomas elizabeth henry "
+    "company bank army navy council society church college university parliament court office"
+).split()
+SENTENCES_SEED = 13
+
+
+def synthetic_sentences(count: int, min_words: int = 6, max_words: int = 18, seed: int = SENTENCES_SEED) -> list[str]:
+    """
+    Generates deterministic pseudo English sentences from the tiny vocabulary.
+
+    Args:
+        count: Number of sentences to generate.
+        min_words: Minimum number of words per sentence.
+        max_words: Maximum number of words per sentence.
+        seed: Seed of the random generator.
+
+    Returns:
+        list[str]: The generated sentences.
+    """
+
+    rng = random.Random(seed)
+    sentences = []
+    for _ in range(count):
+        words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+        sentences.append(" ".join(words).capitalize() + ".")
+    return sentences
+
+
+def _byte_level_vocab() -> dict[str, int]:
+    """
+    Returns a byte-level BPE vocabulary with one entry per byte and no merges.
+    """
+
+    from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+
+    return {char: idx for idx, char in enumerate(bytes_to_unicode().values())}
+
+
+def build_tiny_t5(save_dir: Path) -> Path:
+    """
+    Builds a randomly initialized T5 model with a SentencePiece tokenizer trained on synthetic text,
+    loadable by `GoogleFlanT5` from the returned directory.
+    """
+
+    import sentencepiece as spm
+    from transformers import T5Config, T5ForConditionalGeneration, T5Tokenizer
+
+    save_dir.mkdir(parents=True, exist_ok=True)
+    spm.SentencePieceTrainer.train(
+        sentence_iterator=iter(synthetic_sentences(2000)),
+        model_prefix=str(save_dir.joinpath("spiece")),
+        vocab_size=400,
+        model_type="unigram",
+        pad_id=0, eos_id=1, unk_id=2, bos_id=-1,
+        minloglevel=2
+    )
+    tokenizer = T5Tokenizer(vocab_file=str(save_dir.joinpath("spiece.model")), extra_ids=0, legacy=True)
+    tokenizer.save_pretrained(save_dir)
+
+    torch.manual_seed(0)
+    config = T5Config(
+        vocab_size=len(tokenizer), d_model=32, d_kv=8, d_ff=64, num_layers=2, num_decoder_layers=2,
+        num_heads=4, decoder_start_token_id=0, pad_token_id=0, eos_token_id=1
+    )
+    T5ForConditionalGeneration(config).eval().save_pretrained(save_dir)
+    return save_dir
+
+
+def build_tiny_bart(save_dir: Path) -> Path:
+    """
+    Builds a randomly initialized BART model with a byte-level BPE tokenizer, loadable by
+    `FacebookBart` from the returned directory.
+    """
+
+    from transformers import BartConfig, BartForConditionalGeneration, BartTokenizer
+
+    save_dir.mkdir(parents=True, exist_ok=True)
+    vocab = {"<s>": 0, "<pad>": 1, "</s>": 2, "<unk>": 3}
+    vocab.update({char: idx + 4 for char, idx in _byte_level_vocab().items()})
+    vocab["<mask>"] = len(vocab)
+    save_dir.joinpath("vocab.json").write_text(json.dumps(vocab), encoding="utf-8")
+    save_dir.joinpath("merges.txt").write_text("#version: 0.2\n", encoding="utf-8")
+    tokenizer = BartTokenizer(
+        vocab_file=str(save_dir.joinpath("vocab.json")),
+        merges_file=str(save_dir.joinpath("merges.txt"))
+    )
+    tokenizer.save_pretrained(save_dir)
+
+    torch.manual_seed(0)
+    config = BartConfig(
+        vocab_size=len(vocab), d_model=32, encoder_layers=2, decoder_layers=2, encoder_attention_heads=4,
+        decoder_attention_heads=4, encoder_ffn_dim=64, decoder_ffn_dim=64, max_position_embeddings=2048,
+        forced_bos_token_id=0, forced_eos_token_id=2, no_repeat_ngram_size=3
+    )
+    BartForConditionalGeneration(config).eval().save_pretrained(save_dir)
+    return save_dir
+
+
+def build_tiny_gliner(save_dir: Path, bi_encoder: bool = False) -> Path:
+    """
+    Builds a randomly initialized span GLiNER model on top of a tiny BERT encoder, loadable by
+    `GlinerNER` from the returned directory. A bi-encoder model encodes the labels with a second
+    tiny BERT, apart from the text.
+    """
+
+    from gliner import GLiNER, GLiNERConfig
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+
+    encoder_dir = save_dir.joinpath("encoder")
+    encoder_dir.mkdir(parents=True, exist_ok=True)
+    tokens = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]", *sorted(set(WORDS)), ".", ",", "'"]
+    encoder_dir.joinpath("vocab.txt").write_text("\n".join(tokens), encoding="utf-8")
+    tokenizer = BertTokenizerFast(vocab_file=str(encoder_dir.joinpath("vocab.txt")), do_lower_case=True)
+    tokenizer.save_pretrained(encoder_dir)
+
+    torch.manual_seed(0)
+    bert_config = BertConfig(
+        vocab_size=len(tokens), hidden_size=32, num_hidden_layers=2, num_attention_heads=4,
+        intermediate_size=64, max_position_embeddings=512
+    )
+    BertModel(bert_config).save_pretrained(encoder_dir)
+
+    config = GLiNERConfig(
+        model_name=str(encoder_dir), labels_encoder=str(encoder_dir) if bi_encoder else None,
+        hidden_size=32, max_width=4, max_len=384, dropout=0.0
+    )
+    model = GLiNER.load_from_config(config)
+    if bi_encoder:
+        # The saved configuration gives the labels encoder the vocabulary of the text encoder, which
+        # grew with the GLiNER special tokens, so its embeddings are grown the same way
+        token_rep_layer = model.model.token_rep_layer
+        token_rep_layer.labels_encoder.model.resize_token_embeddings(
+            token_rep_layer.bert_layer.model.embeddings.word_embeddings.num_embeddings
+        )
+    model.save_pretrained(save_dir)
+    return save_dir
+
+
+def build_tiny_causal_lm(save_dir: Path) -> Path:
+    """
+    Builds a randomly initialized Llama style causal language model with a byte-level tokenizer and
+    a Phi-4 style chat template, loadable by `Phi4Instruct` from the returned directory.
+    """
+
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+    from transformers import LlamaConfig, LlamaForCausalLM, PreTrainedTokenizerFast
+
+    save_dir.mkdir(parents=True, exist_ok=True)
+    special_tokens = ["<|endoftext|>", "<|system|>", "<|user|>", "<|assistant|>", "<|end|>"]
+    vocab = {token: idx for idx, token in enumerate(special_tokens)}
+    vocab.update({char: idx + len(special_tokens) for char, idx in _byte_level_vocab().items()})
+
+    backend = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    backend.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    backend.decoder = decoders.ByteLevel()
+    tokenizer = PreTrainedTokenizerFast(
+        tokenizer_object=backend, eos_token="<|endoftext|>", additional_special_tokens=special_tokens[1:]
+    )
+    tokenizer.chat_template = (
+        "{% for message in messages %}<|{{ message['role'] }}|>{{ message['content'] }}<|end|>{% endfor %}"
+        "{% if add_generation_prompt %}<|assistant|>{% endif %}"
+    )
+    tokenizer.save_pretrained(save_dir)
+
+    torch.manual_seed(0)
+    config = LlamaConfig(
+        vocab_size=len(vocab), hidden_size=64, intermediate_size=128, num_hidden_layers=4, num_attention_heads=4,
+        num_key_value_heads=4, max_position_embeddings=4096, bos_token_id=0, eos_token_id=0
+    )
+    LlamaForCausalLM(config).eval().save_pretrained(save_dir)
+    return save_dir
+
+
+def build_tiny_whisper(save_dir: Path) -> Path:
+    """
+    Builds a randomly initialized Whisper model with a byte-level tokenizer holding the English
+    transcription special tokens, loadable by `WhisperAI` from the returned directory.
+    """
+
+    from transformers import (
+        GenerationConfig, WhisperConfig, WhisperFeatureExtractor, WhisperForConditionalGeneration,
+        WhisperProcessor, WhisperTokenizer
+    )
+
+    save_dir.mkdir(parents=True, exist_ok=True)
+    save_dir.joinpath("vocab.json").write_text(json.dumps(_byte_level_vocab()), encoding="utf-8")
+    save_dir.joinpath("merges.txt").write_text("#version: 0.2\n", encoding="utf-8")
+    tokenizer = WhisperTokenizer(
+        vocab_file=str(save_dir.joinpath("vocab.json")), merges_file=str(save_dir.joinpath("merges.txt")),
+        unk_token="<|endoftext|>", bos_token="<|endoftext|>", eos_token="<|endoftext|>", pad_token="<|endoftext|>"
+    )
+    tokenizer.add_special_tokens({"additional_special_tokens": [
+        "<|startoftranscript|>", "<|en|>", "<|translate|>", "<|transcribe|>", "<|startoflm|>", "<|startofprev|>",
+        "<|nocaptions|>", "<|notimestamps|>"
+    ]})
+    WhisperProcessor(feature_extractor=WhisperFeatureExtractor(feature_size=80), tokenizer=tokenizer).save_pretrained(save_dir)
+
+    token_id = tokenizer.convert_tokens_to_ids
+    torch.manual_seed(0)
+    config = WhisperConfig(
+        vocab_size=len(tokenizer), num_mel_bins=80, d_model=32, encoder_layers=1, decoder_layers=1,
+        encoder_attention_heads=2, decoder_attention_heads=2, encoder_ffn_dim=64, decoder_ffn_dim=64,
+        pad_token_id=token_id("<|endoftext|>"), bos_token_id=token_id("<|endoftext|>"),
+        eos_token_id=token_id("<|endoftext|>"), decoder_start_token_id=token_id("<|startoftranscript|>"),
+        suppress_tokens=[], begin_suppress_tokens=[]
+    )
+    model = WhisperForConditionalGeneration(config).eval()
+    model.generation_config = GenerationConfig(
+        decoder_start_token_id=token_id("<|startoftranscript|>"), bos_token_id=token_id("<|endoftext|>"),
+        eos_token_id=token_id("<|endoftext|>"), pad_token_id=token_id("<|endoftext|>"), max_length=448,
+        is_multilingual=True, lang_to_id={"<|en|>": token_id("<|en|>")},
+        task_to_id={"transcribe": token_id("<|transcribe|>"), "translate": token_id("<|translate|>")},
+        no_timestamps_token_id=token_id("<|notimestamps|>"), suppress_tokens=[], begin_suppress_tokens=[]
+    )
+    model.save_pretrained(save_dir)
+    return save_dir
+
+
+def build_tiny_openai_whisper(save_dir: Path) -> Path:
+    """
+    Saves a randomly initialized openai-whisper checkpoint with the multilingual vocabulary, loadable
+    by `whisper.load_model` from the returned file.
+    """
+
+    from whisper.model import ModelDimensions, Whisper
+
+    save_dir.mkdir(parents=True, exist_ok=True)
+    torch.manual_seed(0)
+    dims = ModelDimensions(
+        n_mels=80, n_audio_ctx=1500, n_audio_state=64, n_audio_head=2, n_audio_layer=1,
+        n_vocab=51865, n_text_ctx=448, n_text_state=64, n_text_head=2, n_text_layer=1
+    )
+    model = Whisper(dims)
+    # The decoder positional embedding is allocated uninitialized, checkpoints always overwrite it
+    torch.nn.init.normal_(model.decoder.positional_embedding, std=0.01)
+
+    checkpoint = save_dir.joinpath("tiny_whisper.pt")
+    torch.save({"dims": dims.__dict__, "model_state_dict": model.state_dict()}, checkpoint)
+    return checkpoint
@@ -1,18 +1,12 @@
 
-from dagster import load_assets_from_package_module, Definitions
-from src import data_ingestion, ner_summarizations
-from src import jobs
+def __getattr__(name: str):
+    # Build the Dagster definitions on first access only, so that importing a module of the package,
+    # e.g. `src.global_configs` from the Streamlit application, does not load Dagster and every asset
+    if name == "defs":
+        from src.definitions import defs
+        return defs
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Load all assets definitions
-data_ingestion_assets = load_assets_from_package_module(package_module=data_ingestion)
-modeling_assets = load_assets_from_package_module(package_module=ner_summarizations)
-all_assets = [
-    *data_ingestion_assets, *modeling_assets
-]
 
-defs = Definitions(
-    assets=all_assets,
-    jobs=[
-        jobs.run_download_pipeline, jobs.run_modeling_pipeline
-    ]
-)
+def __dir__() -> list[str]:
+    return [*globals(), "defs"]
@@ -0,0 +1,179 @@
+
+import contextlib
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+import psutil
+import polars as pl
+import dagster as dg
+from tools.utils import profiling, runtime_policy
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two samples of the resident memory while an asset runs
+RSS_SAMPLING_SECONDS = 0.05
+
+# Metrics recorded by the asset currently running in this thread, None outside of an instrumented asset
+_METRICS: contextvars.ContextVar[dict | None] = contextvars.ContextVar("asset_metrics", default=None)
+
+
+def record(**metrics) -> None:
+    """
+    Records metrics of the running asset, to be attached to its materialization. Recognized
+    metrics are "rows", "audio_seconds", "inference_seconds", "model_load_seconds" and
+    "output_file", any other value is attached as it is. Does nothing outside of an
+    instrumented asset.
+
+    Args:
+        **metrics: The metrics, overriding the ones recorded earlier under the same names.
+    """
+
+    current = _METRICS.get()
+    if current is not None:
+        current.update(metrics)
+
+
+@contextlib.contextmanager
+def timed(metric: str = "inference_seconds"):
+    """
+    Adds the seconds spent in the block to a metric of the running asset, so that a loop over
+    batches accumulates the time of every batch.
+
+    Args:
+        metric: The name of the metric.
+    """
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current = _METRICS.get()
+        if current is not None:
+            current[metric] = current.get(metric, 0.0) + time.perf_counter() - start
+
+
+class _PeakRss:
+    """
+    Samples the resident memory of the process on a background thread, since `ru_maxrss` only
+    reports the peak of the whole process lifetime and not the peak of one asset.
+    """
+
+    def __init__(self):
+        self._process = psutil.Process()
+        self._stop = threading.Event()
+        self.start_bytes = self.peak_bytes = self._process.memory_info().rss
+        self._thread = threading.Thread(target=self._sample, name="asset-rss", daemon=True)
+
+    def _sample(self) -> None:
+        while not self._stop.wait(RSS_SAMPLING_SECONDS):
+            self.peak_bytes = max(self.peak_bytes, self._process.memory_info().rss)
+
+    def __enter__(self) -> "_PeakRss":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak_bytes = max(self.peak_bytes, self._process.memory_info().rss)
+
+
+def _rows(result: object) -> int | None:
+    # Assets return a DataFrame, or a dictionary holding one under "df"
+    if isinstance(result, dict):
+        result = result.get("df")
+    return result.height if isinstance(result, pl.DataFrame) else None
+
+
+def performance_metadata(metrics: dict, result: object, wall_seconds: float, rss: _PeakRss) -> dict:
+    """
+    Derives the performance metadata of an asset run from the metrics it recorded.
+
+    Args:
+        metrics: The metrics recorded by the asset with `record` and `timed`.
+        result: The value returned by the asset, used to count rows when none were recorded.
+        wall_seconds: The seconds the asset took.
+        rss: The resident memory sampled while the asset ran.
+
+    Returns:
+        dict: The metadata, with throughputs and the real time factor (RTF, inference seconds per
+            second of audio) when the asset recorded the metrics they are computed from, and the
+            thread settings of the process.
+    """
+
+    metrics = dict(metrics)
+    rows = metrics.pop("rows", _rows(result))
+    audio_seconds = metrics.pop("audio_seconds", None)
+    inference_seconds = metrics.pop("inference_seconds", None)
+    output_file = metrics.pop("output_file", None)
+
+    metadata = {
+        "wall_seconds": round(wall_seconds, 3),
+        "peak_rss_mb": round(rss.peak_bytes / 2 ** 20, 1),
+        "rss_growth_mb": round((rss.peak_bytes - rss.start_bytes) / 2 ** 20, 1)
+    }
+    if rows is not None:
+        metadata["rows"] = rows
+        metadata["items_per_second"] = round(rows / wall_seconds, 3) if wall_seconds > 0 else 0.0
+    if inference_seconds is not None:
+        metadata["inference_seconds"] = round(inference_seconds, 3)
+    if audio_seconds is not None:
+        metadata["audio_seconds"] = round(audio_seconds, 3)
+        if inference_seconds:
+            metadata["audio_seconds_per_second"] = round(audio_seconds / inference_seconds, 3)
+            metadata["rtf"] = round(inference_seconds / audio_seconds, 4) if audio_seconds > 0 else 0.0
+    if output_file is not None and os.path.exists(output_file):
+        metadata["output_file"] = dg.MetadataValue.path(str(output_file))
+        metadata["output_file_mb"] = round(os.path.getsize(output_file) / 2 ** 20, 3)
+
+    # The threads and cores the asset ran with, then anything else it recorded, e.g. the model load metadata
+    metadata.update(runtime_policy.effective_settings())
+    metadata.update(metrics)
+    return metadata
+
+
+def instrument_asset(function):
+    """
+    Decorates the function of an asset, placed under `dg.asset`, to attach performance metadata
+    to every materialization: wall time, peak resident memory, rows and items per second, the
+    audio seconds, inference time, model load time and output file size the asset recorded with
+    `record` and `timed`, and the thread settings of the runtime policy. The metadata is added
+    once, after the asset returns, so that the charts of the Dagster UI compare runs on the same
+    keys. The asset is also profiled when profiling is enabled, see `profiling.profiled`.
+
+    Args:
+        function: The function of the asset.
+
+    Returns:
+        The decorated function, with the signature Dagster reads its inputs and resources from.
+    """
+
+    run = profiling.profiled(function)
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        metrics = {}
+        token = _METRICS.set(metrics)
+        try:
+            with _PeakRss() as rss:
+                start = time.perf_counter()
+                result = run(*args, **kwargs)
+                wall_seconds = time.perf_counter() - start
+        finally:
+            _METRICS.reset(token)
+
+        metadata = performance_metadata(metrics, result, wall_seconds, rss)
+        try:
+            context = dg.AssetExecutionContext.get()
+        except dg.DagsterInvariantViolationError:
+            # Called as a plain function, outside of a materialization
+            logger.debug(f"No asset context for {function.__name__}, dropping metadata {metadata}.")
+            return result
+
+        context.add_output_metadata(metadata)
+        return result
+
+    return wrapper
@@ -4,7 +4,7 @@ import os
 import polars as pl
 import soundfile as sf
 import dagster as dg
-from src import global_configs as cf
+from src import asset_metrics, global_configs as cf
 from src.data_ingestion import web_download
 
 # Get configurations
@@ -18,6 +18,7 @@ METADATA = cf.DATA_PATH.joinpath(CONFIG["Folder_Tree"]["Metadata"]).resolve()
     deps=[web_download.unpack_move],
     kinds={"python", "json"}
 )
+@asset_metrics.instrument_asset
 def file_structure_gather() -> dict:
     """
     Gathers information about the file structure in a specified raw data directory.
@@ -51,6 +52,7 @@ def file_structure_gather() -> dict:
 
     # Create a dictionary to save the metadata
     metadata = {"user_ids": user_ids, "chapters": user_chapters}
+    asset_metrics.record(rows=sum(len(chapters) for chapters in user_chapters))
     logger.info("Completed extraction pipeline and returning metadata related for next step processing.")
     return metadata
 
@@ -59,6 +61,7 @@ def file_structure_gather() -> dict:
     ins={"user_meta": dg.AssetIn(key="file_structure_gather")},
     kinds={"python", "json", "polars"}
 )
+@asset_metrics.instrument_asset
 def metadata_gather(user_meta: dict) -> pl.DataFrame:
     """
     Gathers metadata for user recordings across multiple chapters and organizes it
@@ -131,6 +134,7 @@ def metadata_gather(user_meta: dict) -> pl.DataFrame:
         .with_row_index(name="id", offset=1)
     )
     logger.info("Completed process of extracting metadata of downloaded audio files.")
+    asset_metrics.record(audio_seconds=df["recording_length"].sum())
 
     return df
 
@@ -139,6 +143,7 @@ def metadata_gather(user_meta: dict) -> pl.DataFrame:
     ins={"df": dg.AssetIn(key="metadata_gather")},
     kinds={"python", "polars", "parquet"}
 )
+@asset_metrics.instrument_asset
 def save_metadata(df: pl.DataFrame) -> None:
     # Get the configurations of save file
     filename = CONFIG["Metadata_Configurations"]["Filename"]
@@ -158,3 +163,4 @@ def save_metadata(df: pl.DataFrame) -> None:
 
     else:
         df.write_csv(save_path)
+    asset_metrics.record(rows=df.height, output_file=save_path)
@@ -5,9 +5,11 @@ import os
 from pathlib import Path
 from tqdm import tqdm
 import dagster as dg
-from tools.models import whisper_ai
-from src import global_configs as cf
+from src import asset_metrics, global_configs as cf
+from src.resources import WhisperResource
 from src.data_ingestion.metadata_extraction import METADATA
+from tools.models import asr_backends
+from tools.utils import audio_utils, feature_store
 
 # Get configurations for the run
 logger = logging.getLogger(__name__)
@@ -16,17 +18,133 @@ MODEL_CONFIG = cf.MODELS_CONFIG[TASK_CONFIG["Model_Identifier"]]
 ROOT_PATH = cf.DATA_PATH.joinpath(TASK_CONFIG["Folder_Tree"]["Raw_Data"]).resolve()
 
 
+def _recording_ids(df: pl.DataFrame) -> list[str]:
+    # Recordings are identified by their path under the raw data folder, which is the same in every run
+    return (
+        df
+        .with_columns(
+            pl.concat_str(
+                [pl.col("user_id"), pl.col("chapter_id"), pl.col("recording_file")],
+                separator="/"
+            ).alias("file_path")
+        )
+        .select("file_path")
+        .to_series()
+        .to_list()
+    )
+
+
+def _feature_keys(files: list[str]) -> list[str]:
+    # Key the stored features by the size and modification time of the recording as well, so that a
+    # re-encoded recording gets its features computed again instead of reading the stale ones
+    keys = []
+    for file in files:
+        stat = os.stat(ROOT_PATH.joinpath(file))
+        keys.append(f"{file}:{stat.st_size}:{stat.st_mtime_ns}")
+    return keys
+
+
+def _feature_store(feature_extractor) -> feature_store.FeatureStore:
+    # Open the store of the features computed with the configuration of this feature extractor
+    store_configs = TASK_CONFIG["Feature_Store"]
+    return feature_store.FeatureStore(
+        cf.DATA_PATH.joinpath(store_configs["Folder"]), feature_extractor, store_configs["Dtype"]
+    )
+
+
 @dg.asset(
     ins={"df": dg.AssetIn(key="metadata_gather")},
+    kinds={"python", "numpy", "huggingface"}
+)
+@asset_metrics.instrument_asset
+def log_mel_features(df: pl.DataFrame, whisper_model: WhisperResource) -> None:
+    """
+    Computes the Whisper log-mel features of the recordings missing from the feature store and
+    appends them to it, so that `speech_to_text_conversion` reads the features instead of decoding
+    the audio and running the STFT in every run. Only the feature extractor of the model is loaded,
+    and the features of a batch are computed in one call. Recordings longer than the 30 seconds
+    window of Whisper are left out, they are transcribed from their audio in chunks. Only the
+    "transformers" speech recognition backend reads the features, so nothing is computed for the others.
+
+    Args:
+        df (pl.DataFrame): Input DataFrame containing metadata of audio recordings. It must
+            include the columns "user_id", "chapter_id", and "recording_file".
+    """
+
+    store_configs = TASK_CONFIG["Feature_Store"]
+    if not store_configs["Enabled"]:
+        logger.info("Feature store disabled, no features computed.")
+        asset_metrics.record(rows=0)
+        return
+    if cf.MODELS_CONFIG["Asr_Backend"]["Backend"] != asr_backends.TRANSFORMERS:
+        logger.info("The speech recognition backend does not read stored features, no features computed.")
+        asset_metrics.record(rows=0)
+        return
+
+    from transformers import AutoFeatureExtractor
+
+    feature_extractor = AutoFeatureExtractor.from_pretrained(whisper_model.model_name)
+    store = _feature_store(feature_extractor)
+    files = _recording_ids(df)
+    keys = _feature_keys(files)
+    file_of_key = dict(zip(keys, files))
+    missing = store.missing(keys)
+    logger.info(f"{len(missing)} of {df.height} recordings are missing from the feature store {store.path}.")
+
+    computed, too_long, audio_seconds = 0, 0, 0.0
+    batch_size = store_configs["Batch_Size"]
+    for i in tqdm(range(0, len(missing), batch_size), desc="Computing log-mel features"):
+        batch = missing[i: i + batch_size]
+        waveforms = [
+            audio_utils.decode_audio(ROOT_PATH.joinpath(file_of_key[key]), sampling_rate=audio_utils.SAMPLING_RATE)
+            for key in batch
+        ]
+
+        # Keep the recordings that fit the window of Whisper
+        kept = [(key, waveform) for key, waveform in zip(batch, waveforms) if len(waveform) <= feature_extractor.n_samples]
+        too_long += len(batch) - len(kept)
+        if not kept:
+            continue
+
+        seconds = [len(waveform) / audio_utils.SAMPLING_RATE for _, waveform in kept]
+        with asset_metrics.timed("inference_seconds"):
+            features, frames = feature_store.featurize(
+                feature_extractor, [waveform for _, waveform in kept], audio_utils.SAMPLING_RATE
+            )
+        store.add([key for key, _ in kept], features, frames, seconds)
+        computed += len(kept)
+        audio_seconds += sum(seconds)
+
+    # Drop the features of recordings that changed or left the dataset once they take enough space
+    unused, total = store.unused_frames(keep=keys)
+    dropped = store.compact(keep=keys) if total and unused / total > store_configs["Compact_Unused_Fraction"] else 0
+
+    asset_metrics.record(
+        rows=computed,
+        audio_seconds=audio_seconds,
+        recordings_in_store=len(store),
+        recordings_too_long=too_long,
+        frames_compacted=dropped,
+        output_file=store.features_path
+    )
+
+
+@dg.asset(
+    ins={"df": dg.AssetIn(key="metadata_gather")},
+    deps=["log_mel_features"],
     kinds={"python", "polars", "huggingface"}
 )
-def speech_to_text_conversion(df: pl.DataFrame) -> pl.DataFrame:
+@asset_metrics.instrument_asset
+def speech_to_text_conversion(df: pl.DataFrame, whisper_model: WhisperResource) -> pl.DataFrame:
     """
     Converts speech audio recordings to text transcriptions using the Whisper model.
 
     This function takes a Polars DataFrame as input, containing metadata about audio recordings,
-    and processes the audio files to generate text transcriptions. It uses the Whisper model for
-    automatic speech recognition (ASR) and supports batch processing.
+    and processes the audio files to generate text transcriptions. It uses the speech recognition
+    backend set in `Asr_Backend.Backend` and supports batch processing. With the "transformers"
+    backend, the Whisper model is provided by a shared resource, so it is only loaded once per
+    worker process, and recordings whose log-mel features are in the feature store are transcribed
+    from them, without decoding the audio.
 
     Args:
         df (pl.DataFrame): Input DataFrame containing metadata of audio recordings. It must
@@ -45,48 +163,68 @@ def speech_to_text_conversion(df: pl.DataFrame) -> pl.DataFrame:
     # Get processing configurations
     batch_size = TASK_CONFIG["Maximum_Batch_Size"]
 
-    # Create an instance of Whisper model
-    whisper_model = whisper_ai.WhisperAI(
-        model_name="openai/whisper-large-v3",
-        model_task="automatic-speech-recognition",
-        token_required=False,
-        token=None,
-        device=cf.DEVICE
+    # Get the configured backend, running the shared instance of the Whisper model for "transformers"
+    if cf.MODELS_CONFIG["Asr_Backend"]["Backend"] == asr_backends.TRANSFORMERS:
+        model = whisper_model.get_model()
+        asr_backend = asr_backends.load_asr_backend(model=model)
+    else:
+        model = None
+        asr_backend = asr_backends.load_asr_backend()
+
+    # The features of the store are read when the model can transcribe them, the inference server takes audio only
+    store = (
+        _feature_store(model.processor.feature_extractor)
+        if TASK_CONFIG["Feature_Store"]["Enabled"] and hasattr(model, "inference_features") else None
     )
 
     # From the dataframe get a list of files to be processed
-    file_lists = (
-        df
-        .with_columns(
-            pl.concat_str(
-                [pl.col("user_id"), pl.col("chapter_id"), pl.col("recording_file")],
-                separator="/"
-            ).alias("file_path")
-        )
-        .select("file_path")
-        .to_series()
-        .to_list()
-    )
+    file_lists = _recording_ids(df)
     processing_list = [Path(ROOT_PATH).joinpath(x).resolve().__str__() for x in file_lists]
+    feature_keys = _feature_keys(file_lists) if store is not None else file_lists
 
     # Perform batch inferencing on all the audio files
     audio_outputs = []
+    audio_seconds = 0.0
+    features_read = 0
     for i in tqdm(range(0, len(processing_list), batch_size), desc="Transcribing audio batch"):
         batch = processing_list[i: i + batch_size]
         logger.info(f"\nRunning batch inference with batch size {len(batch)}.")
 
-        model_output = whisper_model.inference(
-            audio_files=batch,
-            max_new_tokens=MODEL_CONFIG["Maximum_Token_Generation"],
-            language=MODEL_CONFIG["Language_Selection"]
-        )
+        # Split the batch between the recordings with stored features and the ones to decode
+        batch_ids = feature_keys[i: i + batch_size]
+        stored = [j for j, key in enumerate(batch_ids) if store is not None and key in store]
+        decoded = [j for j in range(len(batch)) if j not in stored]
+        model_output = [None] * len(batch)
+
+        # Decode the batch with libsndfile, so that FLAC recordings do not need an ffmpeg process each
+        waveforms = [audio_utils.decode_audio(batch[j], sampling_rate=audio_utils.SAMPLING_RATE) for j in decoded]
+        audio_seconds += sum(len(waveform) for waveform in waveforms) / audio_utils.SAMPLING_RATE
+        if stored:
+            features = store.get([batch_ids[j] for j in stored])
+            audio_seconds += sum(store.seconds([batch_ids[j] for j in stored]))
+            features_read += len(stored)
+
+        with asset_metrics.timed("inference_seconds"):
+            if stored:
+                outputs = model.inference_features(
+                    features=features,
+                    max_new_tokens=MODEL_CONFIG["Maximum_Token_Generation"],
+                    language=MODEL_CONFIG["Language_Selection"]
+                )
+                for j, output in zip(stored, outputs):
+                    model_output[j] = output["text"]
+            if decoded:
+                outputs = asr_backend.transcribe(waveforms, sampling_rate=audio_utils.SAMPLING_RATE)
+                for j, output in zip(decoded, outputs):
+                    model_output[j] = output.text
+        model_output = [output for output in model_output if output is not None]
         logger.info(f"\nCompleted batch inference with batch size {len(model_output)}.")
 
         if len(batch) != len(model_output):
             raise RuntimeError(f"\nInput batch is not the same size as output batch. {len(batch)} != {len(model_output)}")
 
         # Extract the actual text from each output and append it to the running list
-        audio_outputs.extend([x["text"].strip() for x in model_output])
+        audio_outputs.extend([text.strip() for text in model_output])
 
     # Save the transcription back into the dataframe
     transcription_df = (
@@ -95,6 +233,12 @@ def speech_to_text_conversion(df: pl.DataFrame) -> pl.DataFrame:
         .select("id", "recording_transcriptions")
     )
 
+    asset_metrics.record(
+        audio_seconds=audio_seconds,
+        features_read=features_read,
+        asr_backend=asr_backend.name,
+        **(whisper_model.load_metadata() if model is not None else {})
+    )
     return transcription_df
 
 
@@ -102,6 +246,7 @@ def speech_to_text_conversion(df: pl.DataFrame) -> pl.DataFrame:
     ins={"df": dg.AssetIn(key="speech_to_text_conversion")},
     kinds={"python", "polars", "parquet"}
 )
+@asset_metrics.instrument_asset
 def save_transcriptions(df: pl.DataFrame) -> None:
     """
     Saves transcription data from the provided Polars DataFrame to a file in the format
@@ -132,3 +277,4 @@ def save_transcriptions(df: pl.DataFrame) -> None:
 
     else:
         df.write_csv(save_path)
+    asset_metrics.record(rows=df.height, output_file=save_path)
@@ -3,7 +3,7 @@ import polars as pl
 import os
 import dagster as dg
 from pathlib import Path
-from src import global_configs as cf
+from src import asset_metrics, global_configs as cf
 from src.data_ingestion.text_extraction import save_transcriptions
 from src.data_ingestion.metadata_extraction import save_metadata
 
@@ -38,6 +38,7 @@ def _read_data(filepath: Path) -> pl.DataFrame:
     deps=[save_transcriptions, save_metadata],
     kinds={"python", "polars", "parquet"}
 )
+@asset_metrics.instrument_asset
 def create_full_dataset() -> None:
     """
     Combines metadata and transcription data into a single dataset and saves it in
@@ -94,3 +95,4 @@ def create_full_dataset() -> None:
 
     else:
         df.write_csv(save_file)
+    asset_metrics.record(rows=df.height, output_file=save_file)
@@ -6,7 +6,7 @@ import os
 import tarfile
 import dagster as dg
 from pathlib import Path
-from src import global_configs as cf
+from src import asset_metrics, global_configs as cf
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +14,7 @@ CONFIG = cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]
 
 
 @dg.asset(kinds={"python"})
+@asset_metrics.instrument_asset
 def download_data() -> None:
     """
     Downloads data from a specified source URL to a temporary folder.
@@ -45,9 +46,11 @@ def download_data() -> None:
             for chunk in response.iter_bytes():
                 f.write(chunk)
     logger.info(f"Data downloaded successfully!")
+    asset_metrics.record(output_file=temp_download_folder)
 
 
 @dg.asset(kinds={"python"}, deps=[download_data])
+@asset_metrics.instrument_asset
 def unpack_move() -> None:
     """
     Unpacks and moves data from a temporary zipped location to a landing zone.
@@ -81,12 +84,15 @@ def unpack_move() -> None:
 
     # Move all the files from the unzipped folder to landing zone
     data = Path(temp_unpack_folder).joinpath(unzipped_data_loc).resolve()
-    for item in data.iterdir():
+    items = list(data.iterdir())
+    for item in items:
         dst_path = landing_zone.joinpath(item.name).resolve()
         shutil.move(item, dst_path)
+    asset_metrics.record(rows=len(items))
 
 
 @dg.asset(kinds={"python"}, deps=[download_data, unpack_move])
+@asset_metrics.instrument_asset
 def clean_up() -> None:
     """
     Deletes temporary artifacts generated during the process to ensure that no
@@ -0,0 +1,24 @@
+
+from dagster import load_assets_from_package_module, Definitions
+from src import data_ingestion, ner_summarizations
+from src import jobs
+from src.resources import RESOURCES
+from tools.utils import runtime_policy
+
+# Every Dagster step process shares the core budget with the steps running next to it
+runtime_policy.apply()
+
+# Load all assets definitions
+data_ingestion_assets = load_assets_from_package_module(package_module=data_ingestion)
+modeling_assets = load_assets_from_package_module(package_module=ner_summarizations)
+all_assets = [
+    *data_ingestion_assets, *modeling_assets
+]
+
+defs = Definitions(
+    assets=all_assets,
+    jobs=[
+        jobs.run_download_pipeline, jobs.run_modeling_pipeline
+    ],
+    resources=RESOURCES
+)
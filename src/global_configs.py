@@ -1,8 +1,10 @@
 
+import os
 import yaml
 import logging
-import torch
+import threading
 from pathlib import Path
+from typing import TypedDict
 
 # Set up logging configurations
 logging.basicConfig(
@@ -10,28 +12,337 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 
-# Set up device for inference
-if torch.cuda.is_available():
-    DEVICE = "auto"
-elif torch.backends.mps.is_available():
-    DEVICE = "mps"
-else:
-    DEVICE = "cpu"
-
-# Get the location of all data
-DATA_PATH = Path(__file__).joinpath("..", "..", "data").resolve()
+# Get the location of all data, which the VOICE2TEXT_DATA_PATH environment variable can move elsewhere
+DATA_PATH = Path(os.environ.get("VOICE2TEXT_DATA_PATH", Path(__file__).joinpath("..", "..", "data"))).resolve()
 
 # Get the location of all model prompts
 PROMPTS_PATH = Path(__file__).joinpath("..", "..", "prompts").resolve()
 
-# Get pipeline configurations
+# Get the location of the configuration files, which are parsed on first access only
 PIPELINE_CONFIG_PATH = Path(__file__).joinpath("..", "..", "configs", "pipeline_configs.yaml").resolve()
-PIPELINE_CONFIG = yaml.safe_load(open(PIPELINE_CONFIG_PATH, "r"))
-
-# Get models configurations
 MODELS_CONFIG_PATH = Path(__file__).joinpath("..", "..", "configs", "models_configs.yaml").resolve()
-MODELS_CONFIG = yaml.safe_load(open(MODELS_CONFIG_PATH, "r"))
-
-# Get Streamlit configurations
 STREAMLIT_CONFIG_PATH = Path(__file__).joinpath("..", "..", "configs", "streamlit_configs.yaml").resolve()
-STREAMLIT_CONFIG = yaml.safe_load(open(STREAMLIT_CONFIG_PATH, "r"))
+
+
+class SavedTable(TypedDict):
+    """
+    Location and format of a parquet table written by the pipeline.
+    """
+
+    Folder_Name: str
+    Save_Format: str
+    Filename: str
+    Compression: str
+    Compression_Level: int
+
+
+class SavedFile(TypedDict):
+    """
+    Format of a parquet file written in a folder given elsewhere.
+    """
+
+    Save_Format: str
+    Filename: str
+    Compression: str
+    Compression_Level: int
+
+
+class FeatureStoreConfig(TypedDict):
+    Enabled: bool
+    Folder: str
+    Dtype: str
+    Batch_Size: int
+    Compact_Unused_Fraction: float
+
+
+class DataProcessingConfig(TypedDict):
+    Folder_Tree: dict[str, str]
+    Metadata_Configurations: SavedFile
+    Transcriptions_Configurations: SavedFile
+    Source_Download: str
+    Corpus_Structure: str
+    Maximum_Batch_Size: int
+    Model_Identifier: str
+    Model_Task: str
+    Feature_Store: FeatureStoreConfig
+
+
+class CleanedDataConfig(TypedDict):
+    Folder_Nam: str
+    Metadata_File: str
+    Transcription_File: str
+
+
+class MemoTablesConfig(TypedDict):
+    Folder_Name: str
+    Summarization_Filename: str
+    Named_Entity_Filename: str
+    Compression: str
+    Compression_Level: int
+
+
+class ModelingFolderTree(TypedDict):
+    Cleaned_Data: CleanedDataConfig
+    Combined_Data: SavedTable
+    Summarization_Outputs: SavedTable
+    Named_Entity_Outputs: SavedTable
+    Combined_Output: SavedTable
+    Memo_Tables: MemoTablesConfig
+
+
+class SummarizationModelsConfig(TypedDict):
+    T5_Model_Identifier: str
+    Bart_Model_Identifier: str
+    Language_Model_Identifier: str
+
+
+class NamedEntityModelsConfig(TypedDict):
+    Gliner_Identifier: str
+
+
+class ModelingConfig(TypedDict):
+    Folder_Tree: ModelingFolderTree
+    Summarization_Models: SummarizationModelsConfig
+    Named_Entity_Models: NamedEntityModelsConfig
+
+
+class SongInferenceConfig(TypedDict):
+    Max_Concurrent_Stages: int
+
+
+class ProfilingConfig(TypedDict):
+    Mode: str
+    Output_Folder: str
+    Row_Limit: int
+
+
+class PipelineConfig(TypedDict):
+    """
+    Sections of `configs/pipeline_configs.yaml`.
+    """
+
+    Data_Processing_Pipeline: DataProcessingConfig
+    Summarization_Named_Entity_Recognition: ModelingConfig
+    Song_Inference_Pipeline: SongInferenceConfig
+    Profiling: ProfilingConfig
+
+
+class WhisperConfig(TypedDict):
+    Model_Name: str
+    Hugging_Face_Token: bool
+    Maximum_Token_Generation: int
+    Language_Selection: str
+
+
+class AsrBackendConfig(TypedDict):
+    Backend: str
+    Segment_Timestamps: bool
+    Openai_Whisper_Model: str
+
+
+class StreamingAsrConfig(TypedDict):
+    Chunk_Seconds: float
+    Step_Seconds: float
+    Agreement: int
+    Trim_Seconds: float
+    Max_Buffer_Seconds: float
+
+
+class GenerationLengths(TypedDict):
+    Minimum_Length: int
+    Maximum_Length: int
+
+
+class T5OutputLengths(TypedDict):
+    Short_Output: GenerationLengths
+    Medium_Output: GenerationLengths
+    Large_Output: GenerationLengths
+
+
+class T5Config(TypedDict):
+    Model_Name: str
+    Hugging_Face_Token: bool
+    Backend: str
+    Maximum_Token_Generation: T5OutputLengths
+
+
+class BartConfig(TypedDict):
+    Model_Name: str
+    Model_Task: str
+    Hugging_Face_Token: bool
+    Backend: str
+    Minimum_Length: int
+    Maximum_Length: int
+
+
+class ConstrainedDecodingConfig(TypedDict):
+    Enabled: bool
+    Top_Candidates: int
+
+
+class Phi4Config(TypedDict):
+    Model_Name: str
+    Model_Task: str
+    Hugging_Face_Token: bool
+    Maximum_New_Token: int
+    Temperature: float
+    Top_P: float
+    Prefix_Cache: bool
+    Constrained_Decoding: ConstrainedDecodingConfig
+
+
+class GlinerConfig(TypedDict):
+    Model_Name: str
+    Maximum_Length: int
+    Backend: str
+    Label_Cache: bool
+    Labels: list[str]
+
+
+class OnnxRuntimeConfig(TypedDict):
+    Cache_Folder: str
+    Intra_Op_Threads: int
+
+
+class RuntimePolicyConfig(TypedDict):
+    Core_Budget: int
+    Processes: int
+    Inter_Op_Threads: int
+    Pin_Workers: bool
+
+
+class ModelRegistryConfig(TypedDict):
+    Memory_Budget_MB: int
+
+
+class InferenceServerConfig(TypedDict):
+    Enabled: bool
+    Host: str
+    Port: int
+    Unix_Socket: str
+    Max_Batch_Size: int
+    Max_Wait_Milliseconds: float
+    Request_Timeout_Seconds: float
+
+
+class DemucsConfig(TypedDict):
+    Model_Name: str
+    Workers: int
+    Overlap: float
+    Shifts: int
+    Stem_Cache_Folder: str
+
+
+class ModelsConfig(TypedDict):
+    """
+    Sections of `configs/models_configs.yaml`.
+    """
+
+    Whisper_AI_Configurations: WhisperConfig
+    Asr_Backend: AsrBackendConfig
+    Streaming_Asr: StreamingAsrConfig
+    Google_Flan_T5: T5Config
+    Facebook_Bart_CNN: BartConfig
+    Phi4_Language_Model: Phi4Config
+    Gliner_Model: GlinerConfig
+    Onnx_Runtime_Configurations: OnnxRuntimeConfig
+    Runtime_Policy: RuntimePolicyConfig
+    Model_Registry: ModelRegistryConfig
+    Inference_Server: InferenceServerConfig
+    Demucs_Separation: DemucsConfig
+
+
+class SummarizationPromptsConfig(TypedDict):
+    System_Prompt: str
+    User_Prompt: str
+
+
+class WarmUpConfig(TypedDict):
+    Enabled: bool
+    Models: list[str]
+
+
+class StreamlitApplicationConfig(TypedDict):
+    Speech_Original_Data: str
+    Speech_Modeled_Data: str
+    Object_TTL: int
+    Additional_Models: list[str]
+    User_Speech_Upload_Options: list[str]
+    Summarization_Prompts: SummarizationPromptsConfig
+    Warm_Up: WarmUpConfig
+
+
+class JobQueueConfig(TypedDict):
+    Database: str
+    Workers: int
+    Max_Concurrent_Jobs: int
+    Poll_Interval_Seconds: float
+    Heartbeat_Seconds: float
+    Stale_After_Seconds: float
+    Max_Attempts: int
+
+
+class StreamlitConfig(TypedDict):
+    """
+    Sections of `configs/streamlit_configs.yaml`.
+    """
+
+    Streamlit_Application_Configurations: StreamlitApplicationConfig
+    Job_Queue: JobQueueConfig
+
+
+# Annotations of the attributes resolved lazily by `__getattr__`
+PIPELINE_CONFIG: PipelineConfig
+MODELS_CONFIG: ModelsConfig
+STREAMLIT_CONFIG: StreamlitConfig
+ONNX_CACHE_PATH: Path
+DEVICE: str
+
+
+def _read_yaml(path: Path) -> dict:
+    # The C parser of PyYAML is several times faster, when it was compiled
+    with open(path, "r") as f:
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+
+
+def _device() -> str:
+    import torch
+
+    # Set up device for inference
+    if torch.cuda.is_available():
+        return "auto"
+    elif torch.backends.mps.is_available():
+        return "mps"
+    else:
+        return "cpu"
+
+
+_LAZY_ATTRIBUTES = {
+    "PIPELINE_CONFIG": lambda: _read_yaml(PIPELINE_CONFIG_PATH),
+    "MODELS_CONFIG": lambda: _read_yaml(MODELS_CONFIG_PATH),
+    "STREAMLIT_CONFIG": lambda: _read_yaml(STREAMLIT_CONFIG_PATH),
+    # Get the location of the models exported to ONNX
+    "ONNX_CACHE_PATH": lambda: DATA_PATH.joinpath(
+        __getattr__("MODELS_CONFIG")["Onnx_Runtime_Configurations"]["Cache_Folder"]
+    ).resolve(),
+    "DEVICE": _device
+}
+
+
+# Held while a lazy attribute is resolved, reentrant since ONNX_CACHE_PATH reads MODELS_CONFIG
+_RESOLVING = threading.RLock()
+
+
+def __getattr__(name: str):
+    # Resolve the configurations and the device on first access, and keep them as module attributes
+    # so that later accesses are plain attribute lookups
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _RESOLVING:
+        if name not in globals():
+            globals()[name] = _LAZY_ATTRIBUTES[name]()
+    return globals()[name]
+
+
+def __dir__() -> list[str]:
+    return [*globals(), *_LAZY_ATTRIBUTES]
@@ -0,0 +1,114 @@
+
+import asyncio
+import concurrent.futures
+import logging
+import time
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Gathers the requests arriving within a short window into a single batch call. The first
+    request of a batch waits at most `max_wait_ms` for others to join, and a batch is sent as
+    soon as it holds `max_batch_size` requests. While a batch runs, new requests queue up and
+    form the next batch, so the batch size grows with the load.
+    """
+
+    def __init__(
+        self, batch_function: Callable[[list], list], max_batch_size: int, max_wait_ms: float,
+        executor: concurrent.futures.Executor
+    ):
+        """
+        Args:
+            batch_function: A blocking function taking a list of inputs and returning one output
+                per input, in the same order.
+            max_batch_size: Maximum number of requests per batch.
+            max_wait_ms: Maximum time the first request of a batch waits for others, in milliseconds.
+            executor: The executor running the batch function, outside the event loop.
+        """
+
+        self.batch_function = batch_function
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_ms / 1000
+        self.executor = executor
+        self.batches = 0
+        self.requests = 0
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, item: object) -> object:
+        """
+        Adds an input to the next batch and waits for its output.
+
+        Args:
+            item: The input passed to the batch function.
+
+        Returns:
+            object: The output of the batch function for this input.
+        """
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((item, future))
+        return await future
+
+    async def _collect(self) -> list[tuple[object, asyncio.Future]]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+        # Requests queued while the window closed still fit in the batch
+        while len(batch) < self.max_batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+
+        return batch
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+
+            # Skip the requests cancelled while queued, e.g. by a client disconnecting
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            try:
+                outputs = await loop.run_in_executor(self.executor, self.batch_function, [item for item, _ in batch])
+                if len(outputs) != len(batch):
+                    raise RuntimeError(f"Batch function returned {len(outputs)} outputs for {len(batch)} inputs.")
+            except Exception as e:
+                logger.exception(f"Batch of {len(batch)} requests failed.")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.requests += len(batch)
+            for (_, future), output in zip(batch, outputs):
+                if not future.done():
+                    future.set_result(output)
+
+    def stats(self) -> dict:
+        """
+        Returns the number of batches and requests served, and the mean batch size.
+        """
+
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": round(self.requests / self.batches, 2) if self.batches else 0.0
+        }
+
+    def close(self) -> None:
+        self._task.cancel()
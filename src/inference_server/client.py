@@ -0,0 +1,197 @@
+
+import concurrent.futures
+import functools
+import httpx
+import numpy as np
+from pathlib import Path
+from typing import Generator
+from src import global_configs as cf
+
+CONFIGS = cf.MODELS_CONFIG["Inference_Server"]
+
+
+class InferenceClient:
+    """
+    A thin synchronous client of the inference server. It is thread-safe, so several threads can
+    share one client and have their requests batched together by the server.
+    """
+
+    def __init__(
+        self, host: str = "127.0.0.1", port: int = 8765, unix_socket: str | None = None, timeout: float = 600
+    ):
+        """
+        Args:
+            host: The host of the server.
+            port: The TCP port of the server.
+            unix_socket: The Unix socket of the server, used instead of TCP if given.
+            timeout: Seconds to wait for a response, including the time spent in the server queue.
+        """
+
+        if unix_socket:
+            self._client = httpx.Client(
+                transport=httpx.HTTPTransport(uds=unix_socket), base_url="http://inference-server", timeout=timeout
+            )
+        else:
+            self._client = httpx.Client(base_url=f"http://{host}:{port}", timeout=timeout)
+
+    def _post(self, path: str, **kwargs) -> dict:
+        response = self._client.post(path, **kwargs)
+        if response.is_error:
+            raise RuntimeError(f"Inference server error {response.status_code} on {path}: {response.text}")
+        return response.json()
+
+    def transcribe(
+        self, audio: bytes | str | Path | np.ndarray, model_name: str, max_new_tokens: int, language: str,
+        sampling_rate: int = 16000
+    ) -> str:
+        """
+        Transcribes one audio file with Whisper.
+
+        Args:
+            audio: The encoded audio as bytes or a file path, or a mono float32 waveform.
+            model_name: The Whisper model to use.
+            max_new_tokens: The maximum number of tokens to generate.
+            language: The language of the speech.
+            sampling_rate: The sampling rate of the waveform, ignored for encoded audio.
+
+        Returns:
+            str: The transcription.
+        """
+
+        if isinstance(audio, np.ndarray):
+            content = np.ascontiguousarray(audio, dtype=np.float32).tobytes()
+            headers = {"X-Audio-Format": "f32le", "X-Sampling-Rate": str(sampling_rate)}
+        else:
+            content = Path(audio).read_bytes() if isinstance(audio, (str, Path)) else audio
+            headers = {}
+
+        params = {"model_name": model_name, "max_new_tokens": max_new_tokens, "language": language}
+        return self._post("/transcribe", content=content, headers=headers, params=params)["text"]
+
+    def summarize(self, model: str, text: str, model_name: str, min_length: int, max_length: int) -> str:
+        """
+        Summarizes one text with Flan T5 or BART.
+
+        Args:
+            model: "t5" or "bart".
+            text: The text to summarize, including any task prefix expected by the model.
+            model_name: The model to use.
+            min_length: The minimum length of the summary.
+            max_length: The maximum length of the summary.
+
+        Returns:
+            str: The summary, decoded the same way as by the local model wrapper.
+        """
+
+        body = {"text": text, "model_name": model_name, "min_length": min_length, "max_length": max_length}
+        return self._post(f"/summarize/{model}", json=body)["text"]
+
+    def extract_entities(self, text: str, labels: list[str], model_name: str, max_length: int) -> list[dict]:
+        """
+        Extracts named entities from one text with GLiNER.
+
+        Args:
+            text: The text from which the entities are extracted.
+            labels: The entity labels to look for.
+            model_name: The GLiNER model to use.
+            max_length: The maximum number of tokens of the model.
+
+        Returns:
+            list[dict]: The entities, each with "start", "end", "text", "label" and "score" keys.
+        """
+
+        body = {"text": text, "labels": labels, "model_name": model_name, "max_length": max_length}
+        return self._post("/entities", json=body)["entities"]
+
+    def health(self) -> dict:
+        response = self._client.get("/health")
+        response.raise_for_status()
+        return response.json()
+
+    def map(self, function, items: list) -> list:
+        # Send the requests of a list at once so that the server batches them together
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(items), 1)) as executor:
+            return list(executor.map(function, items))
+
+
+class RemoteWhisper:
+    """
+    Stands in for `WhisperAI`, running the model on the inference server.
+    """
+
+    def __init__(self, client: InferenceClient, model_name: str):
+        self.client = client
+        self.model_name = model_name
+
+    def inference(
+        self, audio_files: list[str | np.ndarray], max_new_tokens: int, language: str, sampling_rate: int = 16000,
+        return_timestamps: bool = False
+    ) -> list[dict]:
+        # The server answers with the text only, so no segments are returned even with timestamps
+        return [
+            {"text": text}
+            for text in self.client.map(
+                lambda audio: self.client.transcribe(audio, self.model_name, max_new_tokens, language, sampling_rate),
+                audio_files
+            )
+        ]
+
+
+class RemoteSummarizer:
+    """
+    Stands in for `GoogleFlanT5` or `FacebookBart`, running the model on the inference server.
+    """
+
+    def __init__(self, client: InferenceClient, model: str, model_name: str):
+        self.client = client
+        self.model = model
+        self.model_name = model_name
+
+    def inference(self, input_text: str, min_length: int, max_length: int) -> str:
+        return self.client.summarize(self.model, input_text, self.model_name, min_length, max_length)
+
+    def batch_inference(self, input_texts: list[str], min_length: int, max_length: int) -> list[str]:
+        return self.client.map(lambda text: self.inference(text, min_length, max_length), input_texts)
+
+    def stream_inference(self, input_text: str, min_length: int, max_length: int) -> Generator[str, None, None]:
+        # The server answers with the complete summary, which is yielded as a single piece
+        yield self.inference(input_text, min_length, max_length)
+
+
+class RemoteGliner:
+    """
+    Stands in for `GlinerNER`, running the model on the inference server.
+    """
+
+    def __init__(self, client: InferenceClient, model_name: str, max_length: int):
+        self.client = client
+        self.model_name = model_name
+        self.max_length = max_length
+
+    def inference(self, input_text: str, labels: list[str]) -> list[dict]:
+        return self.client.extract_entities(input_text, labels, self.model_name, self.max_length)
+
+    def batch_inference(self, input_texts: list[str], labels: list[str]) -> list[list[dict]]:
+        return self.client.map(lambda text: self.inference(text, labels), input_texts)
+
+
+def server_enabled() -> bool:
+    """
+    Returns whether the models should be called through the inference server.
+    """
+
+    return CONFIGS["Enabled"]
+
+
+@functools.lru_cache(maxsize=1)
+def default_client() -> InferenceClient:
+    """
+    Returns a client of the inference server configured in the models configurations.
+    """
+
+    return InferenceClient(
+        host=CONFIGS["Host"],
+        port=CONFIGS["Port"],
+        unix_socket=CONFIGS["Unix_Socket"] or None,
+        timeout=CONFIGS["Request_Timeout_Seconds"]
+    )
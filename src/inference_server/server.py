@@ -0,0 +1,325 @@
+
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import logging
+import numpy as np
+import tornado.httpserver
+import tornado.netutil
+import tornado.web
+from typing import Callable
+from src import global_configs as cf
+from src.inference_server.batching import MicroBatcher
+from tools.models import facebook_bart, gliner_ner, google_flan, model_registry, whisper_ai
+from tools.utils import audio_utils, runtime_policy
+
+logger = logging.getLogger(__name__)
+
+CONFIGS = cf.MODELS_CONFIG["Inference_Server"]
+
+
+def _whisper(model_name: str) -> whisper_ai.WhisperAI:
+    configs = cf.MODELS_CONFIG["Whisper_AI_Configurations"]
+    return model_registry.MODEL_REGISTRY.get(
+        ("WhisperAI", model_name, cf.DEVICE),
+        lambda: whisper_ai.WhisperAI(
+            model_name=model_name,
+            model_task="automatic-speech-recognition",
+            device=cf.DEVICE,
+            token_required=configs["Hugging_Face_Token"],
+            token=None
+        )
+    )
+
+
+def _flan_t5(model_name: str) -> google_flan.GoogleFlanT5:
+    configs = cf.MODELS_CONFIG["Google_Flan_T5"]
+    return model_registry.MODEL_REGISTRY.get(
+        ("GoogleFlanT5", model_name, cf.DEVICE, configs["Backend"]),
+        lambda: google_flan.GoogleFlanT5(
+            model_name=model_name,
+            device=cf.DEVICE,
+            token_required=configs["Hugging_Face_Token"],
+            token=None,
+            backend=configs["Backend"],
+            onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+            onnx_threads=runtime_policy.onnx_threads()
+        )
+    )
+
+
+def _bart(model_name: str) -> facebook_bart.FacebookBart:
+    configs = cf.MODELS_CONFIG["Facebook_Bart_CNN"]
+    return model_registry.MODEL_REGISTRY.get(
+        ("FacebookBart", model_name, cf.DEVICE, configs["Backend"]),
+        lambda: facebook_bart.FacebookBart(
+            model_name=model_name,
+            device=cf.DEVICE,
+            task=configs["Model_Task"],
+            token_required=configs["Hugging_Face_Token"],
+            token=None,
+            backend=configs["Backend"],
+            onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+            onnx_threads=runtime_policy.onnx_threads()
+        )
+    )
+
+
+def _gliner(model_name: str, max_length: int) -> gliner_ner.GlinerNER:
+    configs = cf.MODELS_CONFIG["Gliner_Model"]
+    return model_registry.MODEL_REGISTRY.get(
+        ("GlinerNER", model_name, cf.DEVICE, max_length, configs["Backend"]),
+        lambda: gliner_ner.GlinerNER(
+            model_name=model_name,
+            device=cf.DEVICE,
+            max_length=max_length,
+            backend=configs["Backend"],
+            onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+            onnx_threads=runtime_policy.onnx_threads(),
+            cache_labels=configs["Label_Cache"]
+        )
+    )
+
+
+class InferenceService:
+    """
+    Hosts the Whisper, Flan T5, BART and GLiNER models of the process and serves them through
+    micro-batchers. Requests are batched together when they target the same model with the same
+    generation parameters. Every model runs its batches on its own thread, so a long Whisper batch
+    does not hold back the summaries.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float):
+        """
+        Args:
+            max_batch_size: Maximum number of requests per batch.
+            max_wait_ms: Maximum time a request waits for others to join its batch, in milliseconds.
+        """
+
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._batchers: dict[tuple, MicroBatcher] = {}
+        self._executors: dict[tuple, concurrent.futures.ThreadPoolExecutor] = {}
+
+    def _batcher(self, group: tuple, model: tuple, batch_function: Callable[[list], list]) -> MicroBatcher:
+        if group not in self._batchers:
+            executor = self._executors.setdefault(
+                model, concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=model[0])
+            )
+            self._batchers[group] = MicroBatcher(batch_function, self.max_batch_size, self.max_wait_ms, executor)
+        return self._batchers[group]
+
+    async def transcribe(
+        self, waveform: np.ndarray, model_name: str, max_new_tokens: int, language: str, sampling_rate: int
+    ) -> str:
+        batcher = self._batcher(
+            ("whisper", model_name, max_new_tokens, language, sampling_rate),
+            ("whisper", model_name),
+            lambda waveforms: [
+                output["text"]
+                for output in _whisper(model_name).inference(
+                    audio_files=waveforms, max_new_tokens=max_new_tokens, language=language,
+                    sampling_rate=sampling_rate
+                )
+            ]
+        )
+        return await batcher.submit(waveform)
+
+    async def summarize(self, model: str, text: str, model_name: str, min_length: int, max_length: int) -> str:
+        loader = _flan_t5 if model == "t5" else _bart
+        batcher = self._batcher(
+            (model, model_name, min_length, max_length),
+            (model, model_name),
+            lambda texts: loader(model_name).batch_inference(texts, min_length=min_length, max_length=max_length)
+        )
+        return await batcher.submit(text)
+
+    async def extract_entities(self, text: str, labels: list[str], model_name: str, max_length: int) -> list[dict]:
+        batcher = self._batcher(
+            ("gliner", model_name, max_length, tuple(labels)),
+            ("gliner", model_name, max_length),
+            lambda texts: _gliner(model_name, max_length).batch_inference(texts, labels)
+        )
+        return await batcher.submit(text)
+
+    def stats(self) -> dict:
+        return {
+            "batchers": [{"group": list(group), **batcher.stats()} for group, batcher in self._batchers.items()],
+            "models": model_registry.MODEL_REGISTRY.status()
+        }
+
+
+class _ServiceHandler(tornado.web.RequestHandler):
+
+    def initialize(self, service: InferenceService):
+        self.service = service
+        self._request_task: asyncio.Future | None = None
+        self._client_gone = False
+
+    async def run_request(self, awaitable) -> object:
+        """
+        Awaits a model call as a task that is cancelled when the client disconnects, which drops the
+        request from its batch when the batch has not started yet.
+
+        Args:
+            awaitable: The model call, e.g. `service.transcribe(...)`.
+
+        Returns:
+            object: The output of the model call.
+        """
+
+        self._request_task = asyncio.ensure_future(awaitable)
+        try:
+            return await self._request_task
+        except asyncio.CancelledError:
+            if not self._client_gone:
+                raise
+            raise tornado.web.Finish()
+
+    def on_connection_close(self) -> None:
+        self._client_gone = True
+        if self._request_task is not None:
+            self._request_task.cancel()
+
+    def json_body(self) -> dict:
+        try:
+            return json.loads(self.request.body)
+        except json.JSONDecodeError as e:
+            raise tornado.web.HTTPError(400, reason=f"Invalid JSON body: {e}")
+
+    def write_error(self, status_code: int, **kwargs) -> None:
+        error = kwargs["exc_info"][1] if "exc_info" in kwargs else None
+        self.finish({"error": str(error) if error is not None else self._reason})
+
+
+class TranscribeHandler(_ServiceHandler):
+    """
+    POST /transcribe with the encoded audio file as body, or a mono float32 waveform when the
+    "X-Audio-Format" header is "f32le". Returns {"text": ...}.
+    """
+
+    async def post(self):
+        configs = cf.MODELS_CONFIG["Whisper_AI_Configurations"]
+        sampling_rate = int(self.request.headers.get("X-Sampling-Rate", audio_utils.SAMPLING_RATE))
+        if self.request.headers.get("X-Audio-Format") == "f32le":
+            waveform = np.frombuffer(self.request.body, dtype=np.float32)
+        else:
+            # Decoding is CPU bound, keep it off the event loop
+            sampling_rate = audio_utils.SAMPLING_RATE
+            waveform = await asyncio.get_running_loop().run_in_executor(
+                None, audio_utils.decode_audio, self.request.body
+            )
+
+        text = await self.run_request(self.service.transcribe(
+            waveform,
+            model_name=self.get_query_argument("model_name", configs["Model_Name"]),
+            max_new_tokens=int(self.get_query_argument("max_new_tokens", configs["Maximum_Token_Generation"])),
+            language=self.get_query_argument("language", configs["Language_Selection"]),
+            sampling_rate=sampling_rate
+        ))
+        self.write({"text": text})
+
+
+class SummarizeHandler(_ServiceHandler):
+    """
+    POST /summarize/t5 or /summarize/bart with {"text", "model_name", "min_length", "max_length"}.
+    Returns {"text": ...}.
+    """
+
+    async def post(self, model: str):
+        body = self.json_body()
+        default_name = cf.MODELS_CONFIG["Google_Flan_T5" if model == "t5" else "Facebook_Bart_CNN"]["Model_Name"]
+        text = await self.run_request(self.service.summarize(
+            model,
+            text=body["text"],
+            model_name=body.get("model_name", default_name),
+            min_length=int(body["min_length"]),
+            max_length=int(body["max_length"])
+        ))
+        self.write({"text": text})
+
+
+class EntitiesHandler(_ServiceHandler):
+    """
+    POST /entities with {"text", "labels", "model_name", "max_length"}. Returns {"entities": [...]}.
+    """
+
+    async def post(self):
+        body = self.json_body()
+        configs = cf.MODELS_CONFIG["Gliner_Model"]
+        entities = await self.run_request(self.service.extract_entities(
+            text=body["text"],
+            labels=body.get("labels", configs["Labels"]),
+            model_name=body.get("model_name", configs["Model_Name"]),
+            max_length=int(body.get("max_length", configs["Maximum_Length"]))
+        ))
+        self.write({"entities": entities})
+
+
+class HealthHandler(_ServiceHandler):
+    """
+    GET /health returns the batching statistics and the resident models.
+    """
+
+    def get(self):
+        self.write({"status": "ok", **self.service.stats()})
+
+
+def make_app(service: InferenceService) -> tornado.web.Application:
+    """
+    Creates the Tornado application routing the HTTP endpoints to the inference service.
+
+    Args:
+        service: The service hosting the models.
+
+    Returns:
+        tornado.web.Application: The application, ready to be served.
+    """
+
+    kwargs = {"service": service}
+    return tornado.web.Application([
+        (r"/transcribe", TranscribeHandler, kwargs),
+        (r"/summarize/(t5|bart)", SummarizeHandler, kwargs),
+        (r"/entities", EntitiesHandler, kwargs),
+        (r"/health", HealthHandler, kwargs)
+    ])
+
+
+async def serve(host: str, port: int, unix_socket: str | None, max_batch_size: int, max_wait_ms: float) -> None:
+    """
+    Serves the inference service until the process is stopped.
+
+    Args:
+        host: The interface to listen on.
+        port: The TCP port to listen on.
+        unix_socket: A Unix socket path to listen on instead of TCP, if given.
+        max_batch_size: Maximum number of requests per batch.
+        max_wait_ms: Maximum time a request waits for others to join its batch, in milliseconds.
+    """
+
+    service = InferenceService(max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    server = tornado.httpserver.HTTPServer(make_app(service), max_body_size=1024 ** 3)
+
+    if unix_socket:
+        server.add_socket(tornado.netutil.bind_unix_socket(unix_socket))
+        logger.info(f"Inference server listening on {unix_socket}.")
+    else:
+        server.listen(port, address=host)
+        logger.info(f"Inference server listening on http://{host}:{port}.")
+
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the models with dynamic micro-batching.")
+    parser.add_argument("--host", default=CONFIGS["Host"], help="Interface to listen on.")
+    parser.add_argument("--port", type=int, default=CONFIGS["Port"], help="TCP port to listen on.")
+    parser.add_argument("--unix-socket", default=CONFIGS["Unix_Socket"], help="Unix socket path, replaces TCP.")
+    parser.add_argument("--max-batch-size", type=int, default=CONFIGS["Max_Batch_Size"], help="Requests per batch.")
+    parser.add_argument("--max-wait-ms", type=float, default=CONFIGS["Max_Wait_Milliseconds"], help="Batching window.")
+    args = parser.parse_args()
+
+    # The server is the only process running the models, so it gets the whole core budget
+    runtime_policy.apply(processes=1)
+    asyncio.run(serve(args.host, args.port, args.unix_socket, args.max_batch_size, args.max_wait_ms))
@@ -0,0 +1,386 @@
+
+import contextlib
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Iterator
+from src import global_configs as cf
+
+CONFIGS = cf.STREAMLIT_CONFIG["Job_Queue"]
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    dedup_key TEXT NOT NULL,
+    params TEXT NOT NULL,
+    payload BLOB,
+    status TEXT NOT NULL,
+    stage TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    partial TEXT,
+    result TEXT,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    heartbeat_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_dedup ON jobs (dedup_key, status);
+CREATE TABLE IF NOT EXISTS workers (
+    id TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    heartbeat_at REAL NOT NULL
+);
+"""
+
+# Order in which queued jobs start: users with the fewest running jobs first, then the user served the
+# longest time ago, then the oldest job, so that one user submitting many files cannot starve others
+_QUEUE_ORDER = """
+ORDER BY
+    (SELECT COUNT(*) FROM jobs r WHERE r.user_id = j.user_id AND r.status = 'running'),
+    COALESCE((SELECT MAX(s.started_at) FROM jobs s WHERE s.user_id = j.user_id), 0),
+    j.created_at
+"""
+
+# Queued job to run next
+_NEXT_JOB = f"SELECT j.id FROM jobs j WHERE j.status = 'queued' {_QUEUE_ORDER} LIMIT 1"
+
+# Number of queued jobs that start before a given one, in the same order
+_QUEUE_POSITION = f"""
+SELECT position FROM (
+    SELECT j.id, ROW_NUMBER() OVER ({_QUEUE_ORDER}) - 1 AS position FROM jobs j WHERE j.status = 'queued'
+) WHERE id = ?
+"""
+
+def job_key(kind: str, params: dict, payload: bytes) -> str:
+    """
+    Creates the deduplication key of a job. Two jobs share a key only when they run the same
+    pipeline with the same parameters on the same audio content.
+
+    Args:
+        kind: The pipeline run by the job, e.g. "speech" or "song".
+        params: The parameters of the pipeline.
+        payload: The encoded audio file.
+
+    Returns:
+        str: A hexadecimal SHA-256 digest.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(kind.encode("utf-8"))
+    digest.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+    digest.update(hashlib.sha256(payload).digest())
+    return digest.hexdigest()
+
+
+class JobQueue:
+    """
+    A job queue stored in a SQLite database, shared by the Streamlit sessions submitting jobs and
+    the worker processes running them. Every operation opens its own connection and runs in a
+    single transaction, so any number of processes can use the same database.
+    """
+
+    def __init__(
+        self, db_path: str | Path, max_concurrent_jobs: int = 1,
+        stale_after_seconds: float = 60, max_attempts: int = 2
+    ):
+        """
+        Args:
+            db_path: The location of the SQLite database, created if it does not exist.
+            max_concurrent_jobs: Maximum number of jobs running at the same time across all workers.
+            stale_after_seconds: Time without heartbeat after which a running job is considered
+                abandoned by its worker.
+            max_attempts: Number of times a job is started before an abandoned job is marked failed.
+        """
+
+        self.db_path = Path(db_path)
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.stale_after_seconds = stale_after_seconds
+        self.max_attempts = max_attempts
+
+        os.makedirs(self.db_path.parent, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Close the connection on exit, which also rolls back a transaction left open by an error
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row | None, with_payload: bool = False) -> dict | None:
+        if row is None:
+            return None
+
+        job = {key: row[key] for key in row.keys() if key != "payload" or with_payload}
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def submit(self, kind: str, params: dict, payload: bytes, user_id: str) -> str:
+        """
+        Adds a job to the queue. If an identical job is already queued or running, its id is
+        returned instead and no new job is created.
+
+        Args:
+            kind: The pipeline to run, e.g. "speech" or "song".
+            params: The JSON serializable parameters of the pipeline.
+            payload: The encoded audio file.
+            user_id: The identifier of the submitting user, used to share workers fairly.
+
+        Returns:
+            str: The id of the job.
+        """
+
+        key = job_key(kind, params, payload)
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE dedup_key = ? AND status IN (?, ?) LIMIT 1",
+                (key, QUEUED, RUNNING)
+            ).fetchone()
+            if row is not None:
+                conn.execute("COMMIT")
+                return row["id"]
+
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, kind, user_id, dedup_key, params, payload, status, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, user_id, key, json.dumps(params), payload, QUEUED, time.time())
+            )
+            conn.execute("COMMIT")
+
+        return job_id
+
+    def _recover_stale(self, conn: sqlite3.Connection) -> None:
+        # Put abandoned jobs back in the queue, or fail them once they used all their attempts
+        deadline = time.time() - self.stale_after_seconds
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = 'The worker stopped responding.', finished_at = ? "
+            "WHERE status = ? AND heartbeat_at < ? AND attempts >= ?",
+            (FAILED, time.time(), RUNNING, deadline, self.max_attempts)
+        )
+        conn.execute(
+            "UPDATE jobs SET status = ?, worker_id = NULL WHERE status = ? AND heartbeat_at < ?",
+            (QUEUED, RUNNING, deadline)
+        )
+
+    def claim(self, worker_id: str) -> dict | None:
+        """
+        Starts the next job for a worker, unless the concurrency cap is reached.
+
+        Args:
+            worker_id: The identifier of the worker claiming the job.
+
+        Returns:
+            dict | None: The job with its payload, or None if no job can start now.
+        """
+
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            self._recover_stale(conn)
+
+            running = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (RUNNING,)).fetchone()[0]
+            row = conn.execute(_NEXT_JOB).fetchone() if running < self.max_concurrent_jobs else None
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            now = time.time()
+            conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, started_at = ?, heartbeat_at = ?, "
+                "attempts = attempts + 1, stage = NULL, progress = 0, partial = NULL WHERE id = ?",
+                (RUNNING, worker_id, now, now, row["id"])
+            )
+            job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+
+        return self._to_dict(job, with_payload=True)
+
+    def heartbeat(self, job_id: str) -> None:
+        """
+        Records that the worker running the job is still alive.
+
+        Args:
+            job_id: The id of the job.
+        """
+
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = ?", (time.time(), job_id, RUNNING))
+
+    def update_progress(self, job_id: str, stage: str, progress: float) -> None:
+        """
+        Records the stage a running job has reached.
+
+        Args:
+            job_id: The id of the job.
+            stage: The name of the current stage.
+            progress: The completed fraction of the job, between 0 and 1.
+        """
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET stage = ?, progress = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (stage, progress, time.time(), job_id, RUNNING)
+            )
+
+    def update_partial(self, job_id: str, partial: str) -> None:
+        """
+        Records the output a running job has produced so far, e.g. the transcript decoded up to now.
+
+        Args:
+            job_id: The id of the job.
+            partial: The output so far, replacing the previous one.
+        """
+
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET partial = ?, heartbeat_at = ? WHERE id = ? AND status = ?",
+                (partial, time.time(), job_id, RUNNING)
+            )
+
+    def complete(self, job_id: str, worker_id: str, result: dict) -> bool:
+        """
+        Stores the result of a job and releases its payload, unless the job was given to another
+        worker in the meantime, e.g. after its heartbeat went stale.
+
+        Args:
+            job_id: The id of the job.
+            worker_id: The identifier of the worker that ran the job.
+            result: The JSON serializable output of the pipeline.
+
+        Returns:
+            bool: Whether the result was stored.
+        """
+
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, payload = NULL, partial = NULL, progress = 1, stage = ?, "
+                "finished_at = ? WHERE id = ? AND status = ? AND worker_id = ?",
+                (DONE, json.dumps(result, default=float), DONE, time.time(), job_id, RUNNING, worker_id)
+            ).rowcount > 0
+
+    def fail(self, job_id: str, worker_id: str, error: str) -> bool:
+        """
+        Marks a job as failed and releases its payload, unless the job was given to another worker
+        in the meantime.
+
+        Args:
+            job_id: The id of the job.
+            worker_id: The identifier of the worker that ran the job.
+            error: The description of the failure shown to the user.
+
+        Returns:
+            bool: Whether the failure was stored.
+        """
+
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, payload = NULL, finished_at = ? "
+                "WHERE id = ? AND status = ? AND worker_id = ?",
+                (FAILED, error, time.time(), job_id, RUNNING, worker_id)
+            ).rowcount > 0
+
+    def get(self, job_id: str) -> dict | None:
+        """
+        Returns a job without its payload.
+
+        Args:
+            job_id: The id of the job.
+
+        Returns:
+            dict | None: The job, or None if the id is unknown.
+        """
+
+        with self._connect() as conn:
+            return self._to_dict(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def position(self, job_id: str) -> int:
+        """
+        Returns the number of queued jobs that would start before the given one, following the
+        order in which workers claim jobs.
+
+        Args:
+            job_id: The id of the job.
+
+        Returns:
+            int: The number of jobs ahead in the queue, 0 if the job is no longer queued.
+        """
+
+        with self._connect() as conn:
+            row = conn.execute(_QUEUE_POSITION, (job_id,)).fetchone()
+            return row[0] if row is not None else 0
+
+    def register_worker(self, worker_id: str) -> None:
+        """
+        Records that a worker process is alive. Workers call it on every poll.
+
+        Args:
+            worker_id: The identifier of the worker.
+        """
+
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO workers (id, pid, heartbeat_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET heartbeat_at = excluded.heartbeat_at",
+                (worker_id, os.getpid(), time.time())
+            )
+
+    def remove_worker(self, worker_id: str) -> None:
+        """
+        Forgets a worker process, called when it stops.
+
+        Args:
+            worker_id: The identifier of the worker.
+        """
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM workers WHERE id = ?", (worker_id,))
+
+    def live_workers(self) -> int:
+        """
+        Returns the number of workers that polled the queue recently.
+        """
+
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM workers WHERE heartbeat_at >= ?",
+                (time.time() - self.stale_after_seconds,)
+            ).fetchone()[0]
+
+
+@functools.lru_cache(maxsize=1)
+def default_queue() -> JobQueue:
+    """
+    Returns the job queue configured in the Streamlit configurations.
+    """
+
+    return JobQueue(
+        db_path=cf.DATA_PATH.joinpath(CONFIGS["Database"]).resolve(),
+        max_concurrent_jobs=CONFIGS["Max_Concurrent_Jobs"],
+        stale_after_seconds=CONFIGS["Stale_After_Seconds"],
+        max_attempts=CONFIGS["Max_Attempts"]
+    )
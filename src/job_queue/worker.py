@@ -0,0 +1,205 @@
+
+import argparse
+import io
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Callable
+from src import global_configs as cf
+from src.job_queue import store
+from tools.utils import runtime_policy
+
+logger = logging.getLogger(__name__)
+
+CONFIGS = cf.STREAMLIT_CONFIG["Job_Queue"]
+PROJECT_ROOT = Path(__file__).joinpath("..", "..", "..").resolve()
+
+
+def _audio_file(job: dict) -> io.BytesIO:
+    # Keep the original file name so that tools relying on the extension see the right format
+    audio = io.BytesIO(job["payload"])
+    audio.name = job["params"]["filename"]
+    return audio
+
+
+def _run_speech(job: dict, progress: Callable[[str, float], None], partial: Callable[[str], None]) -> dict:
+    # Imported here so that a worker only loads the pipelines of the jobs it runs
+    from src.speech_inference import text_inference
+
+    params = job["params"]
+    return text_inference.run_speech_pipeline(
+        audio=_audio_file(job),
+        model_selection=params["model_selection"],
+        system_prompt=params.get("system_prompt"),
+        user_prompt=params.get("user_prompt"),
+        progress=progress
+    )
+
+
+def _run_song(job: dict, progress: Callable[[str, float], None], partial: Callable[[str], None]) -> dict:
+    from src.song_inference.inference_pipeline import full_inference_pipeline
+
+    # Publish the growing transcript after every decoded segment
+    segments = []
+
+    def on_segment(segment: dict) -> None:
+        segments.append(segment["text"])
+        partial("".join(segments))
+
+    params = job["params"]
+    return full_inference_pipeline(
+        file=_audio_file(job),
+        transcription_model=params["transcription_model"],
+        summary_model=params["summary_model"],
+        extract_vocals=params["extract_vocals"],
+        progress=progress,
+        on_segment=on_segment
+    )
+
+
+# Pipeline run for every kind of job
+JOB_RUNNERS: dict[str, Callable[[dict, Callable[[str, float], None], Callable[[str], None]], dict]] = {
+    "speech": _run_speech,
+    "song": _run_song
+}
+
+
+def _keep_alive(queue: store.JobQueue, job_id: str, interval: float, stop: threading.Event) -> None:
+    # Long stages report no progress, so heartbeats come from a separate thread
+    while not stop.wait(interval):
+        queue.heartbeat(job_id)
+
+
+def run_job(queue: store.JobQueue, job: dict, heartbeat_seconds: float) -> None:
+    """
+    Runs a claimed job and stores its result or error in the queue.
+
+    Args:
+        queue: The job queue the job was claimed from.
+        job: The claimed job, including its payload.
+        heartbeat_seconds: Interval between two heartbeats of the job.
+    """
+
+    stop = threading.Event()
+    keep_alive = threading.Thread(
+        target=_keep_alive, args=(queue, job["id"], heartbeat_seconds, stop), daemon=True
+    )
+    keep_alive.start()
+
+    start = time.perf_counter()
+    try:
+        runner = JOB_RUNNERS[job["kind"]]
+        result = runner(
+            job,
+            lambda stage, fraction: queue.update_progress(job["id"], stage, fraction),
+            lambda partial: queue.update_partial(job["id"], partial)
+        )
+        if queue.complete(job["id"], job["worker_id"], result):
+            logger.info(f"Job {job['id']} ({job['kind']}) done in {time.perf_counter() - start:.2f} seconds.")
+        else:
+            logger.warning(f"Job {job['id']} ({job['kind']}) was given to another worker, its result is dropped.")
+
+    except Exception as e:
+        logger.exception(f"Job {job['id']} ({job['kind']}) failed.")
+        if not queue.fail(job["id"], job["worker_id"], f"{type(e).__name__}: {e}"):
+            logger.warning(f"Job {job['id']} ({job['kind']}) was given to another worker, its error is dropped.")
+
+    finally:
+        stop.set()
+        keep_alive.join()
+
+
+def run_worker(queue: store.JobQueue | None = None, poll_interval: float | None = None) -> None:
+    """
+    Claims and runs jobs until the process is stopped. The models loaded by the jobs stay in the
+    model registry of the worker process, so later jobs reuse them.
+
+    Args:
+        queue: The job queue to serve. Defaults to the configured queue.
+        poll_interval: Seconds to wait when no job can start. Defaults to the configured interval.
+    """
+
+    queue = queue or store.default_queue()
+    poll_interval = poll_interval or CONFIGS["Poll_Interval_Seconds"]
+    worker_id = f"{os.uname().nodename}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    logger.info(f"Worker {worker_id} serving {queue.db_path}.")
+
+    try:
+        while True:
+            queue.register_worker(worker_id)
+            job = queue.claim(worker_id)
+            if job is None:
+                time.sleep(poll_interval)
+                continue
+            run_job(queue, job, CONFIGS["Heartbeat_Seconds"])
+
+    except KeyboardInterrupt:
+        logger.info(f"Worker {worker_id} stopped.")
+
+    finally:
+        queue.remove_worker(worker_id)
+
+
+def run_worker_process(slot: int, workers: int) -> None:
+    """
+    Applies the runtime policy to a worker process, before any model is loaded, then runs the worker.
+
+    Args:
+        slot: Index of the worker among the workers started together, used to pin it to its cores.
+        workers: Number of workers started together, sharing the core budget.
+    """
+
+    runtime_policy.apply(processes=workers, slot=slot)
+    run_worker()
+
+
+def ensure_workers(count: int | None = None) -> None:
+    """
+    Starts worker processes in the background when fewer than the requested number are alive, so
+    that jobs submitted from the Streamlit application are served without starting workers by hand.
+
+    Args:
+        count: Number of workers to keep alive. Defaults to the configured number of workers.
+    """
+
+    count = count or CONFIGS["Workers"]
+    missing = count - store.default_queue().live_workers()
+    if missing <= 0:
+        return
+
+    logger.info(f"Starting {missing} job queue worker(s).")
+    subprocess.Popen(
+        [sys.executable, "-m", "src.job_queue.worker", "--workers", str(missing)],
+        cwd=PROJECT_ROOT,
+        start_new_session=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+
+    # Let the workers register, so that the next check does not start them a second time
+    deadline = time.monotonic() + CONFIGS["Heartbeat_Seconds"]
+    while store.default_queue().live_workers() < count and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the inference job queue workers.")
+    parser.add_argument("--workers", type=int, default=CONFIGS["Workers"], help="Number of worker processes.")
+    args = parser.parse_args()
+
+    if args.workers <= 1:
+        run_worker_process(0, 1)
+    else:
+        processes = [
+            multiprocessing.Process(target=run_worker_process, args=(slot, args.workers)) for slot in range(args.workers)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
@@ -7,7 +7,7 @@ run_download_pipeline = define_asset_job(
     selection=[
         "download_data", "unpack_move", "clean_up",
         "file_structure_gather", "metadata_gather", "save_metadata",
-        "speech_to_text_conversion", "save_transcriptions", "create_full_dataset"
+        "log_mel_features", "speech_to_text_conversion", "save_transcriptions", "create_full_dataset"
     ]
 )
 
@@ -2,7 +2,7 @@
 import polars as pl
 import os
 import dagster as dg
-from src import global_configs as cf
+from src import asset_metrics, global_configs as cf
 
 CONFIGS = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]
 
@@ -11,6 +11,7 @@ CONFIGS = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]
     ins={"df_entities": dg.AssetIn(key="entity_recognition"), "df_summarized": dg.AssetIn(key="t5_summarization")},
     kinds={"python", "polars", "parquet"}
 )
+@asset_metrics.instrument_asset
 def combine_data(df_entities: pl.DataFrame, df_summarized: pl.DataFrame) -> None:
     """
     Combines entity data and summarized text data into a single representation,
@@ -49,10 +50,21 @@ def combine_data(df_entities: pl.DataFrame, df_summarized: pl.DataFrame) -> None
             {
                 "text_Persons": "persons_text", "text_Location": "location_text", "text_Organization": "org_text",
                 "score_Persons": "persons_score", "score_Location": "location_score", "score_Organization": "org_score"
-            }
+            },
+            strict=False
         )
     )
 
+    # A label found in no chapter has no pivoted column, so add it empty to keep the output columns fixed
+    entity_columns = {
+        "persons_text": pl.List(pl.String), "location_text": pl.List(pl.String), "org_text": pl.List(pl.String),
+        "persons_score": pl.List(pl.Float64), "location_score": pl.List(pl.Float64), "org_score": pl.List(pl.Float64)
+    }
+    df_entities = df_entities.with_columns(
+        pl.lit(None, dtype=dtype).alias(column)
+        for column, dtype in entity_columns.items() if column not in df_entities.columns
+    )
+
     # Clean the summarized text
     df_summarized = (
         df_summarized
@@ -77,4 +89,5 @@ def combine_data(df_entities: pl.DataFrame, df_summarized: pl.DataFrame) -> None
         )
 
     else:
-        df.write_csv(file_path)
\ No newline at end of file
+        df.write_csv(file_path)
+    asset_metrics.record(rows=df.height, output_file=file_path)
\ No newline at end of file
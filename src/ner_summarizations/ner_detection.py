@@ -1,10 +1,12 @@
 
 import polars as pl
 import os
+import json
 import logging
 import dagster as dg
-from gliner import GLiNER
-from src import global_configs as cf
+from src import asset_metrics, global_configs as cf
+from src.resources import GlinerResource
+from tools.utils import memo_utils
 
 logger = logging.getLogger(__name__)
 CONFIGS = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]
@@ -14,20 +16,24 @@ CONFIGS = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]
     ins={"data": dg.AssetIn(key="data_sourcing")},
     kinds={"python", "polars", "huggingface"}
 )
-def entity_recognition(data: dict) -> pl.DataFrame:
+@asset_metrics.instrument_asset
+def entity_recognition(data: dict, gliner_model: GlinerResource) -> pl.DataFrame:
     """
     Processes a given dataset to perform Named Entity Recognition (NER) using a pretrained
     GLiNER model and returns a DataFrame containing extracted entities.
 
     This function leverages a GLiNER model to identify and extract entities from text
-    transcripts provided in the input data. The extracted entities are then combined
-    with the original data as a new column to create the final DataFrame.
+    transcripts provided in the input data. Extracted entities are memoized by a hash of the
+    transcript, the model name, and the labels, so only chapters whose transcript changed since
+    the last run are sent to the model. The memoized and new entities are merged back by user
+    and chapter as a new column to create the final DataFrame.
 
     Args:
         data (dict): A dictionary containing the input data. It must include:
             - "transcripts" (list of str): A list of text strings for which to perform NER.
             - "df" (pl.DataFrame): A Polars DataFrame with columns 'user_id' and 'chapter_id'
               used for retaining the mapping of the extracted entities.
+        gliner_model (GlinerResource): The resource holding the shared GLiNER model.
 
     Returns:
         pl.DataFrame: A Polars DataFrame with the original 'user_id' and 'chapter_id' columns
@@ -38,28 +44,70 @@ def entity_recognition(data: dict) -> pl.DataFrame:
     # Get configurations for NER
     model_ident = CONFIGS["Named_Entity_Models"]["Gliner_Identifier"]
     model_configs = cf.MODELS_CONFIG[model_ident]
-
-    # Create an instance of Gliner for NER
-    model = GLiNER.from_pretrained(
-        pretrained_model_name_or_path=model_configs["Model_Name"],
-        load_tokenizer=True,
-        max_length=model_configs["Maximum_Length"]
-    ).to("cuda" if cf.DEVICE == "auto" else cf.DEVICE).eval()
     labels = model_configs["Labels"]
+    memo_configs = CONFIGS["Folder_Tree"]["Memo_Tables"]
+    memo_path = cf.DATA_PATH.joinpath(memo_configs["Folder_Name"], memo_configs["Named_Entity_Filename"]).resolve()
 
-    # For each of the recording, extract NER
-    text_entities = []
-    for text in data["transcripts"]:
-        entities = model.predict_entities(text, labels)
-        text_entities.append(entities)
+    # Key every transcript by its content and the model settings, and split cached and new rows
+    generation_config = {"labels": labels, "max_length": model_configs["Maximum_Length"], "backend": model_configs["Backend"]}
+    df = (
+        data["df"]
+        .select("user_id", "chapter_id")
+        .with_columns(
+            pl.Series(
+                "memo_key",
+                [memo_utils.memo_key(text, model_configs["Model_Name"], generation_config) for text in data["transcripts"]],
+                dtype=pl.String
+            ),
+            pl.Series("transcript", data["transcripts"], dtype=pl.String)
+        )
+    )
+    memo = memo_utils.read_memo(memo_path, schema={"memo_key": pl.String, "entities_json": pl.String})
+    hits = df.join(memo, on="memo_key", how="inner")
+    misses = df.join(memo, on="memo_key", how="anti")
+    logger.info(f"Serving {hits.height} entity lists from memo, extracting {misses.height} transcripts.")
+
+    # For each of the new recording, extract NER
+    new_entities = []
+    if misses.height > 0:
+        # Get the shared instance of Gliner for NER
+        model = gliner_model.get_model()
+        for text in misses["transcript"]:
+            with asset_metrics.timed("inference_seconds"):
+                entities = model.inference(text, labels)
+            new_entities.append(json.dumps(entities))
+
+    misses = misses.with_columns(pl.Series("entities_json", new_entities, dtype=pl.String))
+
+    # Merge the memoized and new entities back onto the original rows and update the memo table
+    entities_df = (
+        data["df"]
+        .select("user_id", "chapter_id")
+        .join(
+            pl.concat([hits, misses]).select("user_id", "chapter_id", "entities_json"),
+            on=["user_id", "chapter_id"],
+            how="left",
+            maintain_order="left"
+        )
+    )
+    text_entities = [json.loads(x) for x in entities_df["entities_json"]]
+    if misses.height > 0:
+        memo_utils.write_memo(
+            file_path=memo_path,
+            memo=memo,
+            new_rows=misses,
+            compression=memo_configs["Compression"],
+            compression_level=memo_configs["Compression_Level"]
+        )
 
     # Combine the data into dataframe and proceed to saving next
     df = (
-        data["df"]
+        entities_df
         .hstack(pl.DataFrame({"extracted_entities": text_entities}))
         .select("user_id", "chapter_id", "extracted_entities")
     )
 
+    asset_metrics.record(**gliner_model.load_metadata(), memo_hits=hits.height, memo_misses=misses.height)
     return df
 
 
@@ -67,6 +115,7 @@ def entity_recognition(data: dict) -> pl.DataFrame:
     ins={"df": dg.AssetIn(key="entity_recognition")},
     kinds={"python", "polars", "parquet"}
 )
+@asset_metrics.instrument_asset
 def save_entities(df: pl.DataFrame) -> None:
     """
     Save processed entities to a specified output file based on configurations.
@@ -99,3 +148,4 @@ def save_entities(df: pl.DataFrame) -> None:
 
     else:
         df.write_csv(save_path)
+    asset_metrics.record(rows=df.height, output_file=save_path)
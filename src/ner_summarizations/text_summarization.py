@@ -4,8 +4,9 @@ import os
 import logging
 import dagster as dg
 from tqdm import tqdm
-from src import global_configs as cf
-from tools.models import google_flan
+from src import asset_metrics, global_configs as cf
+from src.resources import FlanT5Resource
+from tools.utils import memo_utils
 from src.data_ingestion import text_preprocessing
 
 logger = logging.getLogger(__name__)
@@ -16,6 +17,7 @@ CONFIGS = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]
     deps=[text_preprocessing.create_full_dataset],
     kinds={"python", "parquet", "polars"}
 )
+@asset_metrics.instrument_asset
 def data_sourcing() -> dict:
     """
     Fetches and processes data from a specified folder and file, returning both the data
@@ -47,7 +49,8 @@ def data_sourcing() -> dict:
     ins={"data": dg.AssetIn(key="data_sourcing")},
     kinds={"python", "huggingface", "google"}
 )
-def t5_summarization(data: dict) -> pl.DataFrame:
+@asset_metrics.instrument_asset
+def t5_summarization(data: dict, t5_model: FlanT5Resource) -> pl.DataFrame:
     """
     Generates text summaries of varying lengths using the T5 summarization model, then combines the
     summaries with the original data into a new DataFrame.
@@ -55,14 +58,17 @@ def t5_summarization(data: dict) -> pl.DataFrame:
     This function utilizes a pre-trained T5 model to create summaries of input text from the provided
     data dictionary. The summaries are generated for three distinct configurations: short, medium, and
     large output lengths. Each configuration specifies minimum and maximum token limits for the
-    summaries. The resulting summaries are combined with the original data and returned as a new
-    Polars DataFrame.
+    summaries. Summaries are memoized by a hash of the transcript, the model name, and the length
+    configurations, so only chapters whose transcript changed since the last run are sent to the
+    model. The memoized and newly generated summaries are merged back by user and chapter and returned
+    as a new Polars DataFrame.
 
     Args:
         data (dict): A dictionary containing the input data. It should have the following keys:
             - "transcripts" (list of str): A list of text strings to summarize.
             - "df" (pl.DataFrame): A Polars DataFrame containing the original dataset to be combined
               with the generated summaries.
+        t5_model (FlanT5Resource): The resource holding the shared T5 model.
 
     Returns:
         pl.DataFrame: A new Polars DataFrame that includes the original columns "user_id" and
@@ -74,44 +80,78 @@ def t5_summarization(data: dict) -> pl.DataFrame:
     model_ident = CONFIGS["Summarization_Models"]["T5_Model_Identifier"]
     model_configs = cf.MODELS_CONFIG[model_ident]
     token_length = model_configs["Maximum_Token_Generation"]
+    memo_configs = CONFIGS["Folder_Tree"]["Memo_Tables"]
+    memo_path = cf.DATA_PATH.joinpath(memo_configs["Folder_Name"], memo_configs["Summarization_Filename"]).resolve()
 
     summarization_configs = [
         (token_length["Short_Output"]["Minimum_Length"], token_length["Short_Output"]["Maximum_Length"]),
         (token_length["Medium_Output"]["Minimum_Length"], token_length["Medium_Output"]["Maximum_Length"]),
         (token_length["Large_Output"]["Minimum_Length"], token_length["Large_Output"]["Maximum_Length"])
     ]
+    summary_columns = ["t5_short", "t5_medium", "t5_large"]
 
-    # Instantiate a T5 model
-    model = google_flan.GoogleFlanT5(
-        model_name=model_configs["Model_Name"],
-        device=cf.DEVICE,
-        token_required=model_configs["Hugging_Face_Token"],
-        token=None
+    # Key every transcript by its content and the generation settings, and split cached and new rows
+    generation_config = {"prefix": "summarize: ", "lengths": summarization_configs, "backend": model_configs["Backend"]}
+    df = (
+        data["df"]
+        .select("user_id", "chapter_id")
+        .with_columns(
+            pl.Series(
+                "memo_key",
+                [memo_utils.memo_key(text, model_configs["Model_Name"], generation_config) for text in data["transcripts"]],
+                dtype=pl.String
+            ),
+            pl.Series("transcript", data["transcripts"], dtype=pl.String)
+        )
+    )
+    memo = memo_utils.read_memo(memo_path, schema={"memo_key": pl.String, **{c: pl.String for c in summary_columns}})
+    hits = df.join(memo, on="memo_key", how="inner")
+    misses = df.join(memo, on="memo_key", how="anti")
+    logger.info(f"Serving {hits.height} summaries from memo, summarizing {misses.height} transcripts.")
+
+    # For each of the summarization length, create summarizations for the new text only
+    summaries = [[] for _ in summarization_configs]
+    if misses.height > 0:
+        # Get the shared instance of T5 model
+        model = t5_model.get_model()
+
+        for idx, config in enumerate(summarization_configs):
+            min_length, max_length = config
+
+            for text in tqdm(misses["transcript"], desc="Summarizing transcripts"):
+                with asset_metrics.timed("inference_seconds"):
+                    summary = model.inference(
+                        input_text=f"summarize: {text}",
+                        min_length=min_length,
+                        max_length=max_length
+                    )
+                summaries[idx].append(summary)
+
+    misses = misses.hstack(
+        pl.DataFrame(dict(zip(summary_columns, summaries)), schema={c: pl.String for c in summary_columns})
     )
 
-    # For each of the summarization length, create summarizations for all text
-    summaries = []
-    for config in summarization_configs:
-        min_length, max_length = config
-        summarizations = []
-
-        for text in tqdm(data["transcripts"], desc="Summarizing transcripts"):
-            summary = model.inference(
-                input_text=f"summarize: {text}",
-                min_length=min_length,
-                max_length=max_length
-            )
-            summarizations.append(summary)
-
-        summaries.append(summarizations)
-
-    # Move the summaries back into a dataframe and join it with the original dataframe
+    # Merge the memoized and new summaries back onto the original rows and update the memo table
     df = (
         data["df"]
-        .hstack(pl.DataFrame({"t5_short": summaries[0], "t5_medium": summaries[1], "t5_large": summaries[2]}))
-        .select("user_id", "chapter_id", "t5_short", "t5_medium", "t5_large")
+        .select("user_id", "chapter_id")
+        .join(
+            pl.concat([hits, misses]).select("user_id", "chapter_id", *summary_columns),
+            on=["user_id", "chapter_id"],
+            how="left",
+            maintain_order="left"
+        )
     )
+    if misses.height > 0:
+        memo_utils.write_memo(
+            file_path=memo_path,
+            memo=memo,
+            new_rows=misses,
+            compression=memo_configs["Compression"],
+            compression_level=memo_configs["Compression_Level"]
+        )
 
+    asset_metrics.record(**t5_model.load_metadata(), memo_hits=hits.height, memo_misses=misses.height)
     return df
 
 
@@ -119,6 +159,7 @@ def t5_summarization(data: dict) -> pl.DataFrame:
     ins={"df": dg.AssetIn(key="t5_summarization")},
     kinds={"python", "polars", "parquet"}
 )
+@asset_metrics.instrument_asset
 def save_summaries(df: pl.DataFrame) -> None:
     """
     Saves the provided DataFrame to a specified location in a specified format. The function retrieves
@@ -150,3 +191,4 @@ def save_summaries(df: pl.DataFrame) -> None:
 
     else:
         df.write_csv(save_path)
+    asset_metrics.record(rows=df.height, output_file=save_path)
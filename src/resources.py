@@ -0,0 +1,188 @@
+
+import abc
+import dagster as dg
+from typing import TYPE_CHECKING
+from pydantic import PrivateAttr
+from src import global_configs as cf
+from src.inference_server import client as inference_client
+from tools.models import model_registry
+from tools.utils import runtime_policy
+
+# The model wrappers import torch, which takes seconds, so they are imported when a model is loaded
+if TYPE_CHECKING:
+    from tools.models import gliner_ner, google_flan, whisper_ai
+
+
+class ModelResource(dg.ConfigurableResource):
+    """
+    Base class for resources that hold a heavy model. The model is loaded lazily on the first
+    `get_model` call and kept in the process model registry, so it is shared by every asset, run
+    and Streamlit session executed in the same process. Subclasses implement `_load` and `_remote`.
+    """
+
+    model_name: str
+    keep_loaded: bool = True
+    use_server: bool = False
+
+    _load_seconds: float = PrivateAttr(default=0.0)
+    _loaded: bool = PrivateAttr(default=False)
+
+    def _cache_key(self) -> tuple:
+        return type(self).__name__, self.model_name, cf.DEVICE
+
+    @abc.abstractmethod
+    def _load(self) -> object:
+        """
+        Loads the model in this process, called by the model registry on the first request.
+        """
+
+    @abc.abstractmethod
+    def _remote(self) -> object:
+        """
+        Returns a client running the model on the inference server.
+        """
+
+    def get_model(self):
+        """
+        Returns the model of this resource, loading it only if no other run in this process has
+        loaded it yet. When `use_server` is set, a client running the model on the inference
+        server is returned instead, so that concurrent runs share its batches.
+        """
+
+        if self.use_server:
+            return self._remote()
+
+        model, load_seconds = model_registry.MODEL_REGISTRY.acquire(self._cache_key(), self._load)
+        self._load_seconds += load_seconds
+        self._loaded = True
+        return model
+
+    def load_metadata(self) -> dict:
+        """
+        Returns metadata describing the model load of this run, to be attached to an asset
+        materialization.
+        """
+
+        return {
+            "model_name": self.model_name,
+            "model_served_remotely": self.use_server,
+            "model_load_seconds": round(self._load_seconds, 3),
+            "model_cache_hit": self._loaded and self._load_seconds == 0.0
+        }
+
+    def teardown_after_execution(self, context: dg.InitResourceContext) -> None:
+        # Models stay resident for the next run unless the resource is configured otherwise
+        if self._loaded and not self.keep_loaded:
+            model_registry.MODEL_REGISTRY.release(self._cache_key())
+
+
+class WhisperResource(ModelResource):
+    """
+    Whisper automatic speech recognition model shared across assets.
+    """
+
+    model_task: str = "automatic-speech-recognition"
+    token_required: bool = False
+
+    def _cache_key(self) -> tuple:
+        return "WhisperAI", self.model_name, cf.DEVICE
+
+    def _remote(self) -> inference_client.RemoteWhisper:
+        return inference_client.RemoteWhisper(inference_client.default_client(), self.model_name)
+
+    def _load(self) -> "whisper_ai.WhisperAI":
+        from tools.models import whisper_ai
+
+        return whisper_ai.WhisperAI(
+            model_name=self.model_name,
+            model_task=self.model_task,
+            device=cf.DEVICE,
+            token_required=self.token_required,
+            token=None
+        )
+
+
+class FlanT5Resource(ModelResource):
+    """
+    Google Flan T5 summarization model shared across assets.
+    """
+
+    token_required: bool = False
+    backend: str = "torch"
+
+    def _cache_key(self) -> tuple:
+        return "GoogleFlanT5", self.model_name, cf.DEVICE, self.backend
+
+    def _remote(self) -> inference_client.RemoteSummarizer:
+        return inference_client.RemoteSummarizer(inference_client.default_client(), "t5", self.model_name)
+
+    def _load(self) -> "google_flan.GoogleFlanT5":
+        from tools.models import google_flan
+
+        return google_flan.GoogleFlanT5(
+            model_name=self.model_name,
+            device=cf.DEVICE,
+            token_required=self.token_required,
+            token=None,
+            backend=self.backend,
+            onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+            onnx_threads=runtime_policy.onnx_threads()
+        )
+
+
+class GlinerResource(ModelResource):
+    """
+    GLiNER Named Entity Recognition model shared across assets.
+    """
+
+    max_length: int
+    backend: str = "torch"
+    cache_labels: bool = False
+
+    def _cache_key(self) -> tuple:
+        return "GlinerNER", self.model_name, cf.DEVICE, self.max_length, self.backend
+
+    def _remote(self) -> inference_client.RemoteGliner:
+        return inference_client.RemoteGliner(inference_client.default_client(), self.model_name, self.max_length)
+
+    def _load(self) -> "gliner_ner.GlinerNER":
+        from tools.models import gliner_ner
+
+        return gliner_ner.GlinerNER(
+            model_name=self.model_name,
+            device=cf.DEVICE,
+            max_length=self.max_length,
+            backend=self.backend,
+            onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+            onnx_threads=runtime_policy.onnx_threads(),
+            cache_labels=self.cache_labels
+        )
+
+
+# Resources definitions used by the Dagster code location
+_SPEECH_MODEL = cf.MODELS_CONFIG[cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]["Model_Identifier"]]
+_MODELING_CONFIG = cf.PIPELINE_CONFIG["Summarization_Named_Entity_Recognition"]
+_T5_MODEL = cf.MODELS_CONFIG[_MODELING_CONFIG["Summarization_Models"]["T5_Model_Identifier"]]
+_GLINER_MODEL = cf.MODELS_CONFIG[_MODELING_CONFIG["Named_Entity_Models"]["Gliner_Identifier"]]
+
+RESOURCES = {
+    "whisper_model": WhisperResource(
+        model_name=_SPEECH_MODEL["Model_Name"],
+        model_task=cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]["Model_Task"],
+        token_required=_SPEECH_MODEL["Hugging_Face_Token"],
+        use_server=cf.MODELS_CONFIG["Inference_Server"]["Enabled"]
+    ),
+    "t5_model": FlanT5Resource(
+        model_name=_T5_MODEL["Model_Name"],
+        token_required=_T5_MODEL["Hugging_Face_Token"],
+        backend=_T5_MODEL["Backend"],
+        use_server=cf.MODELS_CONFIG["Inference_Server"]["Enabled"]
+    ),
+    "gliner_model": GlinerResource(
+        model_name=_GLINER_MODEL["Model_Name"],
+        max_length=_GLINER_MODEL["Maximum_Length"],
+        backend=_GLINER_MODEL["Backend"],
+        cache_labels=_GLINER_MODEL["Label_Cache"],
+        use_server=cf.MODELS_CONFIG["Inference_Server"]["Enabled"]
+    )
+}
@@ -1,57 +1,110 @@
 
+from typing import Callable
+from src import global_configs as cf
+from tools.utils import audio_utils
+from tools.utils.stage_scheduler import Stage, run_stages
 from src.song_inference.separate import separate_vocals
-from src.song_inference.transcribe import transcribe_base, transcribe_small
+from src.song_inference.transcribe import stream_transcribe, transcribe_base, transcribe_small
 from src.song_inference.ner import extract_entities
 from src.song_inference.summarize import summarize_bart, summarize_t5
 
+# Maximum number of stages running at the same time
+MAX_CONCURRENT_STAGES = cf.PIPELINE_CONFIG["Song_Inference_Pipeline"]["Max_Concurrent_Stages"]
+
 
 def full_inference_pipeline(
     file,
     transcription_model: str = "base",
     summary_model: str = "bart",
-    extract_vocals: bool = False
+    extract_vocals: bool = False,
+    progress: Callable[[str, float], None] | None = None,
+    on_segment: Callable[[dict], None] | None = None
 ) -> dict:
     """
     Executes a full pipeline involving optional vocal separation, transcription, text summarization,
     and named entity recognition (NER). The pipeline processes an input file and returns a consolidated
-    output containing the transcription, multiple levels of summaries, and extracted entities.
+    output containing the transcription, multiple levels of summaries, and extracted entities. The
+    summaries and the entities only depend on the transcript, so they run concurrently up to the
+    stage limit of the pipeline configuration, while the stages sharing a model take turns on it.
 
     Args:
-        file: The path or handle to the input audio file that will be processed in this pipeline.
+        file: The path or handle to the input audio file that will be processed in this pipeline. It
+            is decoded in memory once and passed to the models as a waveform.
         transcription_model: The transcription model to use. Defaults to "base".
         summary_model: The summarization model to utilize. Defaults to "bart".
         extract_vocals: A boolean flag indicating whether to apply vocals separation. Defaults to False.
+        progress: Called with the name of each stage ("separation" or "decoding", "transcription",
+            "long_summary", "short_summary", "tiny_summary", "entities") and the completed fraction of
+            the pipeline when the stage starts. Defaults to None.
+        on_segment: Called with every transcript segment ("start", "end" and "text") as soon as it
+            is decoded. When given, the audio is transcribed window by window with
+            `stream_transcribe` instead of in one call. Defaults to None.
 
     Returns:
         dict: A dictionary encompassing the transcription, summaries at different granularity levels,
-              and named entities extracted from the transcription.
+              named entities extracted from the transcription, and the seconds taken by every stage
+              and the whole pipeline under "TIMINGS".
     """
 
-    # 1. Optional vocals extraction
+    # 1. Optional vocals extraction, otherwise decode the original audio
     if extract_vocals:
-        file = separate_vocals(file)
-
-    # 2. Transcription
-    if transcription_model == "small":
-        transcript = transcribe_small(file)
+        audio_stage = Stage("separation", lambda: separate_vocals(file), slots=MAX_CONCURRENT_STAGES)
     else:
-        transcript = transcribe_base(file)
+        audio_stage = Stage(
+            "decoding", lambda: audio_utils.decode_audio(file, sampling_rate=audio_utils.SAMPLING_RATE)
+        )
+
+    # 2. Transcription, streamed segment by segment when someone listens to the segments
+    def transcribe(audio) -> str:
+        if on_segment is None:
+            return transcribe_small(audio) if transcription_model == "small" else transcribe_base(audio)
 
-    # 3. Summarization
+        transcript = ""
+        for segment in stream_transcribe(audio, "small" if transcription_model == "small" else "base"):
+            transcript += segment["text"]
+            on_segment(segment)
+        return transcript
+
+    # 3. Summarization, the three lengths share one pipeline and take turns on it
     summarize_fn = summarize_bart if summary_model == "bart" else summarize_t5
-    long_sum = summarize_fn(transcript, mode="long")
-    short_sum = summarize_fn(transcript, mode="short")
-    tiny_sum = summarize_fn(transcript, mode="tiny")
+    summary_lock = f"summarizer:{summary_model}"
+
+    # 4. Named Entity Recognition runs next to the summaries, it only needs the transcript
+    stages = [
+        audio_stage,
+        Stage(
+            "transcription", lambda **audio: transcribe(audio[audio_stage.name]),
+            depends_on=(audio_stage.name,), lock="whisper", slots=MAX_CONCURRENT_STAGES
+        ),
+        Stage(
+            "long_summary", lambda transcription: summarize_fn(transcription, mode="long"),
+            depends_on=("transcription",), lock=summary_lock
+        ),
+        Stage(
+            "short_summary", lambda transcription: summarize_fn(transcription, mode="short"),
+            depends_on=("transcription",), lock=summary_lock
+        ),
+        Stage(
+            "tiny_summary", lambda transcription: summarize_fn(transcription, mode="tiny"),
+            depends_on=("transcription",), lock=summary_lock
+        ),
+        Stage(
+            "entities", lambda transcription: extract_entities(transcription), depends_on=("transcription",),
+            lock="gliner"
+        )
+    ]
 
-    # 4. Named Entity Recognition
-    entities = extract_entities(transcript)
+    outputs, timings = run_stages(stages, max_concurrency=MAX_CONCURRENT_STAGES, progress=progress)
+    if progress is not None:
+        progress("done", 1.0)
 
     # 5. Consolidate outputs
     return {
-        "TRANSCRIPT": transcript,
-        "LONG_SUMMARY": long_sum,
-        "SHORT_SUMMARY": short_sum,
-        "TINY_SUMMARY": tiny_sum,
+        "TRANSCRIPT": outputs["transcription"],
+        "LONG_SUMMARY": outputs["long_summary"],
+        "SHORT_SUMMARY": outputs["short_summary"],
+        "TINY_SUMMARY": outputs["tiny_summary"],
         # merge NER result keys
-        **entities
+        **outputs["entities"],
+        "TIMINGS": {stage: round(seconds, 3) for stage, seconds in timings.items()}
     }
\ No newline at end of file
@@ -1,5 +1,6 @@
 
-from gliner import GLiNER
+from src import global_configs as cf
+from tools.models import model_registry
 
 # Pronouns to filter out
 _PRONOUNS = {"i", "you", "we", "they", "it", "he", "she"}
@@ -12,8 +13,23 @@ _LABEL_MAP = {
 }
 DEFAULT_LABELS = list(_LABEL_MAP.keys())
 
-# Load GLiNER model once
-_model = GLiNER.from_pretrained("gliner-community/gliner_large-v2.5")
+_MODEL_NAME = "gliner-community/gliner_large-v2.5"
+# Key of the model in the process model registry, keeping the maximum length of the model configuration
+_MODEL_KEY = ("GlinerNER", _MODEL_NAME, "cpu", None, "torch")
+
+
+def _model():
+    # Load GLiNER on first use only, and keep it in the process model registry
+    def load():
+        from tools.models import gliner_ner
+        return gliner_ner.GlinerNER(
+            model_name=_MODEL_NAME,
+            device="cpu",
+            max_length=None,
+            cache_labels=cf.MODELS_CONFIG["Gliner_Model"]["Label_Cache"]
+        )
+
+    return model_registry.MODEL_REGISTRY.get(_MODEL_KEY, load)
 
 
 def extract_entities(text: str, labels: list[str] | None = None) -> dict:
@@ -40,7 +56,7 @@ def extract_entities(text: str, labels: list[str] | None = None) -> dict:
     # Prepare output
     entities = {category: [] for category in _LABEL_MAP.values()}
     # Predict GLiNER
-    raw = _model.predict_entities(text, labels)
+    raw = _model().inference(text, labels)
 
     for item in raw:
         label = item["label"]
@@ -1,50 +1,110 @@
 
+import hashlib
+import logging
 import os
-import subprocess
-from pathlib import Path
+import tempfile
+import numpy as np
+import torch
+import torchaudio
+from demucs.apply import apply_model
+from demucs.pretrained import get_model
+from src import global_configs as cf
+from tools.models import model_registry
+from tools.utils import audio_utils
 
+logger = logging.getLogger(__name__)
 
-def separate_vocals(audio, output_dir="/tmp/separated") -> str:
+CONFIGS = cf.MODELS_CONFIG["Demucs_Separation"]
+STEM_CACHE_PATH = cf.DATA_PATH.joinpath(CONFIGS["Stem_Cache_Folder"]).resolve()
+
+
+def _demucs_model(model_name: str) -> torch.nn.Module:
+    # Load the pretrained weights once and keep them in the process model registry
+    return model_registry.MODEL_REGISTRY.get(
+        ("Demucs", model_name, "cpu"),
+        lambda: get_model(model_name).cpu().eval()
+    )
+
+
+def _stem_key(data: bytes) -> str:
+    # The stem depends on the audio and on every setting that changes the output of the model
+    digest = hashlib.sha256(data)
+    digest.update(f"{CONFIGS['Model_Name']}:{CONFIGS['Shifts']}:{CONFIGS['Overlap']}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def extract_vocals(
+    model: torch.nn.Module, mix: torch.Tensor, workers: int = 0, overlap: float = 0.25, shifts: int = 1
+) -> torch.Tensor:
+    """
+    Separates the vocal stem of a stereo mix with a Demucs model. The mix is split into overlapping
+    segments that are processed by a pool of threads and cross-faded back together.
+
+    Args:
+        model: A Demucs model, or a bag of models, with a "vocals" source.
+        mix: The stereo mix, shaped (channels, samples), sampled at the rate of the model.
+        workers: Number of threads processing the segments. 0 processes them one after the other.
+        overlap: The overlap between two consecutive segments, as a fraction of the segment.
+        shifts: Number of random time shifts averaged together, trading speed for quality.
+
+    Returns:
+        torch.Tensor: The vocal stem, shaped (channels, samples), sampled at the rate of the model.
     """
-    Separates vocals from the accompaniment in the given audio file using the Demucs
-    tool and outputs the separated vocals to the specified directory.
 
-    The function utilizes the Demucs CLI to perform the separation in "two-stems"
-    mode, which isolates the vocals from the rest of the audio.
+    # Normalize the mix as the Demucs command line does, and restore the scale of the stem
+    reference = mix.mean(0)
+    mean, std = reference.mean(), reference.std() + 1e-8
+    with torch.inference_mode():
+        sources = apply_model(
+            model, ((mix - mean) / std)[None], shifts=shifts, split=True, overlap=overlap,
+            num_workers=workers, device="cpu"
+        )[0]
+    return sources[model.sources.index("vocals")] * std + mean
+
+
+def separate_vocals(audio) -> np.ndarray:
+    """
+    Separates vocals from the accompaniment in the given audio with htdemucs, running in this
+    process. The model is loaded once, and the vocal stem of every song is cached on disk by the
+    hash of its content, so a song that was already separated is not processed again.
 
     Args:
-        audio: The path to the audio file as a string or an instance of
-            UploadedFile that supports the `read()` method.
-        output_dir: The directory where the separated vocals will be stored. Defaults
-            to "/tmp/separated".
+        audio: The path to the audio file as a string, an instance of UploadedFile that
+            supports the `read()` method, or a mono float32 waveform sampled at 16 kHz.
 
     Returns:
-        str: The path to the generated `vocals.wav` file.
+        np.ndarray: The separated vocals as a mono float32 waveform sampled at 16 kHz.
     """
 
-    os.makedirs(output_dir, exist_ok=True)
-    # Save UploadedFile if needed
-    if hasattr(audio, 'read'):
-        tmp_path = f"/tmp/{audio.name}"
-        with open(tmp_path, 'wb') as f:
-            f.write(audio.read())
-        audio_path = tmp_path
+    data = audio.tobytes() if isinstance(audio, np.ndarray) else audio_utils.read_bytes(audio)
+    stem_path = STEM_CACHE_PATH.joinpath(f"{_stem_key(data)}.npy")
+    if stem_path.exists():
+        logger.info(f"Serving the vocal stem from {stem_path}.")
+        return np.load(stem_path)
+
+    # Decode the song in stereo at the sampling rate of the model
+    model = _demucs_model(CONFIGS["Model_Name"])
+    if isinstance(audio, np.ndarray):
+        mix = torchaudio.functional.resample(
+            torch.from_numpy(audio), orig_freq=audio_utils.SAMPLING_RATE, new_freq=model.samplerate
+        ).repeat(model.audio_channels, 1)
     else:
-        audio_path = audio
-
-    # Call Demucs CLI to separate vocals (two stems mode)
-    # --two-stems vocals: outputs vocals and accompaniment
-    cmd = [
-        "demucs",
-        "--two-stems", "vocals",
-        "-n", "htdemucs",
-        "-o", output_dir,
-        audio_path
-    ]
-    subprocess.run(cmd, check=True)
-
-    # Demucs outputs into {output_dir}/htdemucs/{track_name}/vocals.wav
-    basename = Path(audio_path).stem
-    out_dir = Path(output_dir) / "htdemucs" / basename
-    vocals_path = out_dir / "vocals.wav"
-    return str(vocals_path)
\ No newline at end of file
+        mix = torch.from_numpy(audio_utils.decode_audio(data, sampling_rate=model.samplerate, mono=False))
+
+    vocals = extract_vocals(
+        model, mix, workers=CONFIGS["Workers"], overlap=CONFIGS["Overlap"], shifts=CONFIGS["Shifts"]
+    )
+
+    # Hand the stem to Whisper as a 16 kHz mono waveform
+    vocals = torchaudio.functional.resample(
+        vocals.mean(0), orig_freq=model.samplerate, new_freq=audio_utils.SAMPLING_RATE
+    ).numpy().astype(np.float32)
+
+    # Write through a temporary file of its own, so that concurrent workers and threads never read a partial stem
+    STEM_CACHE_PATH.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(
+        dir=STEM_CACHE_PATH, prefix=f"{stem_path.stem}.", suffix=".tmp", delete=False
+    ) as f:
+        np.save(f, vocals)
+    os.replace(f.name, stem_path)
+    return vocals
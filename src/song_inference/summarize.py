@@ -1,11 +1,20 @@
 
-from transformers import pipeline
+from tools.models import model_registry
 
-_summarizer_bart = pipeline("summarization", model="facebook/bart-large-cnn", device=-1)
-_summarizer_t5 = pipeline("summarization", model="t5-small", device=-1)
+_BART_MODEL = "facebook/bart-large-cnn"
+_T5_MODEL = "t5-small"
 LENGTHS = {"long": (200, 512), "short": (75, 150), "tiny": (15, 30)}
 
 
+def _summarizer(model_name: str):
+    # Build the summarization pipeline on first use only, and keep it in the process model registry
+    def load():
+        from transformers import pipeline
+        return pipeline("summarization", model=model_name, device=-1)
+
+    return model_registry.MODEL_REGISTRY.get(("SummarizationPipeline", model_name, "cpu"), load)
+
+
 def summarize_bart(text: str, mode: str = "short") -> str:
     """
     Summarizes a given text using a BART model, with the summary length specified by
@@ -28,7 +37,7 @@ def summarize_bart(text: str, mode: str = "short") -> str:
         raise ValueError("Mode must be 'long','short','tiny'.")
     min_len, max_len = LENGTHS[mode]
     snippet = text[:10240]
-    return _summarizer_bart(snippet, max_length=max_len, min_length=min_len, do_sample=False)[0]["summary_text"]
+    return _summarizer(_BART_MODEL)(snippet, max_length=max_len, min_length=min_len, do_sample=False)[0]["summary_text"]
 
 
 def summarize_t5(text: str, mode: str = "short") -> str:
@@ -61,4 +70,4 @@ def summarize_t5(text: str, mode: str = "short") -> str:
         raise ValueError("Mode must be 'long','short','tiny'.")
     min_len, max_len = LENGTHS[mode]
     snippet = text[:10240]
-    return _summarizer_t5(snippet, max_length=max_len, min_length=min_len, do_sample=False)[0]["summary_text"]
\ No newline at end of file
+    return _summarizer(_T5_MODEL)(snippet, max_length=max_len, min_length=min_len, do_sample=False)[0]["summary_text"]
\ No newline at end of file
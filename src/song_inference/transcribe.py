@@ -1,7 +1,9 @@
 
+import numpy as np
 import whisper
-
-_models = {}
+from typing import Generator
+from tools.models import model_registry
+from tools.utils import audio_utils
 
 
 def transcribe_base(audio) -> str:
@@ -46,26 +48,67 @@ def transcribe_small(audio) -> str:
 def _transcribe(audio, model_name: str) -> str:
     """
     Transcribes the given audio input using a specified Whisper model. If the model
-    is not already loaded, it is initialized. The function accepts both file paths
-    and file-like objects as audio input.
+    is not already loaded, it is initialized. The function accepts file paths, file-like
+    objects and 16 kHz waveforms as audio input, and decodes the encoded inputs in memory.
 
     Args:
-        audio: Input audio, either as a file path (str) or as a file-like object
-            with a readable `read` method and a `name` attribute.
+        audio: Input audio, either as a file path (str), a file-like object with a readable
+            `read` method, or a mono float32 waveform sampled at 16 kHz.
         model_name: The name of the Whisper model to be used for transcription.
 
     Returns:
         str: The transcribed text from the audio input.
     """
 
-    if model_name not in _models:
-        _models[model_name] = whisper.load_model(model_name)
-    model = _models[model_name]
-    if hasattr(audio, 'read'):
-        tmp = f"/tmp/{audio.name}"
-        with open(tmp, 'wb') as f:
-            f.write(audio.read())
-        audio_path = tmp
-    else:
-        audio_path = audio
-    return model.transcribe(audio_path)["text"]
\ No newline at end of file
+    model = _whisper_model(model_name)
+    if not isinstance(audio, np.ndarray):
+        audio = audio_utils.decode_audio(audio, sampling_rate=audio_utils.SAMPLING_RATE)
+    return model.transcribe(audio)["text"]
+
+
+def _whisper_model(model_name: str) -> whisper.Whisper:
+    # Load the Whisper model on first use only, and keep it in the process model registry
+    return model_registry.MODEL_REGISTRY.get(("OpenAIWhisper", model_name, "cpu"), lambda: whisper.load_model(model_name))
+
+
+def stream_transcribe(audio, model_name: str = "base") -> Generator[dict, None, None]:
+    """
+    Transcribes the audio one 30 seconds window at a time and yields the segments of every window
+    as soon as it is decoded, so that the transcript can be shown and used while the rest of the
+    audio is still being transcribed. The last segment of a window may be cut by the window end,
+    so it is decoded again at the start of the next window, as Whisper does when it transcribes
+    a whole file. The text decoded so far is the prompt of every window.
+
+    Args:
+        audio: Input audio, either as a file path (str), a file-like object with a readable
+            `read` method, or a mono float32 waveform sampled at 16 kHz.
+        model_name: The name of the Whisper model to be used for transcription. Defaults to "base".
+
+    Yields:
+        dict: A segment, with its "start" and "end" time in seconds and its "text". The texts of
+            all the segments joined together form the transcript.
+    """
+
+    model = _whisper_model(model_name)
+    if not isinstance(audio, np.ndarray):
+        audio = audio_utils.decode_audio(audio, sampling_rate=audio_utils.SAMPLING_RATE)
+
+    window = whisper.audio.N_SAMPLES
+    seek = 0
+    transcript = ""
+    while seek < len(audio):
+        segments = model.transcribe(audio[seek: seek + window], initial_prompt=transcript or None)["segments"]
+
+        # Keep the last segment of a full window for the next one, unless it is the only segment
+        next_seek = seek + window
+        if next_seek < len(audio) and len(segments) > 1:
+            cut = int(segments[-1]["start"] * audio_utils.SAMPLING_RATE)
+            if cut > 0:
+                next_seek = seek + cut
+                segments = segments[:-1]
+
+        offset = seek / audio_utils.SAMPLING_RATE
+        for segment in segments:
+            transcript += segment["text"]
+            yield {"start": offset + segment["start"], "end": offset + segment["end"], "text": segment["text"]}
+        seek = next_seek
\ No newline at end of file
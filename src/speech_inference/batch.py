@@ -0,0 +1,293 @@
+
+import argparse
+import concurrent.futures
+import glob
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Generator, TextIO
+from src import global_configs as cf
+from src.speech_inference import text_inference
+from tools.utils import audio_utils, runtime_policy
+
+logger = logging.getLogger(__name__)
+
+AUDIO_SUFFIXES = {".flac", ".wav", ".mp3", ".ogg", ".m4a"}
+SUMMARIZERS = ("none", "t5", "bart")
+
+
+def audio_files(inputs: list[str]) -> list[Path]:
+    """
+    Lists the audio files given directly, found under folders, or matched by glob patterns.
+
+    Args:
+        inputs: Audio files, folders searched recursively, or glob patterns such as "data/**/*.flac".
+
+    Returns:
+        list[Path]: The audio files, sorted and without duplicates.
+    """
+
+    files = set()
+    for entry in inputs:
+        path = Path(entry)
+        if path.is_dir():
+            files.update(p for p in path.rglob("*") if p.is_file() and p.suffix.lower() in AUDIO_SUFFIXES)
+        elif path.is_file():
+            files.add(path)
+        else:
+            files.update(Path(p) for p in glob.glob(entry, recursive=True) if Path(p).is_file())
+    return sorted(file.resolve() for file in files)
+
+
+def completed_files(output: Path) -> set[str]:
+    """
+    Reads the files already processed from an existing output, so that an interrupted run can
+    resume. A last line cut short by the interruption is removed from the file, and failed files
+    are not counted as processed, so that they are tried again. Their error lines are removed from
+    the output as well, so that every file keeps a single line, from its latest attempt.
+
+    Args:
+        output: The JSON lines output of an earlier run.
+
+    Returns:
+        set[str]: The paths of the files processed successfully.
+    """
+
+    if not output.exists():
+        return set()
+
+    # Drop the incomplete last line, if the earlier run stopped while writing it
+    data = output.read_bytes()
+    if data and not data.endswith(b"\n"):
+        with open(output, "r+b") as f:
+            f.truncate(data.rfind(b"\n") + 1)
+        data = data[: data.rfind(b"\n") + 1]
+
+    done = set()
+    lines = data.decode("utf-8").splitlines(keepends=True)
+    kept = []
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            kept.append(line)
+            continue
+        if "error" not in record:
+            done.add(record["file"])
+            kept.append(line)
+
+    # Rewrite the output without the error lines of the files tried again
+    if len(kept) < len(lines):
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=output.parent, prefix=f"{output.name}.", suffix=".tmp", delete=False
+        ) as f:
+            f.writelines(kept)
+        os.replace(f.name, output)
+    return done
+
+
+def _decode_batch(files: list[Path]) -> list[tuple[Path, object]]:
+    # Decode every file of a batch, keeping the exception of the files that cannot be decoded
+    decoded = []
+    for file in files:
+        try:
+            decoded.append((file, audio_utils.decode_audio(file, sampling_rate=audio_utils.SAMPLING_RATE)))
+        except Exception as e:
+            decoded.append((file, e))
+    return decoded
+
+
+def _prefetched_batches(files: list[Path], batch_size: int) -> Generator[list[tuple[Path, object]], None, None]:
+    # Decode the next batch on a background thread while the models process the current one
+    batches = [files[i: i + batch_size] for i in range(0, len(files), batch_size)]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="decode") as executor:
+        pending = executor.submit(_decode_batch, batches[0]) if batches else None
+        for i in range(len(batches)):
+            decoded = pending.result()
+            if i + 1 < len(batches):
+                pending = executor.submit(_decode_batch, batches[i + 1])
+            yield decoded
+
+
+def _summaries(texts: list[str], summarizer: str) -> list[str]:
+    # Summarize the texts in one batch, leaving empty transcripts without a summary
+    indices = [i for i, text in enumerate(texts) if text.strip()]
+    summaries = [""] * len(texts)
+    if summarizer == "none" or not indices:
+        return summaries
+
+    if summarizer == "t5":
+        lengths = cf.MODELS_CONFIG["Google_Flan_T5"]["Maximum_Token_Generation"]["Medium_Output"]
+        outputs = text_inference.t5_model().batch_inference(
+            [f"summarize: {texts[i]}" for i in indices],
+            min_length=lengths["Minimum_Length"],
+            max_length=lengths["Maximum_Length"]
+        )
+        outputs = [text_inference.clean_t5_summary(output) for output in outputs]
+    else:
+        model_configs = cf.MODELS_CONFIG["Facebook_Bart_CNN"]
+        outputs = text_inference.bart_model("Facebook_Bart_CNN").batch_inference(
+            [texts[i] for i in indices],
+            min_length=model_configs["Minimum_Length"],
+            max_length=model_configs["Maximum_Length"]
+        )
+
+    for i, output in zip(indices, outputs):
+        summaries[i] = output
+    return summaries
+
+
+def _entities(texts: list[str]) -> list[list[dict]]:
+    # Extract the entities of the texts in one batch, leaving empty transcripts without entities
+    indices = [i for i, text in enumerate(texts) if text.strip()]
+    entities = [[] for _ in texts]
+    if not indices:
+        return entities
+
+    outputs = text_inference.gliner_model().batch_inference(
+        [texts[i] for i in indices], cf.MODELS_CONFIG["Gliner_Model"]["Labels"]
+    )
+    for i, output in zip(indices, outputs):
+        entities[i] = [
+            {"text": entity["text"], "label": entity["label"], "score": round(float(entity["score"]), 4)}
+            for entity in output
+        ]
+    return entities
+
+
+def run_batch(files: list[Path], sink: TextIO, batch_size: int, summarizer: str, entities: bool) -> dict:
+    """
+    Transcribes the audio files in batches, then summarizes the transcripts and extracts their
+    entities when requested. One JSON line is written per file as soon as its batch completes,
+    holding the "file", its "audio_seconds", the "transcript" and its "segments", and the
+    "summary" and "entities" when requested. Files that fail are written with an "error".
+
+    Args:
+        files: The audio files.
+        sink: The text stream the JSON lines are written to.
+        batch_size: Number of files sent to the models at once.
+        summarizer: "t5", "bart", or "none" to skip the summaries.
+        entities: Whether to extract the named entities.
+
+    Returns:
+        dict: The counts of processed and failed files, the seconds of audio and the wall time.
+    """
+
+    backend = text_inference.asr_backend()
+    stats = {"files": 0, "failed": 0, "audio_seconds": 0.0, "wall_seconds": 0.0}
+    start = time.perf_counter()
+
+    for batch in _prefetched_batches(files, batch_size):
+        lines = []
+        decoded = [(file, waveform) for file, waveform in batch if not isinstance(waveform, Exception)]
+        for file, error in batch:
+            if isinstance(error, Exception):
+                lines.append({"file": str(file), "error": f"{type(error).__name__}: {error}"})
+
+        try:
+            transcriptions = backend.transcribe([waveform for _, waveform in decoded], audio_utils.SAMPLING_RATE) if decoded else []
+            texts = [transcription.text.strip() for transcription in transcriptions]
+            summaries = _summaries(texts, summarizer)
+            batch_entities = _entities(texts) if entities else None
+
+            for i, ((file, _), transcription) in enumerate(zip(decoded, transcriptions)):
+                line = {
+                    "file": str(file),
+                    "audio_seconds": round(transcription.audio_seconds, 3),
+                    "transcript": texts[i],
+                    "segments": transcription.segments
+                }
+                if summarizer != "none":
+                    line["summary"] = summaries[i]
+                if entities:
+                    line["entities"] = batch_entities[i]
+                lines.append(line)
+                stats["audio_seconds"] += transcription.audio_seconds
+
+        except Exception as e:
+            # Record the failure of the whole batch and carry on with the next one
+            logger.exception(f"Batch of {len(decoded)} files failed.")
+            lines.extend({"file": str(file), "error": f"{type(e).__name__}: {e}"} for file, _ in decoded)
+
+        for line in lines:
+            sink.write(json.dumps(line, ensure_ascii=False) + "\n")
+            stats["failed" if "error" in line else "files"] += 1
+        sink.flush()
+
+    stats["wall_seconds"] = time.perf_counter() - start
+    return stats
+
+
+def main(inputs: list[str], output: str, resume: bool, batch_size: int, summarizer: str, entities: bool) -> None:
+    """
+    Runs the batch inference over audio files and prints a throughput summary.
+
+    Args:
+        inputs: Audio files, folders or glob patterns.
+        output: The JSON lines file to write, or "-" for the standard output.
+        resume: Whether to skip the files already processed in the output and append to it.
+            Otherwise the output is overwritten.
+        batch_size: Number of files sent to the models at once.
+        summarizer: "t5", "bart", or "none" to skip the summaries.
+        entities: Whether to extract the named entities.
+    """
+
+    # This process runs every model, so it gets the whole core budget
+    runtime_policy.apply(processes=1)
+
+    files = audio_files(inputs)
+    if not files:
+        raise SystemExit(f"No audio file found in {inputs}.")
+
+    skipped = 0
+    if output == "-":
+        stats = run_batch(files, sys.stdout, batch_size, summarizer, entities)
+    else:
+        output_path = Path(output)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        if resume:
+            done = completed_files(output_path)
+            remaining = [file for file in files if str(file) not in done]
+            skipped = len(files) - len(remaining)
+            files = remaining
+
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as sink:
+            stats = run_batch(files, sink, batch_size, summarizer, entities)
+
+    # Report on the standard error, so that the summary never mixes with JSON lines on the standard output
+    wall_seconds = max(stats["wall_seconds"], 1e-9)
+    print(
+        f"{stats['files']} files done, {stats['failed']} failed, {skipped} skipped as already done. "
+        f"{stats['audio_seconds']:.1f} s of audio in {stats['wall_seconds']:.1f} s: "
+        f"{stats['files'] / wall_seconds:.2f} files/s, {stats['audio_seconds'] / wall_seconds:.2f} audio s/s.",
+        file=sys.stderr
+    )
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description="Transcribe audio files in batches, optionally summarize them and extract their entities, "
+                    "writing one JSON line per file."
+    )
+    parser.add_argument("inputs", nargs="+", help="Audio files, folders or glob patterns.")
+    parser.add_argument("-o", "--output", default="-", help="JSON lines output file, '-' for the standard output.")
+    parser.add_argument("--resume", action="store_true", help="Skip the files already in the output and append to it.")
+    parser.add_argument(
+        "--batch-size", type=int, default=cf.PIPELINE_CONFIG["Data_Processing_Pipeline"]["Maximum_Batch_Size"],
+        help="Files sent to the models at once."
+    )
+    parser.add_argument("--summarizer", choices=SUMMARIZERS, default="none", help="Summarization model.")
+    parser.add_argument("--entities", action="store_true", help="Extract the named entities with GLiNER.")
+    args = parser.parse_args()
+
+    if args.resume and args.output == "-":
+        parser.error("--resume needs an output file.")
+    main(args.inputs, args.output, args.resume, args.batch_size, args.summarizer, args.entities)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,16 +1,89 @@
 
+import copy
+import os
+import threading
 import polars as pl
+from pathlib import Path
 from src import global_configs as cf
 
 CONFIGS = cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]
 
 
+class IndexedTable:
+    """
+    A parquet table held in memory with a hash index on some key columns. The table is read once
+    per process and read again only when the file on disk changes, so lookups do not touch the
+    file system apart from a `stat` call.
+    """
+
+    def __init__(self, file_path: Path, key_columns: list[str]):
+        """
+        Creates an index over a parquet file, which is read on the first lookup.
+
+        Args:
+            file_path: The location of the parquet file.
+            key_columns: The columns forming the lookup key.
+        """
+
+        self.file_path = file_path
+        self.key_columns = key_columns
+        self._lock = threading.Lock()
+        # The file signature, value columns, rows and index of the loaded table, swapped as a whole
+        # so that a lookup never pairs the index of a reloaded table with the rows of the previous one
+        self._snapshot: tuple[tuple | None, list[str], list[tuple], dict[tuple, list[int]]] = (None, [], [], {})
+
+    def _refresh(self) -> tuple:
+        # Compare modification time and size so a rewritten file is picked up by the next lookup
+        stat = os.stat(self.file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        snapshot = self._snapshot
+        if signature == snapshot[0]:
+            return snapshot
+
+        with self._lock:
+            if signature == self._snapshot[0]:
+                return self._snapshot
+
+            df = pl.read_parquet(self.file_path)
+            value_columns = [c for c in df.columns if c not in self.key_columns]
+            index = {}
+            for idx, key in enumerate(df.select(self.key_columns).iter_rows()):
+                index.setdefault(key, []).append(idx)
+
+            self._snapshot = (signature, value_columns, df.select(value_columns).rows(), index)
+            return self._snapshot
+
+    def lookup(self, *key) -> dict:
+        """
+        Returns the rows matching the key, without the key columns.
+
+        Args:
+            *key: The values of the key columns, in the order of `key_columns`.
+
+        Returns:
+            dict: A dictionary mapping every other column to the list of its values in the matching
+                rows, in file order. The lists are empty if no row matches. The values are copies,
+                so callers may modify them without changing the cached table.
+        """
+
+        _, columns, table_rows, index = self._refresh()
+        rows = [table_rows[idx] for idx in index.get(key, [])]
+        return {column: [copy.deepcopy(row[pos]) for row in rows] for pos, column in enumerate(columns)}
+
+
+# Process-wide tables shared by every Streamlit session
+_PRECOMPUTED_TABLE = IndexedTable(cf.DATA_PATH.joinpath(CONFIGS["Speech_Modeled_Data"]).resolve(), ["id"])
+_ORIGINAL_TABLE = IndexedTable(
+    cf.DATA_PATH.joinpath(CONFIGS["Speech_Original_Data"]).resolve(), ["user_id", "chapter_id"]
+)
+
+
 def extract_precomputed(id: int) -> dict:
     """
     Extracts pre-computed metadata for a specific identifier from stored Parquet files.
 
-    This function locates and reads a pre-defined dataset to extract all metadata
-    for the given 'id'. The result is returned as a dictionary containing the
+    This function looks up all metadata for the given 'id' in the in-memory index of
+    a pre-defined dataset. The result is returned as a dictionary containing the
     metadata entries without the 'id' key.
 
     Args:
@@ -21,18 +94,7 @@ def extract_precomputed(id: int) -> dict:
         dict: A dictionary containing the extracted metadata for the given 'id'.
     """
 
-    # Get the file with the pre-computed data
-    file_path = cf.DATA_PATH.joinpath(CONFIGS["Speech_Modeled_Data"]).resolve()
-
-    # Extract the data requested into a dictionary
-    id_df = (
-        pl.scan_parquet(file_path)
-        .filter(pl.col("id") == id)
-        .select(pl.exclude("id"))
-    )
-    metadata = id_df.collect().to_dict(as_series=False)
-
-    return metadata
+    return _PRECOMPUTED_TABLE.lookup(id)
 
 
 def extract_original(user_id: int, chapter_id: int) -> dict:
@@ -40,7 +102,7 @@ def extract_original(user_id: int, chapter_id: int) -> dict:
     Extracts original data for a specific user and chapter from pre-computed data.
 
     This function retrieves data associated with a given `user_id` and `chapter_id`
-    from a pre-computed dataset file. The data is returned as a dictionary, excluding
+    from the in-memory index of a pre-computed dataset file. The data is returned as a dictionary, excluding
     the user and chapter identifiers from the returned information.
 
     Args:
@@ -53,18 +115,7 @@ def extract_original(user_id: int, chapter_id: int) -> dict:
             and chapter, excluding user and chapter identifiers.
     """
 
-    # Get the file with the pre-computed data
-    file_path = cf.DATA_PATH.joinpath(CONFIGS["Speech_Original_Data"]).resolve()
-
-    # Extract the data requested into a dictionary
-    id_df = (
-        pl.scan_parquet(file_path)
-        .filter((pl.col("user_id") == user_id) & (pl.col("chapter_id") == chapter_id))
-        .select(pl.exclude("user_id", "chapter_id"))
-    )
-    metadata = id_df.collect().to_dict(as_series=False)
-
-    return metadata
+    return _ORIGINAL_TABLE.lookup(user_id, chapter_id)
 
 
 def main_extraction(id: int) -> dict:
@@ -94,3 +145,18 @@ def main_extraction(id: int) -> dict:
     # Format the data and return the formatted JSON object
     combined_data = {**precomputed_data, **original_data}
     return combined_data
+
+
+def main_extraction_many(ids: list[int]) -> list[dict]:
+    """
+    Extracts the combined pre-computed and original data for several identifiers at once.
+
+    Args:
+        ids: The identifiers to extract.
+
+    Returns:
+        list[dict]: One dictionary per identifier, in the order of `ids`, with the same format as
+            `main_extraction`.
+    """
+
+    return [main_extraction(id) for id in ids]
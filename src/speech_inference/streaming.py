@@ -0,0 +1,382 @@
+
+import argparse
+import collections
+import dataclasses
+import json
+import logging
+import re
+import socket
+import sys
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Generator, Iterable
+from src import global_configs as cf
+from tools.utils import audio_utils, runtime_policy
+
+# Only imported for the annotations, the model is built by the caller
+if TYPE_CHECKING:
+    from tools.models import whisper_ai
+
+logger = logging.getLogger(__name__)
+
+# Bytes read at most from a socket at once, 30 seconds of 16-bit audio at 16 kHz
+RECEIVE_BYTES = 30 * audio_utils.SAMPLING_RATE * 2
+# Whisper decodes windows of 30 seconds, a longer buffer would be split into windows
+WHISPER_WINDOW_SECONDS = 30
+
+
+@dataclass
+class StreamUpdate:
+    """
+    The transcript of a stream after one decoding of its buffer.
+    """
+
+    # Text committed by this update, which is never revised afterwards
+    committed: str
+    # Text decoded after the committed text, which later decodings may still revise
+    partial: str
+    # Whether this is the last update of the stream, after which everything decoded is committed
+    final: bool
+    # Seconds of audio received when the buffer was decoded
+    audio_seconds: float
+    # Seconds taken by the decoding
+    decode_seconds: float
+    # Stream position by which every committed word had been heard: the end of its segment when
+    # Whisper predicted it, otherwise the audio received when the word was first decoded
+    word_end_seconds: list[float] = field(default_factory=list)
+
+
+@dataclass
+class _Word:
+    text: str
+    end_seconds: float
+
+    @property
+    def key(self) -> str:
+        # Hypotheses agree on a word regardless of its case and punctuation
+        return re.sub(r"[^\w']", "", self.text.lower())
+
+
+def _agreed_prefix(hypotheses: Iterable[list[_Word]]) -> list[_Word]:
+    # The longest run of leading words on which every hypothesis agrees, spelled as in the newest
+    # hypothesis and heard by the time of the oldest one
+    hypotheses = list(hypotheses)
+    agreed = []
+    for words in zip(*hypotheses):
+        if len({word.key for word in words}) > 1:
+            break
+        agreed.append(_Word(words[-1].text, words[0].end_seconds))
+    return agreed
+
+
+class StreamingTranscriber:
+    """
+    Transcribes audio arriving in chunks with Whisper, which only transcribes whole recordings, by
+    decoding a buffer of the latest audio again every "Step_Seconds" of new audio. A word is
+    committed once the last "Agreement" hypotheses agree on it and on every word before it (local
+    agreement), so that the committed transcript is never revised while the rest of the latest
+    hypothesis is reported as partial text. Once longer than "Trim_Seconds", the buffer is cut
+    after the segments whose words are all committed. Once longer than "Max_Buffer_Seconds", the
+    whole hypothesis is committed and the buffer emptied, which bounds the commit latency.
+    """
+
+    def __init__(
+        self, model: "whisper_ai.WhisperAI", step_seconds: float | None = None, agreement: int | None = None,
+        trim_seconds: float | None = None, max_buffer_seconds: float | None = None,
+        sampling_rate: int = audio_utils.SAMPLING_RATE
+    ):
+        """
+        Args:
+            model: The Whisper model, or a `RemoteWhisper` of the inference server. The server returns
+                no segments, so the buffer is then only emptied when it reaches its maximum length.
+            step_seconds: Seconds of new audio between two decodings. Defaults to the configured value.
+            agreement: Consecutive hypotheses agreeing on a word to commit it. Defaults to the configured value.
+            trim_seconds: Buffer length from which it is cut after its committed segments. Defaults to the
+                configured value.
+            max_buffer_seconds: Buffer length at which everything decoded is committed, at most 30
+                seconds. Defaults to the configured value.
+            sampling_rate: The sampling rate of the chunks.
+        """
+
+        configs = cf.MODELS_CONFIG["Streaming_Asr"]
+        whisper_configs = cf.MODELS_CONFIG["Whisper_AI_Configurations"]
+
+        self.model = model
+        self.step_seconds = step_seconds or configs["Step_Seconds"]
+        self.agreement = max(agreement or configs["Agreement"], 1)
+        self.trim_seconds = trim_seconds or configs["Trim_Seconds"]
+        self.max_buffer_seconds = min(max_buffer_seconds or configs["Max_Buffer_Seconds"], WHISPER_WINDOW_SECONDS)
+        self.max_new_tokens = whisper_configs["Maximum_Token_Generation"]
+        self.language = whisper_configs["Language_Selection"]
+        self.sampling_rate = sampling_rate
+        self.transcript = ""
+
+        self._buffer = np.zeros(0, dtype=np.float32)
+        # Stream position of the first sample of the buffer
+        self._offset = 0.0
+        # Committed words decoded from the buffer, which its next hypotheses should start with
+        self._committed: list[_Word] = []
+        # Uncommitted words of the latest hypotheses, the newest last
+        self._hypotheses: collections.deque[list[_Word]] = collections.deque(maxlen=self.agreement)
+        self._pending_samples = 0
+
+    @property
+    def audio_seconds(self) -> float:
+        """
+        Seconds of audio received so far.
+        """
+
+        return self._offset + len(self._buffer) / self.sampling_rate
+
+    @property
+    def buffer_seconds(self) -> float:
+        """
+        Seconds of audio in the buffer.
+        """
+
+        return len(self._buffer) / self.sampling_rate
+
+    def insert(self, chunk: np.ndarray) -> StreamUpdate | None:
+        """
+        Adds a chunk of audio to the buffer, and decodes the buffer once "Step_Seconds" of new
+        audio arrived since the last decoding.
+
+        Args:
+            chunk: A mono float32 waveform.
+
+        Returns:
+            StreamUpdate | None: The update of the decoding, or None when the buffer was not decoded.
+        """
+
+        self._buffer = np.concatenate([self._buffer, chunk.astype(np.float32, copy=False)])
+        self._pending_samples += len(chunk)
+        if self._pending_samples < self.step_seconds * self.sampling_rate:
+            return None
+        return self._process(final=False)
+
+    def finish(self) -> StreamUpdate:
+        """
+        Decodes the rest of the stream and commits everything decoded.
+
+        Returns:
+            StreamUpdate: The final update.
+        """
+
+        return self._process(final=True)
+
+    def transcribe(self, chunks: Iterable[np.ndarray]) -> Generator[StreamUpdate, None, None]:
+        """
+        Transcribes a stream of audio chunks, e.g. from `replay` or `socket_chunks`.
+
+        Args:
+            chunks: The mono float32 chunks of the stream.
+
+        Yields:
+            StreamUpdate: The update of every decoding, the last one being final.
+        """
+
+        for chunk in chunks:
+            update = self.insert(chunk)
+            if update is not None:
+                yield update
+        yield self.finish()
+
+    def _decode(self) -> tuple[list[_Word], list[tuple[int, float]], float]:
+        # Decode the buffer into words, and list the segments Whisper predicted an end for, as the
+        # number of words up to their end and their end in seconds from the start of the buffer
+        start = time.perf_counter()
+        output = self.model.inference(
+            audio_files=[self._buffer],
+            max_new_tokens=self.max_new_tokens,
+            language=self.language,
+            sampling_rate=self.sampling_rate,
+            return_timestamps=True
+        )[0]
+        decode_seconds = time.perf_counter() - start
+
+        heard = self.audio_seconds
+        words, boundaries = [], []
+        for chunk in output.get("chunks") or [{"timestamp": (None, None), "text": output["text"]}]:
+            end = chunk["timestamp"][1]
+            end_seconds = min(self._offset + end, heard) if end is not None else heard
+            words.extend(_Word(text, end_seconds) for text in chunk["text"].split())
+            if end is not None:
+                boundaries.append((len(words), end))
+        return words, boundaries, decode_seconds
+
+    def _skip_committed(self, words: list[_Word]) -> int:
+        # Find where the committed words end in a new hypothesis of the buffer. Whisper may spell
+        # or split the start differently, so the last committed words are looked for around the
+        # expected position, which is used when they are not found
+        expected = len(self._committed)
+        tail = [word.key for word in self._committed[-3:]]
+        if not tail:
+            return 0
+        for shift in (0, -1, 1, -2, 2):
+            position = expected + shift
+            if len(tail) <= position <= len(words) and [word.key for word in words[position - len(tail): position]] == tail:
+                return position
+        return min(expected, len(words))
+
+    def _process(self, final: bool) -> StreamUpdate:
+        if self._pending_samples or not self._hypotheses:
+            words, boundaries, decode_seconds = self._decode() if len(self._buffer) else ([], [], 0.0)
+            self._hypotheses.append(words[self._skip_committed(words):])
+            self._pending_samples = 0
+        else:
+            # Nothing arrived since the last decoding, its hypothesis is committed as it is
+            boundaries, decode_seconds = [], 0.0
+
+        # Commit the agreed words, or everything decoded at the end of the stream or of the buffer
+        flush = final or self.buffer_seconds >= self.max_buffer_seconds
+        if flush:
+            committed = self._hypotheses[-1]
+        elif len(self._hypotheses) == self.agreement:
+            committed = _agreed_prefix(self._hypotheses)
+        else:
+            committed = []
+
+        self._committed.extend(committed)
+        for i, hypothesis in enumerate(self._hypotheses):
+            self._hypotheses[i] = hypothesis[len(committed):]
+        partial = " ".join(word.text for word in self._hypotheses[-1])
+        update = StreamUpdate(
+            committed=" ".join(word.text for word in committed),
+            partial="" if flush else partial,
+            final=final,
+            audio_seconds=round(self.audio_seconds, 3),
+            decode_seconds=round(decode_seconds, 3),
+            word_end_seconds=[round(word.end_seconds, 3) for word in committed]
+        )
+        if update.committed:
+            self.transcript = f"{self.transcript} {update.committed}".strip()
+
+        if flush:
+            # Start over on the audio that comes next
+            self._offset = self.audio_seconds
+            self._buffer = self._buffer[:0]
+            self._committed = []
+            self._hypotheses.clear()
+        elif self.buffer_seconds > self.trim_seconds:
+            # Cut the buffer after the last segment whose words are all committed
+            ends = [(count, end) for count, end in boundaries if 0 < count <= len(self._committed) and end > 0]
+            if ends:
+                count, end = ends[-1]
+                samples = int(end * self.sampling_rate)
+                self._buffer = self._buffer[samples:]
+                self._offset += samples / self.sampling_rate
+                self._committed = self._committed[count:]
+
+        return update
+
+
+def replay(
+    waveform: np.ndarray, chunk_seconds: float | None = None, realtime: bool = True,
+    sampling_rate: int = audio_utils.SAMPLING_RATE
+) -> Generator[np.ndarray, None, None]:
+    """
+    Yields a waveform in chunks. In real time, the chunks are yielded at the pace they would be
+    recorded, and the audio recorded while the consumer was busy is yielded at once, as a live
+    source would have buffered it.
+
+    Args:
+        waveform: A mono float32 waveform.
+        chunk_seconds: Seconds of audio per chunk. Defaults to the configured "Chunk_Seconds".
+        realtime: Whether to wait for every chunk to be due. Otherwise the chunks are yielded at once.
+        sampling_rate: The sampling rate of the waveform.
+
+    Yields:
+        np.ndarray: The next chunk.
+    """
+
+    chunk = max(int((chunk_seconds or cf.MODELS_CONFIG["Streaming_Asr"]["Chunk_Seconds"]) * sampling_rate), 1)
+    start = time.perf_counter()
+    position = 0
+    while position < len(waveform):
+        end = position + chunk
+        if realtime:
+            due = int((time.perf_counter() - start) * sampling_rate)
+            if due < end:
+                time.sleep((end - due) / sampling_rate)
+            else:
+                end = due // chunk * chunk
+        end = min(end, len(waveform))
+        yield waveform[position: end]
+        position = end
+
+
+def socket_chunks(connection: socket.socket) -> Generator[np.ndarray, None, None]:
+    """
+    Yields the audio received on a connection as raw 16-bit little-endian mono PCM at 16 kHz, the
+    output of `ffmpeg -f s16le -ac 1 -ar 16000` or `arecord -f S16_LE -c 1 -r 16000`. All the
+    audio received while the consumer was busy is yielded at once.
+
+    Args:
+        connection: The connected socket, read until the peer closes it.
+
+    Yields:
+        np.ndarray: The next mono float32 chunk.
+    """
+
+    remainder = b""
+    while data := connection.recv(RECEIVE_BYTES):
+        # Keep an odd trailing byte for the next read, samples are two bytes long
+        data = remainder + data
+        usable = len(data) - len(data) % 2
+        remainder = data[usable:]
+        if usable:
+            yield np.frombuffer(data[:usable], dtype="<i2").astype(np.float32) / 32768
+
+
+def _write_updates(updates: Iterable[StreamUpdate]) -> None:
+    # Write every update as a JSON line as soon as it is decoded
+    for update in updates:
+        sys.stdout.write(json.dumps(dataclasses.asdict(update), ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+
+def main(file: Path | None, host: str, port: int | None, realtime: bool) -> None:
+    """
+    Streams the transcript of an audio file replayed in real time, or of the raw audio sent to a
+    local socket, writing every update as a JSON line on the standard output.
+
+    Args:
+        file: The audio file to replay, or None to listen on the socket.
+        host: The address the socket listens on.
+        port: The port the socket listens on.
+        realtime: Whether to replay the file at the pace it would be recorded.
+    """
+
+    from src.speech_inference import text_inference
+
+    # The process runs a single model, so it gets the whole core budget
+    runtime_policy.apply(processes=1)
+    model = text_inference.whisper_model()
+
+    if file is not None:
+        waveform = audio_utils.decode_audio(file, sampling_rate=audio_utils.SAMPLING_RATE)
+        _write_updates(StreamingTranscriber(model).transcribe(replay(waveform, realtime=realtime)))
+        return
+
+    with socket.create_server((host, port)) as server:
+        logger.info(f"Streaming transcription listening on {host}:{port}.")
+        while True:
+            # One stream at a time, the model decodes one buffer at once anyway
+            connection, address = server.accept()
+            logger.info(f"Streaming audio from {address}.")
+            with connection:
+                _write_updates(StreamingTranscriber(model).transcribe(socket_chunks(connection)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transcribe audio as it arrives, writing partial and committed text as JSON lines.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--file", type=Path, help="Audio file replayed as a live stream.")
+    source.add_argument("--port", type=int, help="Port receiving raw 16-bit mono PCM at 16 kHz.")
+    parser.add_argument("--host", default="127.0.0.1", help="Address the socket listens on.")
+    parser.add_argument("--fast", action="store_true", help="Replay the file as fast as it is decoded.")
+    args = parser.parse_args()
+
+    main(args.file, args.host, args.port, not args.fast)
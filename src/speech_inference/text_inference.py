@@ -1,166 +1,439 @@
 
-import os
-import shutil
-import streamlit as st
-from gliner import GLiNER
-from streamlit.runtime.uploaded_file_manager import UploadedFile
+import importlib
+import threading
+import time
+import numpy as np
+from typing import TYPE_CHECKING, BinaryIO, Callable, Generator, Iterable
 from src import global_configs as cf
-from tools.models import facebook_bart, microsoft_phi, whisper_ai, google_flan
-from tools.utils import json_utils, streamlit_utils
+from src.inference_server import client as inference_client
+from tools.models import asr_backends
+from tools.models.model_registry import MODEL_REGISTRY
 
+# Only imported for the annotations, the loaders of `_model_spec` import the wrappers themselves
+if TYPE_CHECKING:
+    from tools.models import facebook_bart, gliner_ner, google_flan, microsoft_phi, whisper_ai
+from tools.utils import audio_utils, json_utils, runtime_policy, streamlit_utils
 
-@st.cache_data(ttl=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Object_TTL"])
-def bart_inference(text: str, model_ident: str) -> str:
+
+# Outputs of the streamed generations, kept for the same time as the cached Streamlit objects
+_STREAM_RESULTS: dict[tuple, tuple[float, str]] = {}
+# Held around every access to the outputs, which the threads of all Streamlit sessions share
+_STREAM_RESULTS_LOCK = threading.Lock()
+_STREAM_TTL = cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Object_TTL"]
+
+
+def _cached_stream(key: tuple, stream_factory: Callable[[], Iterable[str]]) -> Generator[str, None, None]:
     """
-    Performs text summarization using the BART (Bidirectional and Auto-Regressive Transformer)
-    model. The function fetches the model configuration and initializes the BART model with
-    proper settings. The input text is processed to generate a summary using the specified
-    model.
+    Yields the pieces of a streamed generation and remembers the complete output. While the output
+    is younger than the Streamlit object TTL, later calls with the same key yield it at once instead
+    of running the model again.
 
     Args:
-        text (str): The input text to be summarized.
-        model_ident (str): Identifier for the BART model configuration to be used.
+        key: The key identifying the generation, e.g. the function name and its arguments.
+        stream_factory: A function without arguments returning the stream of text pieces.
+
+    Yields:
+        str: The next piece of the generated text.
+    """
+
+    now = time.monotonic()
+    with _STREAM_RESULTS_LOCK:
+        cached = _STREAM_RESULTS.get(key)
+    if cached is not None and now - cached[0] < _STREAM_TTL:
+        yield cached[1]
+        return
+
+    pieces = []
+    for piece in stream_factory():
+        pieces.append(piece)
+        yield piece
+
+    # Store the complete output and drop the expired ones
+    with _STREAM_RESULTS_LOCK:
+        for stale_key in [k for k, (created, _) in _STREAM_RESULTS.items() if now - created >= _STREAM_TTL]:
+            del _STREAM_RESULTS[stale_key]
+        _STREAM_RESULTS[key] = (time.monotonic(), "".join(pieces))
+
+
+def _model_module(name: str):
+    # Import a model wrapper of `tools.models` when its model is loaded, since they all import torch
+    return importlib.import_module(f"tools.models.{name}")
+
+
+def _model_spec(model_ident: str) -> tuple[tuple, Callable[[], object]]:
+    """
+    Returns the model registry key of a configured model and the function loading it, so that
+    the model can be fetched, warmed up or checked for readiness under the same key.
+
+    Args:
+        model_ident: The section of the models configurations, e.g. "Facebook_Bart_CNN".
 
     Returns:
-        str: The summarized text generated by the BART model.
+        tuple[tuple, Callable[[], object]]: The registry key and the loader of the model.
     """
 
-    # Get BART model configurations
     model_configs = cf.MODELS_CONFIG[model_ident]
+    onnx_threads = runtime_policy.onnx_threads()
+
+    if model_ident == "Whisper_AI_Configurations":
+        return (
+            ("WhisperAI", model_configs["Model_Name"], cf.DEVICE),
+            lambda: _model_module("whisper_ai").WhisperAI(
+                model_name=model_configs["Model_Name"],
+                model_task="automatic-speech-recognition",
+                device=cf.DEVICE,
+                token_required=model_configs["Hugging_Face_Token"],
+                token=None
+            )
+        )
 
-    # Create an instance of BART model
-    model = facebook_bart.FacebookBart(
-        model_name=model_configs["Model_Name"],
-        device=cf.DEVICE,
-        task=model_configs["Model_Task"],
-        token_required=model_configs["Hugging_Face_Token"],
-        token=None
-    )
-    summary_output = model.inference(
-        input_text=text,
-        min_length=model_configs["Minimum_Length"],
-        max_length=model_configs["Maximum_Length"]
-    )
+    if model_ident == "Google_Flan_T5":
+        return (
+            ("GoogleFlanT5", model_configs["Model_Name"], cf.DEVICE, model_configs["Backend"]),
+            lambda: _model_module("google_flan").GoogleFlanT5(
+                model_name=model_configs["Model_Name"],
+                device=cf.DEVICE,
+                token_required=model_configs["Hugging_Face_Token"],
+                token=None,
+                backend=model_configs["Backend"],
+                onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+                onnx_threads=onnx_threads
+            )
+        )
+
+    if model_ident == "Gliner_Model":
+        return (
+            (
+                "GlinerNER", model_configs["Model_Name"], cf.DEVICE,
+                model_configs["Maximum_Length"], model_configs["Backend"]
+            ),
+            lambda: _model_module("gliner_ner").GlinerNER(
+                model_name=model_configs["Model_Name"],
+                device=cf.DEVICE,
+                max_length=model_configs["Maximum_Length"],
+                backend=model_configs["Backend"],
+                onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+                onnx_threads=onnx_threads,
+                cache_labels=model_configs["Label_Cache"]
+            )
+        )
+
+    if model_ident == "Facebook_Bart_CNN":
+        return (
+            ("FacebookBart", model_configs["Model_Name"], cf.DEVICE, model_configs["Backend"]),
+            lambda: _model_module("facebook_bart").FacebookBart(
+                model_name=model_configs["Model_Name"],
+                device=cf.DEVICE,
+                task=model_configs["Model_Task"],
+                token_required=model_configs["Hugging_Face_Token"],
+                token=None,
+                backend=model_configs["Backend"],
+                onnx_cache_dir=str(cf.ONNX_CACHE_PATH),
+                onnx_threads=onnx_threads
+            )
+        )
+
+    if model_ident == "Phi4_Language_Model":
+        return (
+            ("Phi4Instruct", model_configs["Model_Name"], cf.DEVICE),
+            lambda: _model_module("microsoft_phi").Phi4Instruct(
+                model_name=model_configs["Model_Name"],
+                model_task=model_configs["Model_Task"],
+                token_required=model_configs["Hugging_Face_Token"],
+                token=None
+            )
+        )
+
+    raise ValueError(f"No loader is defined for the model {model_ident}.")
+
+
+def whisper_model() -> "whisper_ai.WhisperAI":
+    """
+    Returns the shared Whisper model, or a client of the inference server when it is enabled.
+    """
+
+    model_configs = cf.MODELS_CONFIG["Whisper_AI_Configurations"]
+    if inference_client.server_enabled():
+        return inference_client.RemoteWhisper(inference_client.default_client(), model_configs["Model_Name"])
+
+    # Get the shared instance of Whisper model
+    return MODEL_REGISTRY.get(*_model_spec("Whisper_AI_Configurations"))
+
+
+def asr_backend() -> asr_backends.AsrBackend:
+    """
+    Returns the configured speech recognition backend. The transformers backend runs the shared
+    Whisper model, or the one of the inference server when it is enabled.
+    """
+
+    if cf.MODELS_CONFIG["Asr_Backend"]["Backend"] == asr_backends.TRANSFORMERS:
+        return asr_backends.load_asr_backend(model=whisper_model())
+    return asr_backends.load_asr_backend()
+
+
+def t5_model() -> "google_flan.GoogleFlanT5":
+    """
+    Returns the shared T5 model, or a client of the inference server when it is enabled.
+    """
+
+    model_configs = cf.MODELS_CONFIG["Google_Flan_T5"]
+    if inference_client.server_enabled():
+        return inference_client.RemoteSummarizer(inference_client.default_client(), "t5", model_configs["Model_Name"])
+
+    # Get the shared instance of T5 model
+    return MODEL_REGISTRY.get(*_model_spec("Google_Flan_T5"))
+
+
+def gliner_model() -> "gliner_ner.GlinerNER":
+    """
+    Returns the shared GLiNER model, or a client of the inference server when it is enabled.
+    """
+
+    model_configs = cf.MODELS_CONFIG["Gliner_Model"]
+    if inference_client.server_enabled():
+        return inference_client.RemoteGliner(
+            inference_client.default_client(), model_configs["Model_Name"], model_configs["Maximum_Length"]
+        )
 
-    return summary_output
+    # Get the shared instance of GLiNER model
+    return MODEL_REGISTRY.get(*_model_spec("Gliner_Model"))
 
 
-@st.cache_data(ttl=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Object_TTL"])
-def phi4_inference(text: str, model_ident: str, system_prompt: str, user_prompt: str) -> str:
+def bart_model(model_ident: str) -> "facebook_bart.FacebookBart":
     """
-    Runs inference using the Phi4 model based on provided text input, model identifier,
-    and specific prompt files for system and user interactions. The function reads
-    predefined prompts, configures the model settings, and returns a summarization
-    generated by the Phi4 model.
+    Returns the shared BART model of a models configuration section, e.g. "Facebook_Bart_CNN", or a
+    client of the inference server when it is enabled.
+    """
+
+    if inference_client.server_enabled():
+        return inference_client.RemoteSummarizer(
+            inference_client.default_client(), "bart", cf.MODELS_CONFIG[model_ident]["Model_Name"]
+        )
+
+    # Get the shared instance of BART model
+    return MODEL_REGISTRY.get(*_model_spec(model_ident))
+
+
+def _phi4_model(model_ident: str) -> "microsoft_phi.Phi4Instruct":
+    # Get the shared instance of Phi4 model
+    return MODEL_REGISTRY.get(*_model_spec(model_ident))
+
+
+def warm_up(model_idents: list[str]) -> threading.Thread:
+    """
+    Loads the given models in a background thread, so that the first request does not wait for
+    them. Models served by the inference server are not loaded in this process.
 
     Args:
-        text: The user-provided input text for which the model needs to perform the inference.
-        model_ident: Identifier for the model, used to fetch relevant configurations.
+        model_idents: Sections of the models configurations, e.g. ["Facebook_Bart_CNN"].
+
+    Returns:
+        threading.Thread: The started warm-up thread.
+    """
+
+    if inference_client.server_enabled():
+        model_idents = [ident for ident in model_idents if ident == "Phi4_Language_Model"]
+    return MODEL_REGISTRY.warm_up([_model_spec(ident) for ident in model_idents])
+
+
+def model_states(model_idents: list[str]) -> dict[str, str]:
+    """
+    Returns whether each of the given models is "ready", "loading" or "absent" in this process,
+    or "remote" when the inference server runs it.
+
+    Args:
+        model_idents: Sections of the models configurations, e.g. ["Facebook_Bart_CNN"].
+
+    Returns:
+        dict[str, str]: The state of every model.
+    """
+
+    return {
+        ident: (
+            "remote" if inference_client.server_enabled() and ident != "Phi4_Language_Model"
+            else MODEL_REGISTRY.state(_model_spec(ident)[0])
+        )
+        for ident in model_idents
+    }
+
+
+def clean_t5_summary(summary: str) -> str:
+    """
+    Removes the special tokens and the "summary:" tag that T5 leaves in its decoded output.
+
+    Args:
+        summary: The decoded output of T5.
+
+    Returns:
+        str: The summary text.
+    """
+
+    return summary.replace("<pad>", "").replace("</s>", "").replace("summary:", "").strip()
+
+
+def _phi4_prompts(text: str, system_prompt: str, user_prompt: str) -> tuple[str, str, str]:
+    """
+    Reads the Phi4 prompt files and appends the text to the user prompt. The user prompt file and
+    the separator form a constant prefix shared by every text, whose key/value cache Phi4 reuses.
+
+    Args:
+        text: The text to be summarized.
         system_prompt: Path to the file containing the system prompt, relative to a predefined
             prompts directory.
         user_prompt: Path to the file containing the user prompt, relative to a predefined
             prompts directory.
 
     Returns:
-        str: The inference output (e.g., summary) generated by the Phi4 model.
+        tuple[str, str, str]: The system prompt, the constant user prompt prefix and the full user prompt.
     """
 
-    # Get configurations for Phi4 and prompts
-    model_configs = cf.MODELS_CONFIG[model_ident]
-    system_prompt = cf.PROMPTS_PATH.joinpath(system_prompt).resolve()
-    user_prompt = cf.PROMPTS_PATH.joinpath(user_prompt).resolve()
-
     # Read in system prompt and user prompt
-    with open(system_prompt, "r", encoding="utf-8") as f:
+    with open(cf.PROMPTS_PATH.joinpath(system_prompt).resolve(), "r", encoding="utf-8") as f:
         system_prompt_text = f.read()
-    with open(user_prompt, "r", encoding="utf-8") as f:
+    with open(cf.PROMPTS_PATH.joinpath(user_prompt).resolve(), "r", encoding="utf-8") as f:
         user_prompt_text = f.read()
 
-    user_prompt_text = f"{user_prompt_text}\n{text}"
+    prompt_prefix = f"{user_prompt_text}\n"
+    return system_prompt_text, prompt_prefix, f"{prompt_prefix}{text}"
+
+
+def _bart_summary(text: str, model_ident: str) -> str:
+    # Summarize with the shared BART model
+    model_configs = cf.MODELS_CONFIG[model_ident]
+    return bart_model(model_ident).inference(
+        input_text=text,
+        min_length=model_configs["Minimum_Length"],
+        max_length=model_configs["Maximum_Length"]
+    )
+
+
+def bart_stream(text: str, model_ident: str) -> Generator[str, None, None]:
+    """
+    Summarizes the text with the BART model and yields the summary while it is generated, to be
+    rendered with `st.write_stream`.
+
+    Args:
+        text (str): The input text to be summarized.
+        model_ident (str): Identifier for the BART model configuration to be used.
+
+    Yields:
+        str: The next piece of the summary.
+    """
 
-    # Instantiate Phi4 model
-    model = microsoft_phi.Phi4Instruct(
-        model_name=model_configs["Model_Name"],
-        model_task=model_configs["Model_Task"],
-        token_required=model_configs["Hugging_Face_Token"],
-        token=None
+    model_configs = cf.MODELS_CONFIG[model_ident]
+    yield from _cached_stream(
+        ("bart_stream", text, model_ident),
+        lambda: bart_model(model_ident).stream_inference(
+            input_text=text,
+            min_length=model_configs["Minimum_Length"],
+            max_length=model_configs["Maximum_Length"]
+        )
     )
 
-    # Generate summary
-    summary_output = model.inference(
+
+def _phi4_output(text: str, model_ident: str, system_prompt: str, user_prompt: str) -> str:
+    # Run the shared Phi4 model
+    model_configs = cf.MODELS_CONFIG[model_ident]
+    system_prompt_text, prompt_prefix, user_prompt_text = _phi4_prompts(text, system_prompt, user_prompt)
+
+    return _phi4_model(model_ident).inference(
         system_prompt=system_prompt_text,
         user_prompt=user_prompt_text,
         max_new_tokens=model_configs["Maximum_New_Token"],
         temperature=model_configs["Temperature"],
-        top_p=model_configs["Top_P"]
+        top_p=model_configs["Top_P"],
+        prompt_prefix=prompt_prefix if model_configs["Prefix_Cache"] else None,
+        constrained=model_configs["Constrained_Decoding"]["Enabled"],
+        top_candidates=model_configs["Constrained_Decoding"]["Top_Candidates"]
     )
 
-    return summary_output
 
+def phi4_stream(text: str, model_ident: str, system_prompt: str, user_prompt: str) -> Generator[str, None, None]:
+    """
+    Runs the Phi4 model on the transcript with the given prompt files and yields the raw model
+    output while it is generated. Wrap the stream in `json_utils.JsonFieldStreamer` to show the
+    summary field only.
+
+    Args:
+        text: The user-provided input text for which the model needs to perform the inference.
+        model_ident: Identifier for the model, used to fetch relevant configurations.
+        system_prompt: Path to the file containing the system prompt, relative to a predefined
+            prompts directory.
+        user_prompt: Path to the file containing the user prompt, relative to a predefined
+            prompts directory.
+
+    Yields:
+        str: The next piece of the model output.
+    """
 
-@st.cache_data(ttl=cf.STREAMLIT_CONFIG["Streamlit_Application_Configurations"]["Object_TTL"])
-def full_inference_pipeline(
-    file: UploadedFile, model_selection: str, temp_dir: str,
-    system_prompt: str | None = None, user_prompt: str | None = None
+    model_configs = cf.MODELS_CONFIG[model_ident]
+    system_prompt_text, prompt_prefix, user_prompt_text = _phi4_prompts(text, system_prompt, user_prompt)
+    yield from _cached_stream(
+        ("phi4_stream", text, model_ident, system_prompt, user_prompt),
+        lambda: _phi4_model(model_ident).stream_inference(
+            system_prompt=system_prompt_text,
+            user_prompt=user_prompt_text,
+            max_new_tokens=model_configs["Maximum_New_Token"],
+            temperature=model_configs["Temperature"],
+            top_p=model_configs["Top_P"],
+            prompt_prefix=prompt_prefix if model_configs["Prefix_Cache"] else None,
+            constrained=model_configs["Constrained_Decoding"]["Enabled"],
+            top_candidates=model_configs["Constrained_Decoding"]["Top_Candidates"]
+        )
+    )
+
+
+def run_speech_pipeline(
+    audio: bytes | BinaryIO | np.ndarray, model_selection: str,
+    system_prompt: str | None = None, user_prompt: str | None = None,
+    progress: Callable[[str, float], None] | None = None
 ) -> dict:
     """
     Executes the full inference pipeline, performing automatic speech recognition (ASR),
     text summarization, and named entity recognition (NER) based on the specified model
-    selection. This function handles processing of an uploaded audio file by saving it
-    temporarily, extracting text from the audio, summarizing the text, and identifying named
-    entities in the text. It also cleans up temporary artifacts after execution.
+    selection. This function handles processing of an audio file by decoding it in memory,
+    extracting text from the audio, summarizing the text, and identifying named entities in
+    the text. It does not depend on Streamlit, so background workers can run it as well.
 
     Args:
-        file (UploadedFile): The uploaded file object to be processed. It represents an
-            audio file that will undergo speech-to-text extraction.
+        audio (bytes | BinaryIO | np.ndarray): The encoded audio file, as bytes or a file-like
+            object, or a 16 kHz mono waveform that will undergo speech-to-text extraction.
         model_selection (str): Indicates the chosen pipeline for text summarization and
             named entity recognition. Acceptable values include "T5 + GliNER", "Bart +
             GliNER", or others for an alternative model.
-        temp_dir (str): The directory path for temporary storage of the uploaded audio file
-            during processing.
         system_prompt (str | None, optional): The system-level prompt to be applied for
             inference in the selected pipeline. Defaults to None.
         user_prompt (str | None, optional): The user-specific prompt to be applied for
             inference in the selected pipeline. Defaults to None.
+        progress (Callable[[str, float], None] | None, optional): Called with the name of each
+            stage ("transcription", "summarization", "entities") and the completed fraction of
+            the pipeline when the stage starts. Defaults to None.
 
     Returns:
         dict: A dictionary containing the processed results including the text summary and
             named entities along with corresponding scores where relevant.
     """
 
-    # Create an instance of Whisper model
-    whisper_model = whisper_ai.WhisperAI(
-        model_name=cf.MODELS_CONFIG["Whisper_AI_Configurations"]["Model_Name"],
-        model_task="automatic-speech-recognition",
-        device=cf.DEVICE,
-        token_required=cf.MODELS_CONFIG["Whisper_AI_Configurations"]["Hugging_Face_Token"],
-        token=None
-    )
+    report = progress or (lambda stage, fraction: None)
 
-    # Save the uploaded file into a temporary folder for Streamlit
-    temp_folder = cf.DATA_PATH.joinpath(temp_dir).resolve()
-    os.makedirs(temp_folder, exist_ok=True)
+    # Get the configured speech recognition backend
+    report("transcription", 0.0)
+    backend = asr_backend()
 
-    temp_file = temp_folder.joinpath(file.name).resolve()
-    with open(temp_file, "wb") as f:
-        f.write(file.read())
+    # Decode the uploaded file in memory
+    if isinstance(audio, np.ndarray):
+        waveform = audio
+    else:
+        waveform = audio_utils.decode_audio(audio, sampling_rate=audio_utils.SAMPLING_RATE)
 
     # Run text extraction through Whisper AI
-    extracted_text = whisper_model.inference(
-        audio_files=[temp_file.__str__()],
-        max_new_tokens=cf.MODELS_CONFIG["Whisper_AI_Configurations"]["Maximum_Token_Generation"],
-        language=cf.MODELS_CONFIG["Whisper_AI_Configurations"]["Language_Selection"]
-    )[0]["text"]
+    extracted_text = backend.transcribe([waveform], sampling_rate=audio_utils.SAMPLING_RATE)[0].text
 
     # Run text summarization inference pipeline based on model selection
+    report("summarization", 0.4)
     if model_selection == "T5 + GliNER":
         # Text summary
-        model = google_flan.GoogleFlanT5(
-            model_name = cf.MODELS_CONFIG["Google_Flan_T5"]["Model_Name"],
-            device = cf.DEVICE,
-            token_required = cf.MODELS_CONFIG["Google_Flan_T5"]["Hugging_Face_Token"],
-            token = None
-        )
+        model = t5_model()
         text_summary = model.inference(
             input_text = f"summarize: {extracted_text}",
             min_length = cf.MODELS_CONFIG["Google_Flan_T5"]["Maximum_Token_Generation"]["Medium_Output"]["Minimum_Length"],
@@ -168,14 +441,14 @@ def full_inference_pipeline(
         )
 
         # Clean the output
-        text_summary = text_summary.replace("<pad>", "").replace("</s>", "").replace("summary:", "").strip()
+        text_summary = clean_t5_summary(text_summary)
 
     elif model_selection == "Bart + GliNER":
         # Text summary
-        text_summary = bart_inference(text=extracted_text, model_ident="Facebook_Bart_CNN")
+        text_summary = _bart_summary(text=extracted_text, model_ident="Facebook_Bart_CNN")
 
     else:
-        model_output = phi4_inference(
+        model_output = _phi4_output(
             text=extracted_text,
             model_ident="Phi4_Language_Model",
             system_prompt=system_prompt,
@@ -187,14 +460,11 @@ def full_inference_pipeline(
         text_summary = cleaned_dict["SUMMARY"]
 
     # Named entities extraction
+    report("entities", 0.8)
     if model_selection == "T5 + GliNER" or model_selection == "Bart + GliNER":
-        model = GLiNER.from_pretrained(
-            pretrained_model_name_or_path=cf.MODELS_CONFIG["Gliner_Model"]["Model_Name"],
-            load_tokenizer=True,
-            max_length=cf.MODELS_CONFIG["Gliner_Model"]["Maximum_Length"]
-        ).to("cuda" if cf.DEVICE == "auto" else cf.DEVICE).eval()
+        model = gliner_model()
         labels = cf.MODELS_CONFIG["Gliner_Model"]["Labels"]
-        entities = model.predict_entities(extracted_text, labels)
+        entities = model.inference(extracted_text, labels)
 
         # Flatten the dictionary and calculate the average score for each entity
         scored_entities = streamlit_utils.ner_cleaning(entities)
@@ -204,7 +474,5 @@ def full_inference_pipeline(
 
     # Combined everything and return the dictionary
     combined_dict = {"SUMMARY": text_summary, **scored_entities}
-
-    # Clean up the artifacts
-    shutil.rmtree(temp_folder)
+    report("done", 1.0)
     return combined_dict
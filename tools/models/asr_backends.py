@@ -0,0 +1,186 @@
+
+import time
+import numpy as np
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Protocol
+from src import global_configs as cf
+from tools.models import model_registry
+
+if TYPE_CHECKING:
+    from tools.models import whisper_ai
+
+# Names of the backends accepted by the "Asr_Backend" configuration
+TRANSFORMERS = "transformers"
+OPENAI_WHISPER = "openai-whisper"
+
+
+@dataclass
+class Transcription:
+    """
+    The transcript of one waveform.
+    """
+
+    text: str
+    # Segments with their "start" and "end" time in seconds and their "text"
+    segments: list[dict] = field(default_factory=list)
+    # Seconds of audio transcribed and seconds spent on it, shared evenly across a batch
+    audio_seconds: float = 0.0
+    inference_seconds: float = 0.0
+
+
+class AsrBackend(Protocol):
+    """
+    A speech recognition model that transcribes a batch of 16 kHz mono waveforms.
+    """
+
+    name: str
+
+    def transcribe(self, waveforms: list[np.ndarray], sampling_rate: int = 16000) -> list[Transcription]:
+        ...
+
+
+def _timed(transcriptions: list[Transcription], waveforms: list[np.ndarray], sampling_rate: int, seconds: float):
+    for transcription, waveform in zip(transcriptions, waveforms):
+        transcription.audio_seconds = len(waveform) / sampling_rate
+        transcription.inference_seconds = seconds / len(waveforms)
+    return transcriptions
+
+
+class TransformersWhisperBackend:
+    """
+    Runs `WhisperAI`, the transformers pipeline of Whisper, or its inference server stand-in.
+    """
+
+    name = TRANSFORMERS
+
+    def __init__(self, model: "whisper_ai.WhisperAI", max_new_tokens: int, language: str, timestamps: bool = False):
+        """
+        Args:
+            model: The Whisper wrapper, or a `RemoteWhisper`.
+            max_new_tokens: The maximum number of tokens generated per 30 seconds chunk.
+            language: The language of the audio, e.g. "english".
+            timestamps: Whether to predict the segment timestamps. Without them, every transcript
+                is a single segment spanning the whole waveform and decoding is unchanged.
+        """
+
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.language = language
+        self.timestamps = timestamps
+
+    def transcribe(self, waveforms: list[np.ndarray], sampling_rate: int = 16000) -> list[Transcription]:
+        start = time.perf_counter()
+        outputs = self.model.inference(
+            audio_files=waveforms,
+            max_new_tokens=self.max_new_tokens,
+            language=self.language,
+            sampling_rate=sampling_rate,
+            return_timestamps=self.timestamps
+        )
+        seconds = time.perf_counter() - start
+
+        transcriptions = []
+        for output, waveform in zip(outputs, waveforms):
+            chunks = output.get("chunks") or [
+                {"timestamp": (0.0, len(waveform) / sampling_rate), "text": output["text"]}
+            ]
+            # The end of the last chunk is None when the audio ends in the middle of a segment
+            segments = [
+                {
+                    "start": chunk["timestamp"][0],
+                    "end": chunk["timestamp"][1] if chunk["timestamp"][1] is not None else len(waveform) / sampling_rate,
+                    "text": chunk["text"]
+                }
+                for chunk in chunks
+            ]
+            transcriptions.append(Transcription(text=output["text"], segments=segments))
+        return _timed(transcriptions, waveforms, sampling_rate, seconds)
+
+
+class OpenAIWhisperBackend:
+    """
+    Runs a model of the openai-whisper package, which transcribes one waveform at a time.
+    """
+
+    name = OPENAI_WHISPER
+
+    def __init__(self, model, language: str):
+        """
+        Args:
+            model: A `whisper.Whisper` model.
+            language: The language of the audio, e.g. "english".
+        """
+
+        self.model = model
+        self.language = language
+
+    def transcribe(self, waveforms: list[np.ndarray], sampling_rate: int = 16000) -> list[Transcription]:
+        if sampling_rate != 16000:
+            raise ValueError(f"openai-whisper expects 16 kHz audio, got {sampling_rate} Hz.")
+
+        start = time.perf_counter()
+        transcriptions = []
+        for waveform in waveforms:
+            result = self.model.transcribe(waveform.astype(np.float32), language=self.language)
+            segments = [
+                {"start": segment["start"], "end": segment["end"], "text": segment["text"]}
+                for segment in result["segments"]
+            ]
+            transcriptions.append(Transcription(text=result["text"], segments=segments))
+        return _timed(transcriptions, waveforms, sampling_rate, time.perf_counter() - start)
+
+
+def load_asr_backend(backend: str | None = None, model: "whisper_ai.WhisperAI | None" = None) -> AsrBackend:
+    """
+    Creates the speech recognition backend selected in the "Asr_Backend" models configuration.
+    The models are loaded on first use and kept in the process model registry.
+
+    Args:
+        backend: "transformers" or "openai-whisper". Defaults to the configured backend.
+        model: The Whisper wrapper run by the "transformers" backend, e.g. a `RemoteWhisper`.
+            Defaults to the model of "Whisper_AI_Configurations" from the registry.
+
+    Returns:
+        AsrBackend: The backend.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+
+    backend_configs = cf.MODELS_CONFIG["Asr_Backend"]
+    whisper_configs = cf.MODELS_CONFIG["Whisper_AI_Configurations"]
+    backend = backend or backend_configs["Backend"]
+
+    if backend == TRANSFORMERS:
+        if model is None:
+            from tools.models import whisper_ai
+
+            model = model_registry.MODEL_REGISTRY.get(
+                ("WhisperAI", whisper_configs["Model_Name"], cf.DEVICE),
+                lambda: whisper_ai.WhisperAI(
+                    model_name=whisper_configs["Model_Name"],
+                    model_task="automatic-speech-recognition",
+                    device=cf.DEVICE,
+                    token_required=whisper_configs["Hugging_Face_Token"],
+                    token=None
+                )
+            )
+        return TransformersWhisperBackend(
+            model=model,
+            max_new_tokens=whisper_configs["Maximum_Token_Generation"],
+            language=whisper_configs["Language_Selection"],
+            timestamps=backend_configs["Segment_Timestamps"]
+        )
+
+    if backend == OPENAI_WHISPER:
+        import whisper
+
+        model_name = backend_configs["Openai_Whisper_Model"]
+        return OpenAIWhisperBackend(
+            model=model_registry.MODEL_REGISTRY.get(
+                ("OpenAIWhisper", model_name, "cpu"), lambda: whisper.load_model(model_name)
+            ),
+            language=whisper_configs["Language_Selection"]
+        )
+
+    raise ValueError(f"Unknown speech recognition backend {backend}, expected {TRANSFORMERS} or {OPENAI_WHISPER}.")
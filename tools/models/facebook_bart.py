@@ -1,10 +1,16 @@
 
-from transformers import pipelines
+from typing import Generator
+from transformers import AutoModelForSeq2SeqLM, AutoTokenizer, TextIteratorStreamer
+from tools.models import onnx_runtime
+from tools.utils import profiling, stream_utils
 
 
 class FacebookBart:
 
-    def __init__(self, model_name: str, device: str, task: str, token_required: bool = False, token: str | None = None):
+    def __init__(
+        self, model_name: str, device: str, task: str, token_required: bool = False, token: str | None = None,
+        backend: str = "torch", onnx_cache_dir: str | None = None, onnx_threads: int = 0
+    ):
         """
         Initializes a new instance of a class with specified model, device, task,
         and optional token configurations. It sets up a pipeline for performing the
@@ -20,6 +26,11 @@ class FacebookBart:
                 accessing or initializing the model. Defaults to False.
             token: Optional authentication token used if token_required is set to
                 True.
+            backend: "torch" to run the model with a PyTorch pipeline, or "onnx" to run greedy
+                decoding through ONNX Runtime on CPU instead of the model's beam search.
+                Defaults to "torch".
+            onnx_cache_dir: Root folder of the exported ONNX graphs, required by the "onnx" backend.
+            onnx_threads: Number of ONNX Runtime intra-op threads. 0 lets ONNX Runtime decide.
         """
 
         self.model_name = model_name
@@ -27,15 +38,33 @@ class FacebookBart:
         self.task = task
         self.token_required = token_required
         self.token = token
-        self.pipe = pipelines.pipeline(
-            task=task,
-            model=model_name,
-            device_map=device,
-            torch_dtype="auto",
-            trust_remote_code=True,
-            token=token if token_required else None
-        )
+        self.backend = backend
+
+        # The ONNX backend only loads the PyTorch weights when the graphs still need to be exported
+        if backend == "onnx":
+            self.pipe = None
+            self.tokenizer = AutoTokenizer.from_pretrained(model_name, token=token if token_required else None)
+            self.onnx_generator = onnx_runtime.OnnxSeq2SeqGenerator(
+                cache_dir=onnx_runtime.model_cache_dir(onnx_cache_dir, model_name),
+                model_loader=lambda: AutoModelForSeq2SeqLM.from_pretrained(
+                    model_name, trust_remote_code=True, token=token if token_required else None
+                ),
+                intra_op_threads=onnx_threads
+            )
+        else:
+            from transformers import pipeline
 
+            self.pipe = pipeline(
+                task=task,
+                model=model_name,
+                device_map=device,
+                torch_dtype="auto",
+                trust_remote_code=True,
+                token=token if token_required else None
+            )
+            self.tokenizer = self.pipe.tokenizer
+
+    @profiling.profiled
     def inference(self, input_text: str, min_length: int, max_length: int) -> str:
         """
         Runs a text summarization inference using the pre-defined pipeline. Generates a summarized
@@ -50,5 +79,84 @@ class FacebookBart:
             A string containing the summarized version of the input text.
         """
 
+        # Run greedy decoding through ONNX Runtime
+        if self.backend == "onnx":
+            inputs = self.tokenizer(input_text, return_tensors="np")
+            outputs = self.onnx_generator.generate(
+                inputs["input_ids"], inputs["attention_mask"], min_length=min_length, max_length=max_length
+            )
+            return self.tokenizer.decode(outputs[0], skip_special_tokens=True)
+
         output_text = self.pipe(input_text, min_length=min_length, max_length=max_length)
         return output_text[0]["summary_text"]
+
+    @profiling.profiled
+    def batch_inference(self, input_texts: list[str], min_length: int, max_length: int) -> list[str]:
+        """
+        Summarizes several texts in one padded batch, producing the same summaries as `inference`.
+
+        Args:
+            input_texts: The texts to be summarized.
+            min_length: An integer representing the minimum allowable length of every summary.
+            max_length: An integer representing the maximum allowable length of every summary.
+
+        Returns:
+            list[str]: The summaries, in the order of the inputs.
+        """
+
+        if self.backend == "onnx":
+            inputs = self.tokenizer(input_texts, return_tensors="np", padding=True)
+            outputs = self.onnx_generator.generate(
+                inputs["input_ids"], inputs["attention_mask"], min_length=min_length, max_length=max_length
+            )
+            return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+        output_texts = self.pipe(input_texts, min_length=min_length, max_length=max_length, batch_size=len(input_texts))
+        return [output["summary_text"] for output in output_texts]
+
+    def stream_inference(self, input_text: str, min_length: int, max_length: int) -> Generator[str, None, None]:
+        """
+        Summarizes the input text and yields the summary piece by piece while it is generated.
+        Streaming emits one hypothesis token by token, so the summary is decoded greedily instead
+        of with the beam search used by `inference`.
+
+        Args:
+            input_text: The text to be summarized.
+            min_length: An integer representing the minimum allowable length of the summary.
+            max_length: An integer representing the maximum allowable length of the summary.
+
+        Yields:
+            str: The next piece of the summary text.
+        """
+
+        # Decode the growing ONNX Runtime sequence and yield the new text only
+        if self.backend == "onnx":
+            inputs = self.tokenizer(input_text, return_tensors="np")
+            emitted = ""
+            for sequences in self.onnx_generator.stream(
+                inputs["input_ids"], inputs["attention_mask"], min_length=min_length, max_length=max_length
+            ):
+                text = self.tokenizer.decode(sequences[0], skip_special_tokens=True)
+                if len(text) > len(emitted):
+                    yield text[len(emitted):]
+                    emitted = text
+            return
+
+        # Run generation in a background thread and yield the text from the streamer
+        model = self.pipe.model
+        inputs = self.tokenizer(input_text, return_tensors="pt").to(model.device)
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=stream_utils.STREAM_TIMEOUT_SECONDS
+        )
+        yield from stream_utils.stream_generation(
+            model.generate,
+            streamer,
+            {
+                **inputs,
+                "min_length": min_length,
+                "max_length": max_length,
+                "num_beams": 1,
+                "early_stopping": False,
+                "streamer": streamer
+            }
+        )
@@ -0,0 +1,109 @@
+
+from tools.models import onnx_runtime
+
+
+class GlinerNER:
+
+    def __init__(
+        self, model_name: str, device: str, max_length: int | None,
+        backend: str = "torch", onnx_cache_dir: str | None = None, onnx_threads: int = 0,
+        cache_labels: bool = False
+    ):
+        """
+        Initializes a GLiNER model for zero-shot Named Entity Recognition (NER) with the specified
+        model name, device, and maximum sequence length.
+
+        Args:
+            model_name: The name or path of the pretrained GLiNER model to be loaded.
+            device: The hardware device configuration, such as "cpu", "mps" or "auto" for CUDA.
+            max_length: Maximum number of tokens the model processes for a single text. None keeps the
+                length of the model configuration.
+            backend: "torch" to run the model with PyTorch, or "onnx" to run it through ONNX
+                Runtime on CPU. Defaults to "torch".
+            onnx_cache_dir: Root folder of the exported ONNX graphs, required by the "onnx" backend.
+            onnx_threads: Number of ONNX Runtime intra-op threads. 0 lets ONNX Runtime decide.
+            cache_labels: Whether to encode every label set once and reuse its embeddings for every
+                text. Only bi-encoder models encode the labels apart from the text, so the setting is
+                ignored by uni-encoder models, e.g. "gliner-community/gliner_large-v2.5", and by the
+                "onnx" backend. Defaults to False.
+        """
+
+        from gliner import GLiNER
+
+        self.model_name = model_name
+        self.device = device
+        self.max_length = max_length
+        self.backend = backend
+
+        if backend == "onnx":
+            self.model = onnx_runtime.load_gliner_onnx(
+                cache_dir=onnx_runtime.model_cache_dir(onnx_cache_dir, model_name, max_length=max_length),
+                model_loader=lambda: GLiNER.from_pretrained(
+                    pretrained_model_name_or_path=model_name,
+                    load_tokenizer=True,
+                    max_length=max_length
+                ).eval(),
+                intra_op_threads=onnx_threads
+            )
+        else:
+            self.model = GLiNER.from_pretrained(
+                pretrained_model_name_or_path=model_name,
+                load_tokenizer=True,
+                max_length=max_length
+            ).to("cuda" if device == "auto" else device).eval()
+
+        # Uni-encoder models read the labels in the same sequence as the text, so that the label
+        # representations depend on the text and cannot be computed once
+        self.cache_labels = cache_labels and backend == "torch" and self.model.config.labels_encoder is not None
+        self._label_embeddings: dict[tuple[str, ...], object] = {}
+
+    def label_embeddings(self, labels: list[str]) -> tuple[list[str], object]:
+        """
+        Encodes a label set with the labels encoder of a bi-encoder model, once per label set.
+
+        Args:
+            labels: A list of entity labels, e.g. ["Persons", "Location"].
+
+        Returns:
+            tuple[list[str], torch.Tensor]: The labels without duplicates, in the order of their
+                embeddings, and the embeddings.
+        """
+
+        key = tuple(dict.fromkeys(labels))
+        if key not in self._label_embeddings:
+            self._label_embeddings[key] = self.model.encode_labels(list(key))
+        return list(key), self._label_embeddings[key]
+
+    def inference(self, input_text: str, labels: list[str]) -> list[dict]:
+        """
+        Extracts named entities of the given labels from the input text.
+
+        Args:
+            input_text: The text from which the entities are extracted.
+            labels: A list of entity labels to look for, e.g. ["Persons", "Location"].
+
+        Returns:
+            list[dict]: A list of entities, each with "start", "end", "text", "label" and "score" keys.
+        """
+
+        if self.cache_labels:
+            labels, embeddings = self.label_embeddings(labels)
+            return self.model.predict_with_embeds(input_text, embeddings, labels)
+        return self.model.predict_entities(input_text, labels)
+
+    def batch_inference(self, input_texts: list[str], labels: list[str]) -> list[list[dict]]:
+        """
+        Extracts named entities of the given labels from several texts in one batch.
+
+        Args:
+            input_texts: The texts from which the entities are extracted.
+            labels: A list of entity labels to look for, e.g. ["Persons", "Location"].
+
+        Returns:
+            list[list[dict]]: The entities of every text, in the order of the inputs, see `inference`.
+        """
+
+        if self.cache_labels:
+            labels, embeddings = self.label_embeddings(labels)
+            return self.model.batch_predict_with_embeds(input_texts, embeddings, labels)
+        return self.model.batch_predict_entities(input_texts, labels)
@@ -1,10 +1,15 @@
 
 import torch
 from transformers import T5Tokenizer, T5ForConditionalGeneration, BatchEncoding
+from tools.models import onnx_runtime
+from tools.utils import profiling
 
 class GoogleFlanT5:
 
-    def __init__(self, model_name: str, device: str, token_required: bool = False, token: str | None = None):
+    def __init__(
+        self, model_name: str, device: str, token_required: bool = False, token: str | None = None,
+        backend: str = "torch", onnx_cache_dir: str | None = None, onnx_threads: int = 0
+    ):
         """
         Initializes the class to manage a model and its tokenizer, utilizing the
         specified model name, device, and optional token for authorization.
@@ -16,26 +21,46 @@ class GoogleFlanT5:
                 the model.
             token: The optional authorization token to authenticate access to
                 the model resources.
+            backend: "torch" to run the model with PyTorch, or "onnx" to run greedy decoding
+                through ONNX Runtime on CPU. Defaults to "torch".
+            onnx_cache_dir: Root folder of the exported ONNX graphs, required by the "onnx" backend.
+            onnx_threads: Number of ONNX Runtime intra-op threads. 0 lets ONNX Runtime decide.
         """
 
         self.model_name = model_name
         self.device = device
         self.token_required = token_required
         self.token = token
+        self.backend = backend
         self.tokenizer = T5Tokenizer.from_pretrained(
             pretrained_model_name_or_path=model_name,
             device_map=device,
             trust_remote_code=True,
             token=token if token_required else None
         )
-        self.model = T5ForConditionalGeneration.from_pretrained(
-            pretrained_model_name_or_path=model_name,
-            device_map=device,
-            torch_dtype="auto",
-            trust_remote_code=True,
-            token=token if token_required else None
-        ).eval()
 
+        # The ONNX backend only loads the PyTorch weights when the graphs still need to be exported
+        if backend == "onnx":
+            self.model = None
+            self.onnx_generator = onnx_runtime.OnnxSeq2SeqGenerator(
+                cache_dir=onnx_runtime.model_cache_dir(onnx_cache_dir, model_name),
+                model_loader=lambda: T5ForConditionalGeneration.from_pretrained(
+                    pretrained_model_name_or_path=model_name,
+                    trust_remote_code=True,
+                    token=token if token_required else None
+                ),
+                intra_op_threads=onnx_threads
+            )
+        else:
+            self.model = T5ForConditionalGeneration.from_pretrained(
+                pretrained_model_name_or_path=model_name,
+                device_map=device,
+                torch_dtype="auto",
+                trust_remote_code=True,
+                token=token if token_required else None
+            ).eval()
+
+    @profiling.profiled
     def inference(self, input_text: str, min_length: int, max_length: int) -> str:
         """
         Generates text based on the provided input, with constraints on minimum and
@@ -54,6 +79,14 @@ class GoogleFlanT5:
             constraints.
         """
 
+        # Run greedy decoding through ONNX Runtime
+        if self.backend == "onnx":
+            inputs = self.tokenizer(input_text, return_tensors="np")
+            outputs = self.onnx_generator.generate(
+                inputs.input_ids, inputs.attention_mask, min_length=min_length, max_length=max_length
+            )
+            return self.tokenizer.decode(outputs[0])
+
         # Generate embeddings from the input text given
         input_ids = self.tokenizer(
             input_text,
@@ -67,3 +100,44 @@ class GoogleFlanT5:
         # Decode the output and return
         decoded_outputs = self.tokenizer.decode(outputs[0])
         return decoded_outputs
+
+    def _decode_trimmed(self, output_ids) -> str:
+        # Drop the padding added after the end of the shorter sequences of a batch
+        output_ids = list(output_ids)
+        while len(output_ids) > 1 and output_ids[-1] == self.tokenizer.pad_token_id:
+            output_ids.pop()
+        return self.tokenizer.decode(output_ids)
+
+    @profiling.profiled
+    def batch_inference(self, input_texts: list[str], min_length: int, max_length: int) -> list[str]:
+        """
+        Generates text for several inputs in one padded forward pass per decoding step. Every
+        output is decoded the same way as by `inference`.
+
+        Args:
+            input_texts (list[str]): Text inputs that serve as the basis for generating output text.
+            min_length (int): Minimum length of every generated output.
+            max_length (int): Maximum length of every generated output.
+
+        Returns:
+            list[str]: The generated texts, in the order of the inputs.
+        """
+
+        # Run greedy decoding through ONNX Runtime
+        if self.backend == "onnx":
+            inputs = self.tokenizer(input_texts, return_tensors="np", padding=True)
+            outputs = self.onnx_generator.generate(
+                inputs.input_ids, inputs.attention_mask, min_length=min_length, max_length=max_length
+            )
+            return [self._decode_trimmed(output) for output in outputs.tolist()]
+
+        inputs = self.tokenizer(
+            input_texts,
+            return_tensors="pt",
+            padding=True
+        ).to("cuda" if self.device == "auto" else self.device)
+
+        with torch.no_grad():
+            outputs = self.model.generate(**inputs, min_length=min_length, max_length=max_length)
+
+        return [self._decode_trimmed(output) for output in outputs.tolist()]
@@ -0,0 +1,373 @@
+
+import functools
+import torch
+from transformers import LogitsProcessor, PreTrainedTokenizerBase, StoppingCriteria
+
+# Maximum run of whitespace accepted between JSON tokens, which stops the model from padding forever
+MAX_WHITESPACE = 32
+_WHITESPACE = " \t\n\r"
+_HEX_DIGITS = "0123456789abcdefABCDEF"
+_ESCAPES = '"\\/bfnrtu'
+
+# Number of best scored tokens checked before falling back to a scan of the whole vocabulary
+SCAN_SIZE = 1024
+
+# Parser steps kept in memory, far more than the distinct (state, character) pairs of one output
+STEP_CACHE_SIZE = 1 << 16
+
+# Grammar symbols. The parser state is a stack of symbols, with the next expected symbol last.
+_WS = ("ws", 0)
+_STRING = ("str", "open")
+_NUMBER = ("num", "start")
+_ENTITY = ("entity",)
+_ENTITY_ARRAY = ("array", _ENTITY)
+
+
+def _literal(text: str) -> tuple:
+    return "lit", text, 0
+
+
+def _sequence(*symbols: tuple) -> tuple:
+    # Stack order: the first symbol to match is the last element
+    return tuple(reversed(symbols))
+
+
+# {"Name": "...", "Confidence": 0.9}
+_ENTITY_BODY = _sequence(
+    _literal("{"), _WS, _literal('"Name"'), _WS, _literal(":"), _WS, _STRING, _WS, _literal(","),
+    _WS, _literal('"Confidence"'), _WS, _literal(":"), _WS, _NUMBER, _WS, _literal("}")
+)
+
+# {"SUMMARY": "...", "PERSONS": [...], "ORGANIZATION": [...], "LOCATION": [...]}
+_ROOT = _sequence(
+    _WS, _literal("{"), _WS,
+    _literal('"SUMMARY"'), _WS, _literal(":"), _WS, _STRING, _WS, _literal(","), _WS,
+    _literal('"PERSONS"'), _WS, _literal(":"), _WS, _ENTITY_ARRAY, _WS, _literal(","), _WS,
+    _literal('"ORGANIZATION"'), _WS, _literal(":"), _WS, _ENTITY_ARRAY, _WS, _literal(","), _WS,
+    _literal('"LOCATION"'), _WS, _literal(":"), _WS, _ENTITY_ARRAY, _WS, _literal("}")
+)
+
+# Number parser: accepted characters per phase, and the phases where the number may end
+_NUMBER_TRANSITIONS = {
+    "start": {"-": "sign", "0": "zero", **{d: "int" for d in "123456789"}},
+    "sign": {"0": "zero", **{d: "int" for d in "123456789"}},
+    "zero": {".": "dot", "e": "exp", "E": "exp"},
+    "int": {**{d: "int" for d in "0123456789"}, ".": "dot", "e": "exp", "E": "exp"},
+    "dot": {d: "frac" for d in "0123456789"},
+    "frac": {**{d: "frac" for d in "0123456789"}, "e": "exp", "E": "exp"},
+    "exp": {"+": "exp_sign", "-": "exp_sign", **{d: "exp_int" for d in "0123456789"}},
+    "exp_sign": {d: "exp_int" for d in "0123456789"},
+    "exp_int": {d: "exp_int" for d in "0123456789"}
+}
+_NUMBER_ENDS = {"zero", "int", "frac", "exp_int"}
+
+# Shortest text closing an entity. Every closing text is ASCII, so it takes at most one token per character
+_ENTITY_COMPLETION = '{"Name":"","Confidence":0}'
+
+
+@functools.lru_cache(maxsize=STEP_CACHE_SIZE)
+def step(stack: tuple, char: str) -> tuple | None:
+    """
+    Advances the parser of the Phi4 output schema by one character. The schema is the JSON object
+    requested by the Phi4 speech prompt: a SUMMARY string followed by PERSONS, ORGANIZATION and
+    LOCATION lists of {"Name": string, "Confidence": number} objects, in that order.
+
+    Args:
+        stack: The parser state, as returned by a previous call or `initial_state`.
+        char: The next character of the output.
+
+    Returns:
+        tuple | None: The new parser state, or None if the character cannot continue a valid output.
+            An empty tuple means that the root object is complete.
+    """
+
+    if not stack:
+        return None
+
+    rest, symbol = stack[:-1], stack[-1]
+    kind = symbol[0]
+
+    if kind == "lit":
+        _, text, idx = symbol
+        if char != text[idx]:
+            return None
+        return rest if idx + 1 == len(text) else (*rest, ("lit", text, idx + 1))
+
+    if kind == "ws":
+        if char in _WHITESPACE:
+            return (*rest, ("ws", symbol[1] + 1)) if symbol[1] < MAX_WHITESPACE else None
+        return step(rest, char)
+
+    if kind == "str":
+        phase = symbol[1]
+        if phase == "open":
+            return (*rest, ("str", "body")) if char == '"' else None
+        if phase == "body":
+            if char == '"':
+                return rest
+            if char == "\\":
+                return (*rest, ("str", "escape"))
+            return stack if ord(char) >= 0x20 else None
+        if phase == "escape":
+            if char not in _ESCAPES:
+                return None
+            return (*rest, ("str", 4)) if char == "u" else (*rest, ("str", "body"))
+
+        # Remaining hexadecimal digits of a \u escape
+        if char not in _HEX_DIGITS:
+            return None
+        return (*rest, ("str", "body")) if phase == 1 else (*rest, ("str", phase - 1))
+
+    if kind == "num":
+        phase = symbol[1]
+        next_phase = _NUMBER_TRANSITIONS[phase].get(char)
+        if next_phase is not None:
+            return (*rest, ("num", next_phase))
+        return step(rest, char) if phase in _NUMBER_ENDS else None
+
+    if kind == "entity":
+        return step(rest + _ENTITY_BODY, char)
+
+    if kind == "array":
+        # "[" followed by either "]" or the first item
+        return step((*rest, ("array_first", symbol[1]), _WS, _literal("[")), char)
+
+    if kind == "array_first":
+        if char == "]":
+            return rest
+        return step((*rest, ("array_rest", symbol[1]), _WS, symbol[1]), char)
+
+    if kind == "array_rest":
+        if char == "]":
+            return rest
+        if char == ",":
+            return (*rest, ("array_rest", symbol[1]), _WS, symbol[1], _WS)
+        return None
+
+    raise ValueError(f"Unknown grammar symbol {symbol}")
+
+
+def completion(stack: tuple) -> str:
+    """
+    Returns the shortest text that closes every open symbol of a parser state, e.g. the closing
+    quote of the current string followed by empty entity lists and the closing brace.
+
+    Args:
+        stack: The parser state.
+
+    Returns:
+        str: The closing text, empty if the root object is complete.
+    """
+
+    pieces = []
+    for symbol in reversed(stack):
+        kind = symbol[0]
+        if kind == "lit":
+            pieces.append(symbol[1][symbol[2]:])
+        elif kind == "str":
+            phase = symbol[1]
+            if phase == "open":
+                pieces.append('""')
+            elif phase == "body":
+                pieces.append('"')
+            elif phase == "escape":
+                pieces.append('n"')
+            else:
+                pieces.append("0" * phase + '"')
+        elif kind == "num":
+            if symbol[1] not in _NUMBER_ENDS:
+                pieces.append("0")
+        elif kind == "entity":
+            pieces.append(_ENTITY_COMPLETION)
+        elif kind == "array":
+            pieces.append("[]")
+        elif kind in ("array_first", "array_rest"):
+            pieces.append("]")
+    return "".join(pieces)
+
+
+def initial_state() -> tuple:
+    """
+    Returns the parser state before the first character of the output.
+    """
+
+    return _ROOT
+
+
+def advance(stack: tuple | None, text: str) -> tuple | None:
+    """
+    Advances the parser over a string, see `step`.
+
+    Args:
+        stack: The parser state, or None if the output is already invalid.
+        text: The next characters of the output.
+
+    Returns:
+        tuple | None: The new parser state, or None if the text cannot continue a valid output.
+    """
+
+    for char in text:
+        if stack is None:
+            return None
+        stack = step(stack, char)
+    return stack
+
+
+class _OutputTracker:
+    """
+    Follows the parser state of every generated sequence. Only the tokens generated since the last
+    update are decoded, together with the token before them so that the spacing of the tokenizer is
+    kept, and tokens ending with a partial multi-byte character wait for the token completing it.
+    """
+
+    def __init__(self, tokenizer: PreTrainedTokenizerBase):
+        self.tokenizer = tokenizer
+        self.prompt_length = None
+        self.generated = 0
+        self.states: list[tuple | None] = []
+        # Per sequence, the generated token index where the decoded window starts, and where its new text starts
+        self.offsets: list[tuple[int, int]] = []
+
+    def update(self, input_ids: torch.LongTensor) -> list[tuple | None]:
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[1]
+            self.states = [initial_state() for _ in range(input_ids.shape[0])]
+            self.offsets = [(0, 0) for _ in range(input_ids.shape[0])]
+
+        self.generated = input_ids.shape[1] - self.prompt_length
+        for row in range(input_ids.shape[0]):
+            prefix_offset, read_offset = self.offsets[row]
+            if read_offset == self.generated or self.states[row] is None:
+                continue
+
+            window = input_ids[row, self.prompt_length + prefix_offset:].tolist()
+            prefix_text = self.tokenizer.decode(window[: read_offset - prefix_offset], skip_special_tokens=True)
+            text = self.tokenizer.decode(window, skip_special_tokens=True)
+            if len(text) <= len(prefix_text) or text.endswith("\ufffd"):
+                continue
+
+            self.states[row] = advance(self.states[row], text[len(prefix_text):])
+            self.offsets[row] = (read_offset, self.generated)
+
+        return self.states
+
+
+class JsonSchemaLogitsProcessor(LogitsProcessor):
+    """
+    Masks the next token logits so that the Phi4 output always continues a JSON object of the
+    speech prompt schema, see `step`. Candidates are checked from the highest score down until
+    `top_candidates` valid tokens are found, which keeps the cost per step far below a scan of the
+    whole vocabulary while leaving sampling warpers (temperature, top-p) a choice of tokens.
+
+    A token is only valid if the tokens left after it can still close the object, see `completion`,
+    so the output gets closed before `max_new_tokens` instead of being cut off: once the budget runs
+    short, the current string is closed and the remaining lists are left empty. Once the root object
+    is complete, only the end of sequence tokens remain.
+    """
+
+    def __init__(
+        self, tokenizer: PreTrainedTokenizerBase, eos_token_ids: list[int], max_new_tokens: int,
+        token_strings: dict[int, str | None] | None = None, top_candidates: int = 32
+    ):
+        """
+        Args:
+            tokenizer: The tokenizer of the model.
+            eos_token_ids: The end of sequence token ids of the model.
+            max_new_tokens: The maximum number of generated tokens, within which the object is closed.
+            token_strings: A cache of the text of every token id, shared between calls.
+            top_candidates: Number of valid tokens kept per step.
+
+        Raises:
+            ValueError: If `max_new_tokens` is shorter than the shortest complete object.
+        """
+
+        # The closing text takes at most one token per character, so the shortest object always fits
+        minimum_tokens = len(completion(initial_state()))
+        if max_new_tokens < minimum_tokens:
+            raise ValueError(
+                f"Constrained decoding needs max_new_tokens of at least {minimum_tokens} to close the JSON "
+                f"object, got {max_new_tokens}."
+            )
+
+        self.tokenizer = tokenizer
+        self.eos_token_ids = eos_token_ids
+        self.max_new_tokens = max_new_tokens
+        self.token_strings = token_strings if token_strings is not None else {}
+        self.top_candidates = top_candidates
+        self.special_ids = set(tokenizer.all_special_ids)
+        self.tracker = _OutputTracker(tokenizer)
+        self._char_tokens: dict[str, int | None] = {}
+
+    def _token_string(self, token_id: int) -> str | None:
+        if token_id not in self.token_strings:
+            self.token_strings[token_id] = (
+                None if token_id in self.special_ids else self.tokenizer.decode([token_id])
+            )
+        return self.token_strings[token_id]
+
+    def _char_token(self, char: str) -> int | None:
+        # The token spelling exactly one character, if the vocabulary has one
+        if char not in self._char_tokens:
+            token_ids = self.tokenizer.encode(char, add_special_tokens=False)
+            self._char_tokens[char] = (
+                token_ids[0] if len(token_ids) == 1 and self._token_string(token_ids[0]) == char else None
+            )
+        return self._char_tokens[char]
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor) -> torch.FloatTensor:
+        states = self.tracker.update(input_ids)
+        # Tokens left after the one chosen now
+        remaining = self.max_new_tokens - self.tracker.generated - 1
+        mask = torch.full_like(scores, float("-inf"))
+
+        for row, state in enumerate(states):
+            # Finish the sequence as soon as the root object is closed, or if the output went off the schema
+            if not state:
+                mask[row, self.eos_token_ids] = 0.0
+                continue
+
+            # Scan the best scored tokens first, and the whole vocabulary only if none of them fits
+            allowed = []
+            for scan_size in dict.fromkeys((min(SCAN_SIZE, scores.shape[1]), scores.shape[1])):
+                values, indices = torch.topk(scores[row], k=scan_size)
+                for value, token_id in zip(values.tolist(), indices.tolist()):
+                    if value == float("-inf") or len(allowed) == self.top_candidates:
+                        break
+                    token_string = self._token_string(token_id)
+                    next_state = advance(state, token_string) if token_string else None
+                    if next_state is not None and len(completion(next_state)) <= remaining:
+                        allowed.append(token_id)
+                if allowed:
+                    break
+
+                # Before scanning further, try the next character of the closing text, which always
+                # fits the budget left
+                closing_text = completion(state)
+                closing_token = self._char_token(closing_text[0]) if closing_text else None
+                if closing_token is not None:
+                    allowed.append(closing_token)
+                    break
+
+            # End of sequence only as a last resort, if no token at all continues the object
+            mask[row, allowed or self.eos_token_ids] = 0.0
+
+        return scores + mask
+
+
+class JsonCompleteCriteria(StoppingCriteria):
+    """
+    Stops the generation of a sequence as soon as its root JSON object is closed, without waiting
+    for the model to produce an end of sequence token.
+    """
+
+    def __init__(self, processor: JsonSchemaLogitsProcessor):
+        """
+        Args:
+            processor: The logits processor constraining the same generation.
+        """
+
+        self.processor = processor
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        states = self.processor.tracker.update(input_ids)
+        return torch.tensor([state == () for state in states], dtype=torch.bool, device=input_ids.device)
@@ -1,6 +1,21 @@
 
-from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+import copy
+import logging
+import threading
+import torch
+from typing import Generator
+from transformers import (
+    AutoModelForCausalLM, AutoTokenizer, DynamicCache, LogitsProcessorList, StoppingCriteriaList,
+    TextIteratorStreamer
+)
 from src import global_configs as cf
+from tools.models import json_constraint
+from tools.utils import profiling, stream_utils
+
+logger = logging.getLogger(__name__)
+
+# Number of prompt prefixes whose key/value cache is kept resident per model
+PREFIX_CACHE_SIZE = 4
 
 
 class Phi4Instruct:
@@ -30,6 +45,8 @@ class Phi4Instruct:
                 handle the specified task.
         """
 
+        from transformers import pipeline
+
         self.model_name = model_name
         self.model_task = model_task
         self.token_required = token_required
@@ -47,10 +64,132 @@ class Phi4Instruct:
             token=token if token_required else None
         )
         self.pipe = pipeline(task=model_task, model=self.model, tokenizer=self.tokenizer)
+        self._prefix_cache: dict[tuple[str, str], tuple[torch.Tensor, DynamicCache]] = {}
+        self._prefix_lock = threading.Lock()
+        self._token_strings: dict[int, str | None] = {}
+
+    @staticmethod
+    def _messages(system_prompt: str | None, user_prompt: str) -> list[dict]:
+        # Create the message template for Phi4
+        if system_prompt is None:
+            system_prompt = "You are a helpful assistant for turning request into structured JSON output."
+
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+
+    def _constraint_args(self, constrained: bool, top_candidates: int, max_new_tokens: int) -> dict:
+        """
+        Creates the generation arguments that restrict the output to the JSON schema of the speech
+        prompt and stop the generation once the JSON object is closed.
+
+        Args:
+            constrained: Whether to constrain the output.
+            top_candidates: Number of valid tokens kept per step for the sampling warpers.
+            max_new_tokens: The maximum number of generated tokens, within which the JSON object is closed.
+
+        Returns:
+            dict: The logits processor and stopping criteria arguments, empty when not constrained.
+        """
+
+        if not constrained:
+            return {}
+
+        eos_token_ids = self.model.generation_config.eos_token_id
+        processor = json_constraint.JsonSchemaLogitsProcessor(
+            tokenizer=self.tokenizer,
+            eos_token_ids=eos_token_ids if isinstance(eos_token_ids, list) else [eos_token_ids],
+            max_new_tokens=max_new_tokens,
+            token_strings=self._token_strings,
+            top_candidates=top_candidates
+        )
+        return {
+            "logits_processor": LogitsProcessorList([processor]),
+            "stopping_criteria": StoppingCriteriaList([json_constraint.JsonCompleteCriteria(processor)])
+        }
+
+    def _prefix_state(self, system_prompt: str | None, prompt_prefix: str) -> tuple[torch.Tensor, DynamicCache]:
+        """
+        Returns the token ids of the templated prompt up to the end of the given user prompt prefix,
+        together with the key/value cache of those tokens. The cache is computed on the first
+        request for a prefix and kept for the following ones.
+
+        Args:
+            system_prompt: The system message content.
+            prompt_prefix: The constant beginning of the user message.
+
+        Returns:
+            tuple[torch.Tensor, DynamicCache]: The prefix token ids, shaped (1, length), and their cache.
+        """
+
+        key = (system_prompt, prompt_prefix)
+        with self._prefix_lock:
+            if key in self._prefix_cache:
+                return self._prefix_cache[key]
+
+            # Render the template around the prefix alone and cut it right after the prefix
+            rendered = self.tokenizer.apply_chat_template(
+                self._messages(system_prompt, prompt_prefix), tokenize=False, add_generation_prompt=False
+            )
+            rendered = rendered[: rendered.rindex(prompt_prefix) + len(prompt_prefix)]
+            prefix_ids = self.tokenizer(
+                rendered, add_special_tokens=False, return_tensors="pt"
+            ).input_ids.to(self.model.device)
+
+            # Run the prefill of the prefix once
+            cache = DynamicCache()
+            with torch.no_grad():
+                self.model(input_ids=prefix_ids, past_key_values=cache, use_cache=True)
+
+            if len(self._prefix_cache) >= PREFIX_CACHE_SIZE:
+                self._prefix_cache.pop(next(iter(self._prefix_cache)))
+            self._prefix_cache[key] = (prefix_ids, cache)
+
+        logger.info(f"Cached the key/value states of a {prefix_ids.shape[1]} tokens prompt prefix.")
+        return prefix_ids, cache
+
+    def _generation_inputs(self, system_prompt: str | None, user_prompt: str, prompt_prefix: str | None) -> dict:
+        """
+        Tokenizes the templated prompt and, when the user prompt starts with the given prefix,
+        attaches a copy of the cached key/value states of that prefix so that only the remaining
+        tokens go through the prefill. If the tokens of the full prompt do not start with the
+        cached prefix tokens, the cache is cropped to the tokens they share.
 
+        Args:
+            system_prompt: The system message content.
+            user_prompt: The full user message.
+            prompt_prefix: The constant beginning of the user message, or None to skip the cache.
+
+        Returns:
+            dict: The keyword arguments for `generate` describing the prompt.
+        """
+
+        input_ids = self.tokenizer.apply_chat_template(
+            self._messages(system_prompt, user_prompt), add_generation_prompt=True, return_tensors="pt"
+        ).to(self.model.device)
+        inputs = {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+        if prompt_prefix is None or not user_prompt.startswith(prompt_prefix):
+            return inputs
+
+        # Count the leading tokens shared with the cached prefix, keeping at least one token to feed
+        prefix_ids, cache = self._prefix_state(system_prompt, prompt_prefix)
+        length = min(prefix_ids.shape[1], input_ids.shape[1] - 1)
+        mismatch = (prefix_ids[0, :length] != input_ids[0, :length]).nonzero()
+        shared = int(mismatch[0, 0]) if len(mismatch) else length
+        if shared == 0:
+            return inputs
+
+        past_key_values = copy.deepcopy(cache)
+        if shared < past_key_values.get_seq_length():
+            past_key_values.crop(shared)
+        return {**inputs, "past_key_values": past_key_values}
+
+    @profiling.profiled
     def inference(
-        self, system_prompt: str | None, user_prompt: str,
-        max_new_tokens: int, temperature: float, top_p: float
+        self, system_prompt: str | None, user_prompt: str, max_new_tokens: int, temperature: float, top_p: float,
+        prompt_prefix: str | None = None, constrained: bool = False, top_candidates: int = 32
     ) -> str:
         """
         Performs inference using the provided prompts and generation arguments to produce
@@ -66,20 +205,34 @@ class Phi4Instruct:
                 in more diverse outputs.
             top_p (float): Nucleus sampling parameter which ensures only tokens with the
                 top cumulative probability mass (up to `top_p`) are used for generation.
+            prompt_prefix (str | None): The constant beginning of `user_prompt`, e.g. the
+                instructions placed before a transcript. Its key/value cache is computed once
+                and reused by every call with the same system prompt and prefix.
+            constrained (bool): Whether to restrict the output to the JSON object of the speech
+                prompt (SUMMARY, PERSONS, ORGANIZATION and LOCATION). The generation stops as soon
+                as the object is closed, and the output is plain JSON without a code fence.
+            top_candidates (int): Number of valid tokens kept per step when `constrained` is set.
 
         Returns:
             str: The generated text output from the model based on the given prompts and
                 generation parameters.
         """
 
-        # Create the message template for Phi4
-        if system_prompt is None:
-            system_prompt = "You are a helpful assistant for turning request into structured JSON output."
+        # Resume from the cached prompt prefix
+        if prompt_prefix is not None:
+            inputs = self._generation_inputs(system_prompt, user_prompt, prompt_prefix)
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    **inputs,
+                    max_new_tokens=max_new_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                    do_sample=temperature > 0,
+                    **self._constraint_args(constrained, top_candidates, max_new_tokens)
+                )
+            return self.tokenizer.decode(outputs[0, inputs["input_ids"].shape[1]:], skip_special_tokens=True)
 
-        message = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
+        message = self._messages(system_prompt, user_prompt)
 
         # Create arguments for the pipeline and run inference
         generation_args = {
@@ -87,8 +240,51 @@ class Phi4Instruct:
             "return_full_text": False,
             "temperature": temperature,
             "top_p": top_p,
-            "do_sample": True if temperature > 0 else None
+            "do_sample": True if temperature > 0 else None,
+            **self._constraint_args(constrained, top_candidates, max_new_tokens)
         }
         output = self.pipe(message, **generation_args)
 
         return output[0]['generated_text']
+
+    def stream_inference(
+        self, system_prompt: str | None, user_prompt: str, max_new_tokens: int, temperature: float, top_p: float,
+        prompt_prefix: str | None = None, constrained: bool = False, top_candidates: int = 32
+    ) -> Generator[str, None, None]:
+        """
+        Performs the same generation as `inference`, but yields the output text piece by piece
+        while the model generates it, so that the first words can be shown as soon as they exist.
+
+        Args:
+            system_prompt (str | None): Initial system message content. If None, a default
+                system message is used which describes the function of the assistant.
+            user_prompt (str): User-provided input message.
+            max_new_tokens (int): Maximum number of tokens to generate in the output.
+            temperature (float): Sampling temperature for generation. Higher values result
+                in more diverse outputs.
+            top_p (float): Nucleus sampling parameter which ensures only tokens with the
+                top cumulative probability mass (up to `top_p`) are used for generation.
+            prompt_prefix (str | None): The constant beginning of `user_prompt`, whose key/value
+                cache is reused between calls, see `inference`.
+            constrained (bool): Whether to restrict the output to the JSON object of the speech
+                prompt, see `inference`.
+            top_candidates (int): Number of valid tokens kept per step when `constrained` is set.
+
+        Yields:
+            str: The next piece of the generated text.
+        """
+
+        # Run generation in a background thread and yield the text from the streamer
+        streamer = TextIteratorStreamer(
+            self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=stream_utils.STREAM_TIMEOUT_SECONDS
+        )
+        generation_args = {
+            **self._generation_inputs(system_prompt, user_prompt, prompt_prefix),
+            "max_new_tokens": max_new_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "do_sample": temperature > 0,
+            "streamer": streamer,
+            **self._constraint_args(constrained, top_candidates, max_new_tokens)
+        }
+        yield from stream_utils.stream_generation(self.model.generate, streamer, generation_args)
@@ -0,0 +1,276 @@
+
+import gc
+import logging
+import threading
+import time
+import sys
+import psutil
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable
+from src import global_configs as cf
+from tools.utils import runtime_policy
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    model: object
+    nbytes: int
+    load_seconds: float
+
+
+def _find_modules(obj: object, depth: int = 2) -> list:
+    """
+    Finds the PyTorch modules held by a model wrapper, looking through its attributes up to the
+    given depth, e.g. `wrapper.model` or `wrapper.pipe.model`.
+    """
+
+    # No model can hold a PyTorch module before torch is imported, and the registry does not import it
+    torch = sys.modules.get("torch")
+    if torch is None:
+        return []
+    if isinstance(obj, torch.nn.Module):
+        return [obj]
+    if depth == 0 or not hasattr(obj, "__dict__"):
+        return []
+
+    modules = []
+    for value in vars(obj).values():
+        modules.extend(_find_modules(value, depth - 1))
+    return modules
+
+
+def model_nbytes(model: object) -> int:
+    """
+    Returns the memory held by the parameters and buffers of a model wrapper. Tensors shared by
+    several modules, e.g. a model referenced by both the wrapper and its pipeline, are counted once.
+
+    Args:
+        model: A model wrapper from `tools.models`, or a PyTorch module.
+
+    Returns:
+        int: The size of the tensors in bytes, 0 if the wrapper holds no PyTorch module.
+    """
+
+    seen = set()
+    total = 0
+    for module in _find_modules(model):
+        for tensor in [*module.parameters(), *module.buffers()]:
+            # Sparse tensors, e.g. the alignment heads of Whisper, have no single storage
+            if tensor.is_sparse:
+                total += tensor.values().nbytes + tensor.indices().nbytes
+                continue
+            storage = tensor.untyped_storage()
+            if storage.data_ptr() in seen:
+                continue
+            seen.add(storage.data_ptr())
+            total += storage.nbytes()
+    return total
+
+
+def _release_memory() -> None:
+    gc.collect()
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+class ModelRegistry:
+    """
+    A thread-safe store of loaded models shared by everything running in the process. Every model
+    is loaded once and kept until the memory budget is exceeded, at which point the least recently
+    used models are evicted.
+    """
+
+    def __init__(self, memory_budget_mb: float | None = None):
+        """
+        Args:
+            memory_budget_mb: The memory the resident models may use in total, in megabytes. None
+                or 0 disables eviction.
+        """
+
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 ** 2) if memory_budget_mb else None
+        self._entries: OrderedDict[tuple, _Entry] = OrderedDict()
+        self._known_sizes: dict[tuple, int] = {}
+        self._lock = threading.Lock()
+        self._key_locks: dict[tuple, threading.Lock] = {}
+        self._loading: set[tuple] = set()
+
+    @property
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.nbytes for entry in self._entries.values())
+
+    def _evict(self, incoming_bytes: int, keep: tuple) -> list[tuple]:
+        # Must be called with the registry lock held
+        if self.memory_budget_bytes is None:
+            return []
+
+        evicted = []
+        total = sum(entry.nbytes for entry in self._entries.values()) + incoming_bytes
+        for key in list(self._entries.keys()):
+            if total <= self.memory_budget_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self._entries.pop(key).nbytes
+            evicted.append(key)
+        return evicted
+
+    def _log_evictions(self, evicted: list[tuple]) -> None:
+        if not evicted:
+            return
+
+        for key in evicted:
+            logger.info(f"Evicted {key} from the model registry to stay within the memory budget.")
+        _release_memory()
+
+    def acquire(self, key: tuple, loader: Callable[[], object]) -> tuple[object, float]:
+        """
+        Returns the model stored under the given key, loading it with the loader if it is not
+        resident. Loads of different models run in parallel, while concurrent requests for the same
+        model wait for a single load.
+
+        Args:
+            key: The key identifying the model, e.g. the wrapper name, model name and device.
+            loader: A function without arguments that builds the model.
+
+        Returns:
+            tuple[object, float]: The model and the seconds spent loading it, which is 0.0 when the
+                model was already resident.
+        """
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key].model, 0.0
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    return self._entries[key].model, 0.0
+
+                # Make room up front when the size of the model is known from an earlier load
+                evicted = self._evict(self._known_sizes.get(key, 0), keep=key)
+            self._log_evictions(evicted)
+
+            # Size the thread pools of the process before its first model starts them
+            runtime_policy.configure_torch()
+
+            process = psutil.Process()
+            rss_before = process.memory_info().rss
+            start = time.perf_counter()
+            with self._lock:
+                self._loading.add(key)
+            try:
+                model = loader()
+            finally:
+                with self._lock:
+                    self._loading.discard(key)
+            load_seconds = time.perf_counter() - start
+
+            # Models without PyTorch tensors, e.g. ONNX Runtime sessions, are sized by the growth of the process
+            nbytes = model_nbytes(model) or max(process.memory_info().rss - rss_before, 0)
+
+            with self._lock:
+                self._entries[key] = _Entry(model=model, nbytes=nbytes, load_seconds=load_seconds)
+                self._known_sizes[key] = nbytes
+                evicted = self._evict(0, keep=key)
+            self._log_evictions(evicted)
+
+        logger.info(f"Loaded {key} in {load_seconds:.2f} seconds using {nbytes / 1024 ** 2:.1f} MB.")
+        return model, load_seconds
+
+    def get(self, key: tuple, loader: Callable[[], object]) -> object:
+        """
+        Returns the model stored under the given key, loading it if it is not resident.
+
+        Args:
+            key: The key identifying the model.
+            loader: A function without arguments that builds the model.
+
+        Returns:
+            object: The model.
+        """
+
+        return self.acquire(key, loader)[0]
+
+    def state(self, key: tuple) -> str:
+        """
+        Returns the loading state of a model.
+
+        Args:
+            key: The key identifying the model.
+
+        Returns:
+            str: "ready" if the model is resident, "loading" while it is being loaded, "absent" otherwise.
+        """
+
+        with self._lock:
+            if key in self._entries:
+                return "ready"
+            return "loading" if key in self._loading else "absent"
+
+    def warm_up(self, models: list[tuple[tuple, Callable[[], object]]]) -> threading.Thread:
+        """
+        Loads models one after the other in a background daemon thread. Requests for a model that
+        is still loading wait for the warm-up load instead of starting a second one.
+
+        Args:
+            models: The key and loader of every model to load.
+
+        Returns:
+            threading.Thread: The started warm-up thread.
+        """
+
+        def run():
+            for key, loader in models:
+                try:
+                    self.acquire(key, loader)
+                except Exception:
+                    logger.exception(f"Warm-up of {key} failed, it will be loaded on first use.")
+
+        thread = threading.Thread(target=run, name="model-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def release(self, key: tuple) -> None:
+        """
+        Drops a model from the registry so that its memory can be reclaimed once no caller uses it.
+
+        Args:
+            key: The key identifying the model.
+        """
+
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+        if entry is not None:
+            logger.info(f"Released {key} from the model registry.")
+            _release_memory()
+
+    def status(self) -> list[dict]:
+        """
+        Describes the resident models, from the least to the most recently used.
+
+        Returns:
+            list[dict]: One dictionary per model with the "key", "megabytes" and "load_seconds" keys.
+        """
+
+        with self._lock:
+            return [
+                {
+                    "key": key,
+                    "megabytes": round(entry.nbytes / 1024 ** 2, 1),
+                    "load_seconds": round(entry.load_seconds, 3)
+                }
+                for key, entry in self._entries.items()
+            ]
+
+
+# Registry shared by the Dagster resources and every Streamlit session of the process
+MODEL_REGISTRY = ModelRegistry(memory_budget_mb=cf.MODELS_CONFIG["Model_Registry"]["Memory_Budget_MB"])
@@ -0,0 +1,459 @@
+
+import copy
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+import onnxruntime as ort
+import torch
+from pathlib import Path
+from typing import Callable, Generator
+
+logger = logging.getLogger(__name__)
+
+ONNX_OPSET = 17
+
+# Written last into an export folder, its presence marks the export as complete
+EXPORT_INFO_FILE = "export_info.json"
+
+
+def model_cache_dir(cache_root: str | Path, model_name: str, max_length: int | None = None) -> Path:
+    """
+    Returns the folder holding the exported graphs of a model inside the ONNX cache.
+
+    Args:
+        cache_root: The root folder of the ONNX cache.
+        model_name: The name or path of the exported model.
+        max_length: The maximum sequence length saved with the export, if the model keeps one,
+            so that exports with different lengths get different folders.
+
+    Returns:
+        Path: The folder of the model, named after the model with path separators replaced.
+    """
+
+    folder = model_name.strip("/").replace("/", "__")
+    if max_length is not None:
+        folder = f"{folder}__max_length-{max_length}"
+    return Path(cache_root).joinpath(folder).resolve()
+
+
+def _publish_export(cache_dir: Path, export: Callable[[Path], None]) -> None:
+    """
+    Runs an export into a temporary folder next to the cache folder, then moves the finished folder
+    into place with a single rename. A crashed export therefore never leaves a partial graph in
+    the cache, and when several processes export the same model at once, the first one to finish
+    wins and the others discard their copy.
+
+    Args:
+        cache_dir: The folder of the model inside the ONNX cache.
+        export: A function writing the export into the folder it is given, `EXPORT_INFO_FILE` last.
+    """
+
+    cache_dir.parent.mkdir(parents=True, exist_ok=True)
+    export_dir = Path(tempfile.mkdtemp(dir=cache_dir.parent, prefix=f".{cache_dir.name}."))
+    try:
+        export(export_dir)
+
+        # A folder without the info file is left by an interrupted export of an older version
+        if cache_dir.exists() and not cache_dir.joinpath(EXPORT_INFO_FILE).exists():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        try:
+            os.replace(export_dir, cache_dir)
+        except OSError:
+            if not cache_dir.joinpath(EXPORT_INFO_FILE).exists():
+                raise
+            logger.info(f"{cache_dir} was exported by another process first.")
+    finally:
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+def session_options(intra_op_threads: int = 0) -> ort.SessionOptions:
+    """
+    Creates ONNX Runtime session options with all graph optimizations enabled.
+
+    Args:
+        intra_op_threads: Number of threads used inside an operator. 0 lets ONNX Runtime decide.
+
+    Returns:
+        ort.SessionOptions: The session options.
+    """
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.intra_op_num_threads = intra_op_threads
+    return options
+
+
+class _EncoderExport(torch.nn.Module):
+
+    def __init__(self, model):
+        super().__init__()
+        self.encoder = model.get_encoder()
+
+    def forward(self, input_ids, attention_mask):
+        return self.encoder(input_ids=input_ids, attention_mask=attention_mask, return_dict=True).last_hidden_state
+
+
+class _DecoderExport(torch.nn.Module):
+
+    def __init__(self, model, num_layers: int, with_past: bool):
+        super().__init__()
+        self.model = model
+        self.num_layers = num_layers
+        self.with_past = with_past
+
+    def forward(self, decoder_input_ids, encoder_hidden_states, encoder_attention_mask, *past_flat):
+        # Rebuild the legacy cache layout: (self key, self value, cross key, cross value) per layer
+        past = None
+        if self.with_past:
+            past = tuple(tuple(past_flat[i * 4: (i + 1) * 4]) for i in range(self.num_layers))
+
+        outputs = self.model(
+            encoder_outputs=(encoder_hidden_states,),
+            attention_mask=encoder_attention_mask,
+            decoder_input_ids=decoder_input_ids,
+            past_key_values=past,
+            use_cache=True,
+            return_dict=True
+        )
+        present = outputs.past_key_values
+        if hasattr(present, "to_legacy_cache"):
+            present = present.to_legacy_cache()
+
+        return outputs.logits, *[tensor for layer in present for tensor in layer]
+
+
+class OnnxSeq2SeqGenerator:
+
+    def __init__(self, cache_dir: str | Path, model_loader: Callable[[], torch.nn.Module], intra_op_threads: int = 0):
+        """
+        Runs greedy generation of an encoder-decoder model (T5, BART) through ONNX Runtime. The model
+        is exported once into three graphs, the encoder, the first decoder step, and the decoder
+        step that reuses the key/value cache of the previous steps. The graphs are cached on disk,
+        so later instances load them without touching the PyTorch weights.
+
+        Args:
+            cache_dir: The folder holding the exported graphs of this model.
+            model_loader: A function returning the PyTorch model. It is only called when the graphs
+                have not been exported yet.
+            intra_op_threads: Number of threads used inside an operator. 0 lets ONNX Runtime decide.
+
+        Attributes:
+            cache_dir: The folder holding the exported graphs.
+            info: The generation settings and graph input names saved with the export.
+            encoder: The ONNX Runtime session of the encoder.
+            decoder: The ONNX Runtime session of the first decoder step.
+            decoder_with_past: The ONNX Runtime session of the following decoder steps.
+        """
+
+        self.cache_dir = Path(cache_dir)
+        info_file = self.cache_dir.joinpath(EXPORT_INFO_FILE)
+        if not info_file.exists():
+            model = model_loader()
+            _publish_export(self.cache_dir, lambda export_dir: self._export(model, export_dir))
+
+        with open(info_file, "r", encoding="utf-8") as f:
+            self.info = json.load(f)
+
+        options = session_options(intra_op_threads)
+        providers = ["CPUExecutionProvider"]
+        self.encoder = ort.InferenceSession(self.cache_dir.joinpath("encoder.onnx"), options, providers=providers)
+        self.decoder = ort.InferenceSession(self.cache_dir.joinpath("decoder.onnx"), options, providers=providers)
+        self.decoder_with_past = ort.InferenceSession(
+            self.cache_dir.joinpath("decoder_with_past.onnx"), options, providers=providers
+        )
+
+    def _export(self, model: torch.nn.Module, export_dir: Path) -> None:
+        """
+        Exports the encoder and both decoder graphs of the model, then writes the generation settings
+        next to them. The info file is written last and marks the export as complete.
+
+        Args:
+            model: The PyTorch encoder-decoder model.
+            export_dir: The folder the graphs are written to.
+        """
+
+        logger.info(f"Exporting {model.name_or_path} to ONNX for {self.cache_dir}.")
+
+        # Export in full precision, without touching the model shared with the caller. The export wrappers
+        # are put in evaluation mode, as the exporter restores their mode on the wrapped model afterwards
+        if next(model.parameters()).dtype != torch.float32:
+            model = copy.deepcopy(model).float()
+        model = model.to("cpu").eval()
+        generation_config = model.generation_config
+
+        eos_token_id = generation_config.eos_token_id
+        eos_token_id = eos_token_id[0] if isinstance(eos_token_id, list) else eos_token_id
+        pad_token_id = generation_config.pad_token_id if generation_config.pad_token_id is not None else eos_token_id
+        decoder_start_token_id = generation_config.decoder_start_token_id
+        if decoder_start_token_id is None:
+            decoder_start_token_id = model.config.decoder_start_token_id
+
+        # Trace the graphs with sample inputs, all sequence dimensions are exported as dynamic
+        input_ids = torch.full((1, 8), 4, dtype=torch.long)
+        attention_mask = torch.ones_like(input_ids)
+        decoder_input_ids = torch.full((1, 1), decoder_start_token_id, dtype=torch.long)
+
+        with torch.no_grad():
+            encoder = _EncoderExport(model).eval()
+            encoder_hidden_states = encoder(input_ids, attention_mask)
+            torch.onnx.export(
+                encoder, (input_ids, attention_mask), export_dir.joinpath("encoder.onnx"),
+                input_names=["input_ids", "attention_mask"],
+                output_names=["encoder_hidden_states"],
+                dynamic_axes={
+                    "input_ids": {0: "batch", 1: "encoder_sequence"},
+                    "attention_mask": {0: "batch", 1: "encoder_sequence"},
+                    "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"}
+                },
+                opset_version=ONNX_OPSET
+            )
+
+            # Run the first step once to learn the number of decoder layers
+            first_step = model(
+                encoder_outputs=(encoder_hidden_states,), attention_mask=attention_mask,
+                decoder_input_ids=decoder_input_ids, use_cache=True, return_dict=True
+            )
+            num_layers = len(first_step.past_key_values)
+            kinds = ["self_key", "self_value", "cross_key", "cross_value"]
+            past_names = [f"past_{i}_{kind}" for i in range(num_layers) for kind in kinds]
+            present_names = [f"present_{i}_{kind}" for i in range(num_layers) for kind in kinds]
+            common_axes = {
+                "decoder_input_ids": {0: "batch", 1: "decoder_sequence"},
+                "encoder_hidden_states": {0: "batch", 1: "encoder_sequence"},
+                "encoder_attention_mask": {0: "batch", 1: "encoder_sequence"},
+                "logits": {0: "batch", 1: "decoder_sequence"}
+            }
+            present_axes = {
+                name: {0: "batch", 2: "encoder_sequence" if "cross" in name else "total_decoder_sequence"}
+                for name in present_names
+            }
+            past_axes = {
+                name: {0: "batch", 2: "encoder_sequence" if "cross" in name else "past_decoder_sequence"}
+                for name in past_names
+            }
+
+            decoder = _DecoderExport(model, num_layers, with_past=False).eval()
+            torch.onnx.export(
+                decoder, (decoder_input_ids, encoder_hidden_states, attention_mask),
+                export_dir.joinpath("decoder.onnx"),
+                input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask"],
+                output_names=["logits", *present_names],
+                dynamic_axes={**common_axes, **present_axes},
+                opset_version=ONNX_OPSET
+            )
+
+            past_flat = decoder(decoder_input_ids, encoder_hidden_states, attention_mask)[1:]
+            decoder_with_past = _DecoderExport(model, num_layers, with_past=True).eval()
+            torch.onnx.export(
+                decoder_with_past, (decoder_input_ids, encoder_hidden_states, attention_mask, *past_flat),
+                export_dir.joinpath("decoder_with_past.onnx"),
+                input_names=["decoder_input_ids", "encoder_hidden_states", "encoder_attention_mask", *past_names],
+                output_names=["logits", *present_names],
+                dynamic_axes={**common_axes, **past_axes, **present_axes},
+                opset_version=ONNX_OPSET
+            )
+
+        info = {
+            "model_name": model.name_or_path,
+            "past_names": past_names,
+            "decoder_start_token_id": decoder_start_token_id,
+            "eos_token_id": eos_token_id,
+            "pad_token_id": pad_token_id,
+            "forced_bos_token_id": generation_config.forced_bos_token_id,
+            "forced_eos_token_id": generation_config.forced_eos_token_id,
+            "no_repeat_ngram_size": generation_config.no_repeat_ngram_size or 0
+        }
+        with open(export_dir.joinpath(EXPORT_INFO_FILE), "w", encoding="utf-8") as f:
+            json.dump(info, f, indent=2)
+
+    @staticmethod
+    def _run(session: ort.InferenceSession, feed: dict) -> list[np.ndarray]:
+        # Inputs unused by the traced graph (e.g. encoder states once cross attention is cached) are dropped on export
+        names = {x.name for x in session.get_inputs()}
+        return session.run(None, {k: v for k, v in feed.items() if k in names})
+
+    def _process_logits(self, sequences: np.ndarray, logits: np.ndarray, min_length: int, max_length: int) -> np.ndarray:
+        """
+        Applies the generation constraints of the model to the next token logits, in the same way
+        as the Hugging Face logits processors of greedy search.
+
+        Args:
+            sequences: The decoder token ids generated so far, shaped (batch, length).
+            logits: The logits of the next token, shaped (batch, vocabulary).
+            min_length: Minimum length of the generated sequences.
+            max_length: Maximum length of the generated sequences.
+
+        Returns:
+            np.ndarray: The processed logits.
+        """
+
+        cur_len = sequences.shape[1]
+        ngram_size = self.info["no_repeat_ngram_size"]
+
+        # Ban tokens that would repeat an n-gram already generated
+        if ngram_size and cur_len + 1 >= ngram_size:
+            for row, tokens in enumerate(sequences.tolist()):
+                prefix = tuple(tokens[cur_len + 1 - ngram_size:])
+                for i in range(cur_len + 1 - ngram_size):
+                    if tuple(tokens[i: i + ngram_size - 1]) == prefix:
+                        logits[row, tokens[i + ngram_size - 1]] = -np.inf
+
+        # Prevent the end of sequence before the minimum length
+        if cur_len < min_length:
+            logits[:, self.info["eos_token_id"]] = -np.inf
+
+        # Force the first and last tokens if the model requires them
+        forced_token = None
+        if cur_len == 1 and self.info["forced_bos_token_id"] is not None:
+            forced_token = self.info["forced_bos_token_id"]
+        elif cur_len == max_length - 1 and self.info["forced_eos_token_id"] is not None:
+            forced_token = self.info["forced_eos_token_id"]
+
+        if forced_token is not None:
+            logits[:, :] = -np.inf
+            logits[:, forced_token] = 0.0
+
+        return logits
+
+    def stream(
+        self, input_ids: np.ndarray, attention_mask: np.ndarray, min_length: int, max_length: int
+    ) -> Generator[np.ndarray, None, None]:
+        """
+        Generates output token ids with greedy decoding, yielding the sequences after every decoder
+        step. The encoder runs once, and each decoder step only feeds the last token together with
+        the key/value cache returned by the previous step.
+
+        Args:
+            input_ids: The encoder token ids, shaped (batch, length).
+            attention_mask: The encoder attention mask, shaped (batch, length).
+            min_length: Minimum length of the generated sequences, including the start token.
+            max_length: Maximum length of the generated sequences, including the start token.
+
+        Yields:
+            np.ndarray: The token ids generated so far, shaped (batch, length), starting with the
+                decoder start token and padded after the end of sequence token.
+        """
+
+        input_ids = input_ids.astype(np.int64)
+        attention_mask = attention_mask.astype(np.int64)
+        batch_size = input_ids.shape[0]
+
+        encoder_hidden_states = self._run(self.encoder, {"input_ids": input_ids, "attention_mask": attention_mask})[0]
+        sequences = np.full((batch_size, 1), self.info["decoder_start_token_id"], dtype=np.int64)
+        finished = np.zeros(batch_size, dtype=bool)
+        feed = {
+            "decoder_input_ids": sequences,
+            "encoder_hidden_states": encoder_hidden_states,
+            "encoder_attention_mask": attention_mask
+        }
+        outputs = self._run(self.decoder, feed)
+
+        while True:
+            logits = self._process_logits(sequences, outputs[0][:, -1, :].astype(np.float32), min_length, max_length)
+            next_tokens = np.where(finished, self.info["pad_token_id"], logits.argmax(axis=-1))
+            sequences = np.concatenate([sequences, next_tokens[:, None]], axis=1)
+            finished |= next_tokens == self.info["eos_token_id"]
+            yield sequences
+            if finished.all() or sequences.shape[1] >= max_length:
+                break
+
+            feed["decoder_input_ids"] = next_tokens[:, None]
+            feed.update(zip(self.info["past_names"], outputs[1:]))
+            outputs = self._run(self.decoder_with_past, feed)
+
+    def generate(self, input_ids: np.ndarray, attention_mask: np.ndarray, min_length: int, max_length: int) -> np.ndarray:
+        """
+        Generates output token ids with greedy decoding, see `stream`.
+
+        Args:
+            input_ids: The encoder token ids, shaped (batch, length).
+            attention_mask: The encoder attention mask, shaped (batch, length).
+            min_length: Minimum length of the generated sequences, including the start token.
+            max_length: Maximum length of the generated sequences, including the start token.
+
+        Returns:
+            np.ndarray: The generated token ids, shaped (batch, length), starting with the decoder
+                start token and padded after the end of sequence token.
+        """
+
+        sequences = None
+        for sequences in self.stream(input_ids, attention_mask, min_length, max_length):
+            pass
+        return sequences
+
+
+def _export_gliner(model, export_dir: Path) -> None:
+    """
+    Saves a GLiNER model together with its tokenizer and exports its span model to `model.onnx`,
+    then writes the export info file that marks the export as complete.
+
+    Args:
+        model: The PyTorch GLiNER model.
+        export_dir: The folder the model is written to.
+    """
+
+    model.save_pretrained(export_dir)
+
+    # Trace the span model with sample inputs, all batch, sequence, and span dimensions are dynamic
+    model_input, _ = model.prepare_model_inputs(["Mary went to London with John ."], ["person", "location"])
+    input_names = ["input_ids", "attention_mask", "words_mask", "text_lengths"]
+    dynamic_axes = {
+        "input_ids": {0: "batch", 1: "sequence"},
+        "attention_mask": {0: "batch", 1: "sequence"},
+        "words_mask": {0: "batch", 1: "sequence"},
+        "text_lengths": {0: "batch", 1: "value"},
+        "logits": {0: "position", 1: "batch", 2: "sequence", 3: "num_classes"}
+    }
+    if model.config.span_mode != "token_level":
+        input_names += ["span_idx", "span_mask"]
+        dynamic_axes.update({"span_idx": {0: "batch", 1: "num_spans", 2: "idx"}, "span_mask": {0: "batch", 1: "num_spans"}})
+
+    with torch.no_grad():
+        torch.onnx.export(
+            model.model.to("cpu"), (), export_dir.joinpath("model.onnx"),
+            kwargs={name: model_input[name].to("cpu") for name in input_names},
+            input_names=input_names,
+            output_names=["logits"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET
+        )
+
+    with open(export_dir.joinpath(EXPORT_INFO_FILE), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model.config.model_name, "max_length": model.config.max_len}, f, indent=2)
+
+
+def load_gliner_onnx(cache_dir: str | Path, model_loader: Callable[[], object], intra_op_threads: int = 0):
+    """
+    Loads a GLiNER model running on ONNX Runtime. On the first call the PyTorch model is saved
+    together with its tokenizer into the cache folder and its span model is exported to
+    `model.onnx`. Later calls load the cached graph without touching the PyTorch weights.
+
+    Args:
+        cache_dir: The folder holding the exported GLiNER model, see `model_cache_dir`. It is keyed
+            by the maximum length as well, since the saved configuration keeps the length of the export.
+        model_loader: A function returning the PyTorch GLiNER model. It is only called when the
+            graph has not been exported yet.
+        intra_op_threads: Number of threads used inside an operator. 0 lets ONNX Runtime decide.
+
+    Returns:
+        GLiNER: A GLiNER model whose forward pass runs through ONNX Runtime.
+    """
+
+    from gliner import GLiNER
+
+    cache_dir = Path(cache_dir)
+    if not cache_dir.joinpath(EXPORT_INFO_FILE).exists():
+        model = model_loader()
+        logger.info(f"Exporting GLiNER to ONNX for {cache_dir}.")
+        _publish_export(cache_dir, lambda export_dir: _export_gliner(model, export_dir))
+
+    return GLiNER.from_pretrained(
+        str(cache_dir),
+        load_tokenizer=True,
+        load_onnx_model=True,
+        onnx_model_file="model.onnx",
+        session_options=session_options(intra_op_threads)
+    )
@@ -1,5 +1,8 @@
 
-from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
+import numpy as np
+import torch
+from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor
+from tools.utils import profiling
 
 
 class WhisperAI:
@@ -20,6 +23,8 @@ class WhisperAI:
             pipe: The inference pipeline configured for the specified task using the model and processor.
         """
 
+        from transformers import pipeline
+
         self.model_name = model_name
         self.token_required = token_required
         self.token = token
@@ -44,16 +49,24 @@ class WhisperAI:
             device_map=device,
         )
 
-    def inference(self, audio_files: list[str], max_new_tokens: int, language: str) -> list[dict]:
+    @profiling.profiled
+    def inference(
+        self, audio_files: list[str | np.ndarray], max_new_tokens: int, language: str, sampling_rate: int = 16000,
+        return_timestamps: bool = False
+    ) -> list[dict]:
         """
         Performs inference on a list of audio files using a pre-configured pipeline, generating text
         outputs for each audio file provided. This method processes the audio files in batches and
         adjusts the generation parameters such as language and maximum new tokens.
 
         Args:
-            audio_files (list[str]): List of paths to the audio files to process.
+            audio_files (list[str | np.ndarray]): List of paths to the audio files to process, or of
+                mono float32 waveforms already decoded in memory.
             max_new_tokens (int): The maximum number of new tokens to generate during inference.
             language (str): The language for the inference process.
+            sampling_rate (int): The sampling rate of the waveforms given in `audio_files`.
+            return_timestamps (bool): Whether to also predict the segments of every transcript,
+                returned under "chunks" with their "timestamp" (start, end) in seconds and "text".
 
         Returns:
             list[dict]: A list of generated text outputs corresponding to each audio file.
@@ -62,11 +75,39 @@ class WhisperAI:
         # Get the length of the list of audio files
         batch_size = len(audio_files)
 
+        # Pass waveforms with their sampling rate so that the pipeline can resample them if needed
+        inputs = [
+            {"raw": audio, "sampling_rate": sampling_rate} if isinstance(audio, np.ndarray) else audio
+            for audio in audio_files
+        ]
+
         # Run inference and get results
         result = self.pipe(
-            audio_files,
+            inputs,
             generate_kwargs={"language": language, "max_new_tokens": max_new_tokens},
             batch_size=batch_size,
-            chunk_length_s=30
+            chunk_length_s=30,
+            **({"return_timestamps": True} if return_timestamps else {})
         )
         return result
+
+    @profiling.profiled
+    def inference_features(self, features: np.ndarray, max_new_tokens: int, language: str) -> list[dict]:
+        """
+        Transcribes log-mel features computed beforehand with the feature extractor of this model,
+        e.g. read from a `FeatureStore`, skipping the audio decoding and the STFT. Every item covers
+        a single 30 seconds window, longer audio is transcribed in chunks by `inference`.
+
+        Args:
+            features (np.ndarray): The features, shaped (batch, mel bins, frames).
+            max_new_tokens (int): The maximum number of new tokens to generate during inference.
+            language (str): The language for the inference process.
+
+        Returns:
+            list[dict]: The generated text of every item under "text", as returned by `inference`.
+        """
+
+        input_features = torch.from_numpy(features).to(device=self.model.device, dtype=self.model.dtype)
+        with torch.inference_mode():
+            tokens = self.model.generate(input_features=input_features, language=language, max_new_tokens=max_new_tokens)
+        return [{"text": text} for text in self.processor.batch_decode(tokens, skip_special_tokens=True)]
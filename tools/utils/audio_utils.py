@@ -0,0 +1,90 @@
+
+import io
+import subprocess
+import numpy as np
+import soundfile as sf
+from pathlib import Path
+from typing import BinaryIO
+
+# Sampling rate expected by the speech recognition models
+SAMPLING_RATE = 16000
+
+
+def read_bytes(source: bytes | str | Path | BinaryIO) -> bytes:
+    """
+    Returns the raw bytes of an audio source.
+
+    Args:
+        source: The encoded audio as bytes, a file path, or a file-like object such as a Streamlit
+            `UploadedFile`.
+
+    Returns:
+        bytes: The encoded audio.
+    """
+
+    if isinstance(source, bytes):
+        return source
+    if isinstance(source, (str, Path)):
+        return Path(source).read_bytes()
+
+    # Streamlit uploads expose the whole content through getvalue, regardless of the read position
+    if hasattr(source, "getvalue"):
+        return source.getvalue()
+    return source.read()
+
+
+def _decode_ffmpeg(data: bytes, sampling_rate: int, channels: int) -> np.ndarray:
+    # Let ffmpeg decode, mix and resample in one pass, reading from and writing to pipes
+    cmd = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", str(channels), "-ar", str(sampling_rate), "pipe:1"
+    ]
+    result = subprocess.run(cmd, input=data, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels).T.copy()
+
+
+def decode_audio(
+    source: bytes | str | Path | BinaryIO, sampling_rate: int = SAMPLING_RATE, mono: bool = True
+) -> np.ndarray:
+    """
+    Decodes encoded audio (wav, flac, mp3, ogg) into a float32 waveform in memory, without
+    writing it to disk. libsndfile is tried first, and ffmpeg is used for formats it cannot read.
+
+    Args:
+        source: The encoded audio as bytes, a file path, or a file-like object such as a Streamlit
+            `UploadedFile`.
+        sampling_rate: The sampling rate of the returned waveform. Defaults to 16 kHz.
+        mono: Whether to down-mix the channels. Otherwise the audio is returned in stereo, with
+            mono sources duplicated on both channels. Defaults to True.
+
+    Returns:
+        np.ndarray: The waveform, shaped (samples,) in mono or (2, samples) in stereo, with values in [-1, 1].
+    """
+
+    data = read_bytes(source)
+    channels = 1 if mono else 2
+
+    try:
+        waveform, source_rate = sf.read(io.BytesIO(data), dtype="float32", always_2d=True)
+    except sf.LibsndfileError:
+        waveform = _decode_ffmpeg(data, sampling_rate, channels)
+        return waveform[0] if mono else waveform
+
+    # Mix to the requested number of channels and resample when needed
+    waveform = waveform.T
+    if mono:
+        waveform = waveform.mean(axis=0)
+    elif waveform.shape[0] == 1:
+        waveform = np.repeat(waveform, 2, axis=0)
+    else:
+        waveform = waveform[:2]
+
+    if source_rate != sampling_rate:
+        import torch
+        import torchaudio
+
+        waveform = torchaudio.functional.resample(
+            torch.from_numpy(np.ascontiguousarray(waveform)), orig_freq=source_rate, new_freq=sampling_rate
+        ).numpy()
+
+    return np.ascontiguousarray(waveform, dtype=np.float32)
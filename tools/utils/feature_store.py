@@ -0,0 +1,300 @@
+
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+import numpy as np
+from pathlib import Path
+from typing import Iterator
+
+# File locks only exist on POSIX systems, elsewhere only the threads of one process are serialized
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Files of a store: the index of the items, the lock taken by the writers, and the first array of
+# their frames. Compaction writes the frames to a new array file named in the index.
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+FEATURES_FILE = "features.bin"
+
+
+def extractor_config(feature_extractor) -> dict:
+    """
+    Returns the settings of a feature extractor that determine its features, e.g. the number of
+    mel bins, the hop length and the window, leaving out the arrays derived from them.
+
+    Args:
+        feature_extractor: The feature extractor of a Whisper model, e.g. `processor.feature_extractor`.
+
+    Returns:
+        dict: The scalar settings, sorted by name.
+    """
+
+    return {
+        name: value for name, value in sorted(feature_extractor.to_dict().items())
+        if isinstance(value, (bool, int, float, str))
+    }
+
+
+def featurize(feature_extractor, waveforms: list[np.ndarray], sampling_rate: int) -> tuple[np.ndarray, list[int]]:
+    """
+    Computes the log-mel spectrograms of a batch of waveforms with one call of the feature
+    extractor, which pads them to its 30 seconds window and runs the STFT of the whole batch at
+    once, with PyTorch when it is installed.
+
+    Args:
+        feature_extractor: The feature extractor of the Whisper model.
+        waveforms: Mono float32 waveforms, of at most 30 seconds each.
+        sampling_rate: The sampling rate of the waveforms.
+
+    Returns:
+        tuple[np.ndarray, list[int]]: The features, shaped (batch, mel bins, frames), and the number
+            of leading frames of every item that hold audio. The frames after them only see the
+            padding, so they all hold the same value.
+    """
+
+    features = feature_extractor(waveforms, sampling_rate=sampling_rate, return_tensors="np").input_features
+
+    # A frame only sees the padding once its window starts after the end of the audio
+    reach = feature_extractor.n_fft // 2
+    frames = []
+    for feature, waveform in zip(features, waveforms):
+        count = min((len(waveform) + reach) // feature_extractor.hop_length + 1, feature.shape[-1])
+        # Keep every frame if the padding frames differ, e.g. with dithering
+        if count < feature.shape[-1] and not np.all(feature[:, count:] == feature[0, -1]):
+            count = feature.shape[-1]
+        frames.append(count)
+    return features, frames
+
+
+class FeatureStore:
+    """
+    Log-mel features kept in one memory-mapped array file, with an index of the offset of every
+    item in it, so that repeated transcriptions read the features instead of decoding the audio
+    and running the STFT again. Every feature extractor configuration gets its own store, so that
+    a model with other settings, e.g. 128 mel bins instead of 80, never reads the features of
+    another. Only the frames holding audio are stored, with the value of the padding frames, so a
+    short recording takes the space of its own length and not of the whole 30 seconds window.
+
+    Several processes, e.g. the steps of a multiprocess Dagster run, may add to the same store:
+    writers hold a file lock and read the index again under it, and frames are only ever appended,
+    so readers keep a consistent view of the items they indexed. The features of an id are never
+    invalidated by the store itself, so ids should change with the content, e.g. by including the
+    size and modification time of the recording. Frames of replaced or dropped ids stay in the
+    array file until `compact` rewrites it.
+    """
+
+    def __init__(self, root: Path, feature_extractor, dtype: str = "float32"):
+        """
+        Args:
+            root: The folder holding the stores of every configuration.
+            feature_extractor: The feature extractor of the Whisper model.
+            dtype: The type the features are stored with, "float16" halves the size of the store at the
+                cost of a rounding of the features.
+        """
+
+        config = extractor_config(feature_extractor)
+        key = hashlib.sha256(json.dumps(config, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+        self.dtype = np.dtype(dtype)
+        self.path = Path(root).joinpath(f"{key}-{self.dtype.name}")
+        self.mel_bins = feature_extractor.feature_size
+        self.window_frames = feature_extractor.nb_max_frames
+        self.config = config
+
+        self._lock = threading.RLock()
+        self._memmap: np.memmap | None = None
+        # Every item is indexed by its id as [offset, frames, padding value, audio seconds], offsets counted in frames
+        self._items: dict[str, list] = {}
+        self._features_file = FEATURES_FILE
+        self.refresh()
+
+    @property
+    def features_path(self) -> Path:
+        """
+        The array file holding the frames of the indexed items.
+        """
+
+        return self.path.joinpath(self._features_file)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._items
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive: bool = True) -> Iterator[None]:
+        # Serialize the threads of this process, then the processes sharing the store
+        with self._lock:
+            if fcntl is None or (not exclusive and not self.path.exists()):
+                yield
+                return
+
+            self.path.mkdir(parents=True, exist_ok=True)
+            with open(self.path.joinpath(LOCK_FILE), "a+b") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load_index(self) -> None:
+        # Read the index written by any process, which the caller holds the lock for
+        index_path = self.path.joinpath(INDEX_FILE)
+        index = json.loads(index_path.read_text(encoding="utf-8")) if index_path.exists() else {}
+        self._items = index.get("items", {})
+        self._features_file = index.get("features_file", FEATURES_FILE)
+        self._memmap = None
+
+    def _save_index(self) -> None:
+        # Write the index next to the array first, so that a crash never leaves it half written
+        index = {
+            "config": self.config, "dtype": self.dtype.name, "mel_bins": self.mel_bins,
+            "features_file": self._features_file, "items": self._items
+        }
+        temporary = self.path.joinpath(f"{INDEX_FILE}.tmp")
+        temporary.write_text(json.dumps(index), encoding="utf-8")
+        os.replace(temporary, self.path.joinpath(INDEX_FILE))
+
+    def refresh(self) -> None:
+        """
+        Reads the index again, to see the items other processes added since it was read.
+        """
+
+        with self._locked(exclusive=False):
+            self._load_index()
+
+    def missing(self, item_ids: list[str]) -> list[str]:
+        """
+        Returns the ids that have no features in the store, in the given order.
+        """
+
+        self.refresh()
+        return [item_id for item_id in item_ids if item_id not in self._items]
+
+    def seconds(self, item_ids: list[str]) -> list[float]:
+        """
+        Returns the duration of the audio of the given items, which must all be in the store.
+        """
+
+        return [self._items[item_id][3] for item_id in item_ids]
+
+    def add(self, item_ids: list[str], features: np.ndarray, frames: list[int], seconds: list[float]) -> None:
+        """
+        Appends the features of a batch to the array file, then saves the index. Ids already in the
+        store are replaced, their previous frames are left unused until the store is compacted.
+
+        Args:
+            item_ids: The ids of the items.
+            features: The features, shaped (batch, mel bins, frames) as returned by `featurize`.
+            frames: The number of leading frames of every item holding audio.
+            seconds: The duration of the audio of every item.
+        """
+
+        frame_bytes = self.mel_bins * self.dtype.itemsize
+        with self._locked():
+            # Append after the last frame indexed by any process, dropping what an interrupted write left beyond it
+            self._load_index()
+            offset = max((start + count for start, count, *_ in self._items.values()), default=0)
+            features_path = self.features_path
+            with open(features_path, "r+b" if features_path.exists() else "wb") as f:
+                f.truncate(offset * frame_bytes)
+                f.seek(offset * frame_bytes)
+                for item_id, feature, count, duration in zip(item_ids, features, frames, seconds):
+                    f.write(np.ascontiguousarray(feature[:, :count].T, dtype=self.dtype).tobytes())
+                    self._items[item_id] = [offset, count, float(feature[0, -1]), float(duration)]
+                    offset += count
+            self._save_index()
+
+    def unused_frames(self, keep: list[str] | None = None) -> tuple[int, int]:
+        """
+        Counts the frames of the array file that `compact` would drop.
+
+        Args:
+            keep: The ids to keep, or None to keep every indexed id.
+
+        Returns:
+            tuple[int, int]: The unused frames, and the frames of the whole array file.
+        """
+
+        with self._locked(exclusive=False):
+            self._load_index()
+            if not self.features_path.exists():
+                return 0, 0
+            total = os.path.getsize(self.features_path) // (self.mel_bins * self.dtype.itemsize)
+            kept = set(self._items) if keep is None else set(keep) & set(self._items)
+            return total - sum(self._items[item_id][1] for item_id in kept), total
+
+    def compact(self, keep: list[str] | None = None) -> int:
+        """
+        Rewrites the array file with the frames of the kept items only, dropping the frames of
+        replaced ids and of the ids not kept, e.g. recordings that changed or left the dataset. The
+        frames are copied to a new array file and the index switched to it, so readers holding the
+        previous file keep reading it.
+
+        Args:
+            keep: The ids to keep, or None to keep every indexed id.
+
+        Returns:
+            int: The number of frames dropped.
+        """
+
+        keep = set(keep) if keep is not None else None
+        with self._locked():
+            self._load_index()
+            if not self.features_path.exists():
+                return 0
+
+            previous_path = self.features_path
+            frame_bytes = self.mel_bins * self.dtype.itemsize
+            total = os.path.getsize(previous_path) // frame_bytes
+            source = np.memmap(previous_path, dtype=self.dtype, mode="r", shape=(total, self.mel_bins))
+
+            items = {}
+            features_file = f"features-{time.time_ns()}.bin"
+            offset = 0
+            with open(self.path.joinpath(features_file), "wb") as f:
+                for item_id, (start, count, padding, duration) in self._items.items():
+                    if keep is not None and item_id not in keep:
+                        continue
+                    f.write(np.ascontiguousarray(source[start: start + count]).tobytes())
+                    items[item_id] = [offset, count, padding, duration]
+                    offset += count
+            del source
+
+            self._items, self._features_file, self._memmap = items, features_file, None
+            self._save_index()
+            os.remove(previous_path)
+            return total - offset
+
+    def get(self, item_ids: list[str]) -> np.ndarray:
+        """
+        Reads the features of a batch from the memory-mapped array, padded back to the window.
+
+        Args:
+            item_ids: The ids of the items, which must all be in the store.
+
+        Returns:
+            np.ndarray: The float32 features, shaped (batch, mel bins, window frames) as the feature
+                extractor returns them.
+        """
+
+        with self._locked(exclusive=False):
+            # Map the array file named by a fresh index, so that the offsets and the file always match
+            if self._memmap is None:
+                self._load_index()
+                rows = os.path.getsize(self.features_path) // (self.mel_bins * self.dtype.itemsize)
+                self._memmap = np.memmap(self.features_path, dtype=self.dtype, mode="r", shape=(rows, self.mel_bins))
+            memmap, items = self._memmap, self._items
+
+        batch = np.empty((len(item_ids), self.mel_bins, self.window_frames), dtype=np.float32)
+        for i, item_id in enumerate(item_ids):
+            offset, count, padding, _ = items[item_id]
+            batch[i, :, :count] = memmap[offset: offset + count].T
+            batch[i, :, count:] = padding
+        return batch
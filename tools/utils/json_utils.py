@@ -1,6 +1,7 @@
 
 import re
 import json
+from typing import Generator, Iterable
 
 
 def json_reformatting(text: str) -> dict:
@@ -30,3 +31,62 @@ def json_reformatting(text: str) -> dict:
         data = json.loads(text)
 
     return data
+
+
+class JsonFieldStreamer:
+    """
+    Wraps a stream of text chunks containing a JSON object and yields the value of one string
+    field as soon as its characters arrive, e.g. the summary of a language model answer while the
+    rest of the JSON is still being generated. The complete text is kept in `text`, so it can be
+    parsed with `json_reformatting` once the stream is consumed.
+    """
+
+    def __init__(self, chunks: Iterable[str], field: str):
+        """
+        Args:
+            chunks: The stream of text chunks.
+            field: The key of the string field to yield.
+        """
+
+        self.chunks = chunks
+        self.text = ""
+        self._pattern = re.compile(r'"' + re.escape(field) + r'"\s*:\s*"')
+        self._position = None
+        self._done = False
+
+    def _advance(self) -> str:
+        # Find where the string value starts
+        if self._position is None:
+            match = self._pattern.search(self.text)
+            if match is None:
+                return ""
+            self._position = match.end()
+
+        # Decode the characters received so far, stopping before an incomplete escape sequence
+        output = []
+        while self._position < len(self.text):
+            char = self.text[self._position]
+            if char == '"':
+                self._done = True
+                break
+
+            if char == "\\":
+                length = 6 if self.text[self._position + 1: self._position + 2] == "u" else 2
+                escape = self.text[self._position: self._position + length]
+                if len(escape) < length:
+                    break
+                output.append(json.loads(f'"{escape}"'))
+                self._position += length
+            else:
+                output.append(char)
+                self._position += 1
+
+        return "".join(output)
+
+    def __iter__(self) -> Generator[str, None, None]:
+        for chunk in self.chunks:
+            self.text += chunk
+            if not self._done:
+                value = self._advance()
+                if value:
+                    yield value
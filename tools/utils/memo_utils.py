@@ -0,0 +1,77 @@
+
+import os
+import json
+import hashlib
+import tempfile
+import polars as pl
+from pathlib import Path
+
+
+def memo_key(text: str, model_name: str, generation_config: dict) -> str:
+    """
+    Creates a content hash identifying a model output. Two rows share a key only when the input
+    text, the model and the generation configuration are all identical, so a memoized output can
+    be reused safely for any row with the same key.
+
+    Args:
+        text: The input text sent to the model.
+        model_name: The name of the model producing the output.
+        generation_config: The parameters that influence the output, e.g. lengths or labels.
+
+    Returns:
+        str: A hexadecimal SHA-256 digest.
+    """
+
+    payload = json.dumps(
+        {"text": text, "model": model_name, "config": generation_config},
+        sort_keys=True,
+        ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def read_memo(file_path: Path, schema: dict) -> pl.DataFrame:
+    """
+    Reads a memo table from a parquet file. If the file does not exist yet, an empty table with
+    the given schema is returned.
+
+    Args:
+        file_path: The location of the memo table.
+        schema: The Polars schema of the memo table, including the "memo_key" column.
+
+    Returns:
+        pl.DataFrame: The memo table.
+    """
+
+    if not file_path.exists():
+        return pl.DataFrame(schema=schema)
+
+    return pl.read_parquet(file_path).select(list(schema.keys()))
+
+
+def write_memo(
+    file_path: Path, memo: pl.DataFrame, new_rows: pl.DataFrame,
+    compression: str = "zstd", compression_level: int | None = None
+) -> None:
+    """
+    Adds new rows to a memo table and saves it. Rows with a key already in the table replace the
+    older entry. The file is written next to the target and moved into place, so an interrupted
+    run never leaves a truncated memo table behind.
+
+    Args:
+        file_path: The location of the memo table.
+        memo: The memo table read at the start of the run.
+        new_rows: The rows computed in this run, with the same columns as the memo table.
+        compression: The parquet compression codec.
+        compression_level: The parquet compression level.
+    """
+
+    os.makedirs(file_path.parent, exist_ok=True)
+    memo = pl.concat([memo, new_rows.select(memo.columns)]).unique("memo_key", keep="last", maintain_order=True)
+
+    # Every writer gets a temporary file of its own, so concurrent runs never write into the same one
+    with tempfile.NamedTemporaryFile(
+        dir=file_path.parent, prefix=f"{file_path.stem}.", suffix=".tmp", delete=False
+    ) as f:
+        memo.write_parquet(file=f, compression=compression, compression_level=compression_level)
+    os.replace(f.name, file_path)
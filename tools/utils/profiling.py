@@ -0,0 +1,122 @@
+
+import cProfile
+import functools
+import io
+import itertools
+import logging
+import os
+import pstats
+import threading
+import time
+from src import global_configs as cf
+
+logger = logging.getLogger(__name__)
+
+# The VOICE2TEXT_PROFILE environment variable overrides the "Profiling" mode of the pipeline configurations
+PROFILE_ENV = "VOICE2TEXT_PROFILE"
+MODES = ("off", "cprofile", "torch", "both")
+
+CONFIGS = cf.PIPELINE_CONFIG["Profiling"]
+MODE = os.environ.get(PROFILE_ENV, CONFIGS["Mode"]).strip().lower()
+if MODE not in MODES:
+    logger.warning(f"Unknown profiling mode {MODE}, expected one of {MODES}. Profiling is disabled.")
+    MODE = "off"
+
+# Every process writes its profiles in its own folder
+OUTPUT_PATH = cf.DATA_PATH.joinpath(CONFIGS["Output_Folder"], f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}")
+
+# Only one call is profiled at a time, the PyTorch profiler being global to the process. Calls made
+# while another one is profiled, e.g. model inference inside an asset, show up in its profile.
+_PROFILING = threading.Lock()
+
+# Number of the next profile of every function, to name its files
+_CALL_COUNTS: dict[str, itertools.count] = {}
+_CALL_COUNTS_LOCK = threading.Lock()
+
+
+def _output_stem(name: str) -> str:
+    with _CALL_COUNTS_LOCK:
+        count = next(_CALL_COUNTS.setdefault(name, itertools.count(1)))
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    return str(OUTPUT_PATH.joinpath(f"{name}-{count}"))
+
+
+def _profile(name: str, function, args: tuple, kwargs: dict):
+    import torch
+
+    python_profiler = cProfile.Profile() if MODE in ("cprofile", "both") else None
+    torch_profiler = None
+    if MODE in ("torch", "both"):
+        activities = [torch.profiler.ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(torch.profiler.ProfilerActivity.CUDA)
+        torch_profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+
+    start = time.perf_counter()
+    if torch_profiler is not None:
+        torch_profiler.start()
+    if python_profiler is not None:
+        python_profiler.enable()
+    try:
+        with torch.profiler.record_function(name):
+            return function(*args, **kwargs)
+    finally:
+        if python_profiler is not None:
+            python_profiler.disable()
+        if torch_profiler is not None:
+            torch_profiler.stop()
+        seconds = time.perf_counter() - start
+
+        # Write the raw profiles along with a readable summary of the most expensive functions and operators
+        stem = _output_stem(name)
+        summary = [f"{name} took {seconds:.3f} seconds.\n"]
+        if python_profiler is not None:
+            python_profiler.dump_stats(f"{stem}.pstats")
+            stream = io.StringIO()
+            pstats.Stats(python_profiler, stream=stream).sort_stats("cumulative").print_stats(CONFIGS["Row_Limit"])
+            summary.append(stream.getvalue())
+        if torch_profiler is not None:
+            torch_profiler.export_chrome_trace(f"{stem}.trace.json")
+            summary.append(torch_profiler.key_averages().table(sort_by="self_cpu_time_total", row_limit=CONFIGS["Row_Limit"]))
+        with open(f"{stem}.txt", "w") as f:
+            f.write("\n".join(summary))
+        logger.info(f"Profiled {name} in {seconds:.3f} seconds, written to {stem}.*")
+
+
+def profiled(function):
+    """
+    Decorates a function or method to profile every call when profiling is enabled, through the
+    "Profiling" pipeline configurations or the VOICE2TEXT_PROFILE environment variable. "cprofile"
+    writes a pstats file of the Python functions, "torch" a Chrome trace of the PyTorch operators
+    that opens in Perfetto or chrome://tracing, "both" writes both. Every call also writes a text
+    summary of the most expensive functions and operators.
+
+    The mode is read once at import. When profiling is off the function is returned undecorated,
+    so the disabled hooks cost nothing.
+
+    Args:
+        function: The function, profiled under its qualified name, e.g. "WhisperAI.inference".
+
+    Returns:
+        The function, decorated only when profiling is enabled.
+    """
+
+    if MODE == "off":
+        return function
+
+    import torch
+
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _PROFILING.acquire(blocking=False):
+            # Another call is being profiled, so only mark this one in its trace
+            with torch.profiler.record_function(name):
+                return function(*args, **kwargs)
+        try:
+            return _profile(name, function, args, kwargs)
+        finally:
+            _PROFILING.release()
+
+    return wrapper
@@ -0,0 +1,197 @@
+
+import logging
+import os
+import sys
+import threading
+from dataclasses import dataclass
+from src import global_configs as cf
+
+logger = logging.getLogger(__name__)
+
+# Thread pools of the numerical libraries, sized from these variables when the libraries are first loaded
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "NUMEXPR_NUM_THREADS", "VECLIB_MAXIMUM_THREADS"
+)
+
+
+@dataclass(frozen=True)
+class ThreadPolicy:
+    """
+    The share of the CPU given to one process.
+    """
+
+    # Cores the process runs on
+    cores: tuple[int, ...]
+    # Threads used inside an operator, by PyTorch, ONNX Runtime and the OpenMP/MKL pools
+    intra_op_threads: int
+    # Threads running independent operators of a PyTorch graph concurrently
+    inter_op_threads: int
+    # Whether the process is pinned to its cores
+    pinned: bool
+
+
+_POLICY: ThreadPolicy | None = None
+_TORCH_CONFIGURED = False
+_LOCK = threading.Lock()
+
+
+def available_cores() -> list[int]:
+    """
+    Lists the cores this process may run on, which can be fewer than the cores of the machine in
+    a container or under `taskset`.
+
+    Returns:
+        list[int]: The ids of the cores, sorted.
+    """
+
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def resolve(processes: int | None = None, slot: int | None = None) -> ThreadPolicy:
+    """
+    Splits the core budget of the "Runtime_Policy" models configuration evenly between the
+    processes running models at the same time, so that together they do not oversubscribe it.
+
+    Args:
+        processes: Number of processes sharing the budget. Defaults to the configured number.
+        slot: Index of this process among them, e.g. the index of a job queue worker. Processes
+            are only pinned to their own cores when a slot is given.
+
+    Returns:
+        ThreadPolicy: The share of this process.
+    """
+
+    configs = cf.MODELS_CONFIG["Runtime_Policy"]
+    cores = available_cores()
+    budget = min(configs["Core_Budget"] or len(cores), len(cores))
+    processes = max(processes or configs["Processes"], 1)
+    threads = max(budget // processes, 1)
+
+    pinned = bool(configs["Pin_Workers"]) and slot is not None and hasattr(os, "sched_setaffinity")
+    if pinned:
+        # Consecutive slots get consecutive cores, wrapping around when there are more processes than cores
+        start = slot * threads
+        cores = [cores[(start + i) % budget] for i in range(threads)]
+
+    return ThreadPolicy(
+        cores=tuple(cores),
+        intra_op_threads=threads,
+        inter_op_threads=max(configs["Inter_Op_Threads"], 1),
+        pinned=pinned
+    )
+
+
+def _configure_torch(policy: ThreadPolicy) -> None:
+    import torch
+
+    torch.set_num_threads(policy.intra_op_threads)
+    try:
+        torch.set_num_interop_threads(policy.inter_op_threads)
+    except RuntimeError:
+        # The inter-op pool can only be sized before its first use
+        logger.warning(f"PyTorch inter-op threads already started, keeping {torch.get_num_interop_threads()}.")
+
+
+def apply(processes: int | None = None, slot: int | None = None) -> ThreadPolicy:
+    """
+    Applies the runtime policy to this process: pins it to its cores when configured, and sets
+    the OpenMP/MKL thread variables so that the numerical libraries size their pools from the
+    budget when they are loaded. Variables already set in the environment are kept. Call it at
+    the start of a process, before any model is loaded. Processes that do not call it get the
+    default policy when their first model is loaded.
+
+    Args:
+        processes: Number of processes sharing the core budget. Defaults to the configured number.
+        slot: Index of this process among them, used to pin it to its own cores.
+
+    Returns:
+        ThreadPolicy: The policy applied.
+    """
+
+    global _POLICY, _TORCH_CONFIGURED
+
+    policy = resolve(processes, slot)
+    with _LOCK:
+        if policy.pinned:
+            os.sched_setaffinity(0, policy.cores)
+        for name in THREAD_ENV_VARS:
+            os.environ.setdefault(name, str(policy.intra_op_threads))
+        _POLICY = policy
+
+        # PyTorch reads the variables when it is imported, so a process that imported it already is set directly
+        if "torch" in sys.modules:
+            _configure_torch(policy)
+            _TORCH_CONFIGURED = True
+
+    logger.info(f"Runtime policy of process {os.getpid()}: {effective_settings()}.")
+    return policy
+
+
+def current() -> ThreadPolicy:
+    """
+    Returns the policy applied to this process, applying the default one when none was.
+    """
+
+    return _POLICY or apply()
+
+
+def configure_torch() -> None:
+    """
+    Sizes the PyTorch thread pools of this process from its policy, once. The model registry
+    calls it before loading a model.
+    """
+
+    global _TORCH_CONFIGURED
+
+    policy = current()
+    with _LOCK:
+        if not _TORCH_CONFIGURED:
+            _configure_torch(policy)
+            _TORCH_CONFIGURED = True
+
+
+def onnx_threads() -> int:
+    """
+    Returns the intra-op threads of the ONNX Runtime sessions: the "Intra_Op_Threads" of the
+    "Onnx_Runtime_Configurations" when set, otherwise the share of this process.
+    """
+
+    return cf.MODELS_CONFIG["Onnx_Runtime_Configurations"]["Intra_Op_Threads"] or current().intra_op_threads
+
+
+def _core_ranges(cores: tuple[int, ...]) -> str:
+    # Write consecutive cores as ranges, e.g. "0-3,8"
+    ranges = []
+    for core in cores:
+        if ranges and core == ranges[-1][1] + 1:
+            ranges[-1][1] = core
+        else:
+            ranges.append([core, core])
+    return ",".join(f"{start}-{end}" if start != end else str(start) for start, end in ranges)
+
+
+def effective_settings() -> dict:
+    """
+    Returns the thread and affinity settings in effect in this process, to be logged or attached
+    to an asset materialization.
+
+    Returns:
+        dict: The cores, the thread counts of the policy and of the OpenMP variable, and those of
+            PyTorch once it is imported.
+    """
+
+    policy = _POLICY or resolve()
+    settings = {
+        "runtime_cores": _core_ranges(policy.cores),
+        "runtime_pinned": policy.pinned,
+        "runtime_intra_op_threads": policy.intra_op_threads,
+        "runtime_inter_op_threads": policy.inter_op_threads,
+        "runtime_omp_num_threads": os.environ.get("OMP_NUM_THREADS", "")
+    }
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        settings["runtime_torch_threads"] = torch.get_num_threads()
+        settings["runtime_torch_interop_threads"] = torch.get_num_interop_threads()
+    return settings
@@ -0,0 +1,139 @@
+
+import concurrent.futures
+import contextlib
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+logger = logging.getLogger(__name__)
+
+# Locks of the process by name, shared by every pipeline run so that concurrent runs, e.g. one per
+# Streamlit session, never call the same model at the same time
+_LOCKS: dict[str, threading.Lock] = {}
+_LOCKS_GUARD = threading.Lock()
+
+
+@dataclass
+class Stage:
+    """
+    A step of a pipeline. The function is called with the outputs of the stages it depends on,
+    passed as keyword arguments named after those stages.
+    """
+
+    name: str
+    function: Callable[..., object]
+    depends_on: tuple[str, ...] = field(default_factory=tuple)
+    # Stages sharing a lock never run at the same time, in this run or in any other run of the
+    # process, e.g. stages calling the same model
+    lock: str | None = None
+    # Share of the concurrency limit the stage occupies while it runs, e.g. the limit itself for a
+    # stage keeping every core busy on its own
+    slots: int = 1
+
+
+def _named_lock(name: str | None) -> contextlib.AbstractContextManager:
+    # The process-wide lock of the name, or no lock at all
+    if name is None:
+        return contextlib.nullcontext()
+    with _LOCKS_GUARD:
+        return _LOCKS.setdefault(name, threading.Lock())
+
+
+def _check_stages(stages: list[Stage]) -> None:
+    names = [stage.name for stage in stages]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Stage names must be unique, got {names}.")
+
+    for stage in stages:
+        missing = set(stage.depends_on) - set(names)
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {sorted(missing)}.")
+
+    # Resolve the stages in dependency order to detect cycles
+    resolved = set()
+    remaining = list(stages)
+    while remaining:
+        ready = [stage for stage in remaining if set(stage.depends_on) <= resolved]
+        if not ready:
+            raise ValueError(f"Stages {[stage.name for stage in remaining]} form a dependency cycle.")
+        resolved.update(stage.name for stage in ready)
+        remaining = [stage for stage in remaining if stage.name not in resolved]
+
+
+def run_stages(
+    stages: list[Stage], max_concurrency: int, progress: Callable[[str, float], None] | None = None
+) -> tuple[dict[str, object], dict[str, float]]:
+    """
+    Runs the stages of a pipeline on a thread pool, starting every stage as soon as the stages it
+    depends on are done, its lock is free and its slots fit in the concurrency limit. Independent
+    stages therefore run concurrently, and PyTorch releases the GIL inside its kernels, so the
+    pipeline takes about as long as its longest chain of stages instead of the sum of all of them.
+    Locks belong to the process, so a stage also waits for the stages of other runs holding its
+    lock, and its time only counts from when it holds the lock.
+
+    The limit only bounds how many stages run at once. The intra-op thread pools of PyTorch and
+    ONNX Runtime belong to the process, sized by `runtime_policy`, and are not split between the
+    stages, so concurrent stages each use the whole pool. Give a stage that keeps every core busy
+    the whole limit, so that it runs alone.
+
+    Args:
+        stages: The stages of the pipeline, in any order.
+        max_concurrency: The total slots the running stages may occupy. A stage asking for more
+            than the limit still runs, alone.
+        progress: Called with the name of every stage when it starts, and the completed fraction
+            of the pipeline.
+
+    Returns:
+        tuple[dict[str, object], dict[str, float]]: The output of every stage, and the seconds
+            every stage took along with the "total" wall time.
+
+    Raises:
+        Exception: The first exception raised by a stage, once the running stages are finished.
+    """
+
+    _check_stages(stages)
+    report = progress or (lambda stage, fraction: None)
+
+    pending = {stage.name: stage for stage in stages}
+    outputs: dict[str, object] = {}
+    timings: dict[str, float] = {}
+    running: dict[concurrent.futures.Future, Stage] = {}
+    start = time.perf_counter()
+
+    def timed(stage: Stage, inputs: dict) -> tuple[object, float]:
+        with _named_lock(stage.lock):
+            stage_start = time.perf_counter()
+            output = stage.function(**inputs)
+            return output, time.perf_counter() - stage_start
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(max_concurrency, 1), thread_name_prefix="stage") as executor:
+        while pending or running:
+            # Start every stage that can run now, in the order the stages were given
+            for stage in list(pending.values()):
+                busy_slots = sum(s.slots for s in running.values())
+                if not set(stage.depends_on) <= outputs.keys():
+                    continue
+                if stage.lock is not None and any(s.lock == stage.lock for s in running.values()):
+                    continue
+                if running and busy_slots + stage.slots > max_concurrency:
+                    continue
+
+                report(stage.name, len(outputs) / len(stages))
+                inputs = {name: outputs[name] for name in stage.depends_on}
+                running[executor.submit(timed, stage, inputs)] = pending.pop(stage.name)
+
+            done, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    outputs[stage.name], timings[stage.name] = future.result()
+                except Exception:
+                    # Let the running stages finish and start no new ones
+                    logger.error(f"Stage {stage.name} failed, waiting for the running stages.")
+                    concurrent.futures.wait(running)
+                    raise
+
+    timings["total"] = time.perf_counter() - start
+    return outputs, timings
@@ -0,0 +1,79 @@
+
+import queue
+import threading
+import torch
+from typing import Callable, Generator
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+# Longest wait for the next piece of a streamed generation, which includes the prompt prefill of
+# a long transcript on CPU before the first token
+STREAM_TIMEOUT_SECONDS = 300.0
+
+
+class StopEventCriteria(StoppingCriteria):
+    """
+    Stops every sequence of a generation once an event is set, e.g. when the consumer of a streamed
+    generation goes away.
+    """
+
+    def __init__(self, event: threading.Event):
+        """
+        Args:
+            event: The event that stops the generation when set.
+        """
+
+        self.event = event
+
+    def __call__(self, input_ids: torch.LongTensor, scores: torch.FloatTensor, **kwargs) -> torch.BoolTensor:
+        return torch.full((input_ids.shape[0],), self.event.is_set(), dtype=torch.bool, device=input_ids.device)
+
+
+def stream_generation(generate: Callable, streamer, generation_args: dict) -> Generator[str, None, None]:
+    """
+    Runs a generation in a background thread and yields the text pieces of its streamer. An error
+    raised by the generation ends the streamer, so the consumer never waits for pieces that will
+    not come, and is raised again in the consumer once the pieces generated before it are yielded.
+    When the consumer stops iterating early, e.g. on a Streamlit rerun, the generation is stopped
+    at its next token and its thread is joined.
+
+    Args:
+        generate: The generation function, e.g. `model.generate`.
+        streamer: The `TextIteratorStreamer` passed to the generation in `generation_args`, created
+            with a timeout so that a stalled generation does not block the consumer forever.
+        generation_args: The keyword arguments of the generation function.
+
+    Yields:
+        str: The next piece of the generated text.
+
+    Raises:
+        TimeoutError: If no piece was generated within the timeout of the streamer.
+    """
+
+    errors = []
+    stop = threading.Event()
+    generation_args = {
+        **generation_args,
+        "stopping_criteria": StoppingCriteriaList(
+            [*generation_args.get("stopping_criteria", []), StopEventCriteria(stop)]
+        )
+    }
+
+    def run() -> None:
+        try:
+            generate(**generation_args)
+        except BaseException as error:
+            errors.append(error)
+            streamer.end()
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    try:
+        yield from streamer
+    except queue.Empty:
+        raise TimeoutError(f"No text was generated within {streamer.timeout} seconds.") from None
+    finally:
+        stop.set()
+        thread.join()
+
+    if errors:
+        raise errors[0]
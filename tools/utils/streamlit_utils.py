@@ -1,25 +1,4 @@
 
-import time
-from typing import Generator
-
-
-def stream_text(text: str) -> Generator[str, None, None]:
-    """
-    Yields words from a given text string one at a time, adding a trailing space to each word,
-    and includes a delay between yielding each word.
-
-    Args:
-        text: The input string that will be split into words and streamed.
-
-    Yields:
-        str: A word from the text with a trailing space.
-    """
-
-    for word in text.split(" "):
-        yield word + " "
-        time.sleep(0.02)
-
-
 def calculate_ner_cof(text_list: list[str], text_score: list[float]) -> dict:
     """
     Calculates the average score for each unique text item in the provided list by